@@ -0,0 +1,419 @@
+'''Benchmarks for the overhead added by the benchmarker itself
+
+Usage: python bench.py [--samples 1000 10000] [--latency 0.001]
+    [--save-baseline bench_baseline.json] [--baseline bench_baseline.json]
+'''
+import argparse
+from array import array
+import base64
+import contextlib
+import json
+import math
+import sys
+import time
+import tracemalloc
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Union,
+)
+from unittest.mock import patch
+from benchmark import Benchmark
+import constants as c
+from lambda_function import handler
+from utils import json_loads
+
+
+class FakeLambdaBackend():
+    '''In-process stand-in for the Lambda API used by Benchmark'''
+
+    def __init__(
+            self,
+            *,
+            latency: float = 0.0,
+            duration: int = 100,
+            timeout: int = c.DEFAULT_LAMBDA_TIMEOUT,
+            memory_used: int = 64,
+            collector=None,
+            idle_timeout: Union[float, None] = None,
+            ):
+        self.latency = latency
+        self.duration = duration
+        self.timeout = timeout
+        self.memory_used = memory_used
+        self.collector = collector
+        self.config = {
+            'Memory': c.DEFAULT_MEMORY_SETS[0],
+            # Lambda reports timeouts in seconds, remaining time in ms
+            'Timeout': timeout // 1000,
+            'Architectures': [c.DEFAULT_ARCHITECTURE],
+        }
+        self.invocations = 0
+        # Seconds a sandbox stays warm when idle, None to never cold start
+        self.idle_timeout = idle_timeout
+        self.last_invocation = None
+
+    def get_lambda_config(self, *, function_name: str, **kwargs) -> Dict:
+        '''Return the current fake function configuration'''
+        return dict(self.config, FunctionName=function_name)
+
+    def update_lambda_config(self, *, function_name: str, **kwargs) -> Dict:
+        '''Update the fake function configuration'''
+        if 'memory_size' in kwargs:
+            self.config['Memory'] = kwargs['memory_size']
+
+        if 'timeout' in kwargs:
+            self.config['Timeout'] = kwargs['timeout']
+
+        # New configurations are served by new sandboxes
+        self.last_invocation = None
+
+        return {'StatusCode': 200}
+
+    def update_lambda_architecture(
+            self,
+            *,
+            function_name: str,
+            architecture: str,
+            **kwargs,
+            ) -> Dict:
+        '''Switch the fake function architecture'''
+        self.config['Architectures'] = [architecture]
+
+        return {'StatusCode': 200}
+
+    def invoke_lambda(
+            self,
+            *,
+            function_name: str,
+            payload,
+            invocation_type: str = 'RequestResponse',
+            log_type: str = 'None',
+            **kwargs,
+            ) -> Dict:
+        '''Simulate a synchronous invocation taking `latency` seconds'''
+        if self.latency:
+            time.sleep(self.latency)
+
+        self.invocations += 1
+
+        now = time.monotonic()
+        cold_start = self.idle_timeout is not None and (
+            self.last_invocation is None or
+            now - self.last_invocation > self.idle_timeout)
+        self.last_invocation = now
+
+        memory_size = self.config['Memory']
+        max_memory_used = min(self.memory_used, memory_size)
+
+        if self.memory_used > memory_size:
+            response = {
+                'StatusCode': 200,
+                'FunctionError': 'Unhandled',
+                'Payload': {
+                    'errorType': 'Runtime.ExitError',
+                    'errorMessage': 'Runtime exited with error: signal: '
+                                    'killed',
+                },
+            }
+
+        else:
+            response = {
+                'StatusCode': 200,
+                'Payload': {
+                    'remaining_time': self.timeout - self.duration,
+                    'cold_start': cold_start,
+                },
+            }
+
+            # Batched invocations split the duration across iterations
+            if c.BATCH_ITERATIONS_KEY.encode('utf-8') in payload:
+                iterations = json_loads(payload)[c.BATCH_ITERATIONS_KEY]
+                response['Payload'][c.BATCH_DURATIONS_KEY] = \
+                    [self.duration / iterations] * iterations
+
+        if log_type == 'Tail':
+            report = (
+                f'REPORT Duration: {self.duration} ms\t'
+                f'Memory Size: {memory_size} MB\t'
+                f'Max Memory Used: {max_memory_used} MB\t'
+            )
+            response['LogResult'] = \
+                base64.b64encode(report.encode('utf-8')).decode('utf-8')
+
+        if invocation_type == 'Event':
+            # Push a destination record as Lambda would, answer right away
+            self.collector.put({
+                'requestContext': {
+                    'condition':
+                        'Failure' if 'FunctionError' in response
+                        else 'Success',
+                },
+                'requestPayload': json_loads(payload),
+                'responsePayload': response['Payload'],
+            })
+
+            return {'StatusCode': 202}
+
+        return response
+
+    @contextlib.contextmanager
+    def patch(self):
+        '''Route Benchmark calls to this backend'''
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(patch(
+                'benchmark.get_lambda_config', new=self.get_lambda_config))
+            stack.enter_context(patch(
+                'benchmark.update_lambda_config',
+                new=self.update_lambda_config))
+            stack.enter_context(patch(
+                'benchmark.update_lambda_architecture',
+                new=self.update_lambda_architecture))
+            stack.enter_context(patch(
+                'benchmark.invoke_lambda', new=self.invoke_lambda))
+            stack.enter_context(patch.object(
+                c, 'SLEEP_AFTER_NEW_MEMORY_SET', 0))
+            stack.enter_context(patch.object(
+                c, 'SLEEP_AFTER_NEW_ARCHITECTURE_SET', 0))
+
+            yield self
+
+
+class FakeRegionalBackend():
+    '''Fake Lambda backends per region, routing calls by their region'''
+
+    def __init__(self, backends: Dict[str, FakeLambdaBackend]):
+        self.backends = backends
+
+    def route(self, method: str) -> Callable:
+        '''Call a method of the backend of the call's region'''
+        def routed(*, region: str = None, **kwargs):
+            return getattr(self.backends[region], method)(**kwargs)
+
+        return routed
+
+    @contextlib.contextmanager
+    def patch(self):
+        '''Route Benchmark calls to the backend of their region'''
+        with contextlib.ExitStack() as stack:
+            for method in (
+                    'get_lambda_config',
+                    'update_lambda_config',
+                    'update_lambda_architecture',
+                    'invoke_lambda'):
+                stack.enter_context(patch(
+                    f'benchmark.{method}', new=self.route(method)))
+
+            stack.enter_context(patch.object(
+                c, 'SLEEP_AFTER_NEW_MEMORY_SET', 0))
+            stack.enter_context(patch.object(
+                c, 'SLEEP_AFTER_NEW_ARCHITECTURE_SET', 0))
+
+            yield self
+
+
+def measure(
+        func: Callable,
+        *,
+        invocations: int,
+        latency: float = 0.0,
+        threads: int = 1,
+        repeat: int = 1,
+        ) -> Dict:
+    '''Measure throughput, overhead per invocation and peak memory of func
+
+    The function is timed `repeat` times, keeping the best run, then called
+    once more under tracemalloc, which slows execution down, to measure
+    peak memory.
+    '''
+    elapsed = math.inf
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Wall time the fake backend latency alone accounts for
+    expected = math.ceil(invocations / threads) * latency
+
+    return {
+        'invocations': invocations,
+        'elapsed_seconds': round(elapsed, 4),
+        'invocations_per_second': round(invocations / elapsed, 2),
+        'overhead_per_invocation_us':
+            round(max(elapsed - expected, 0) / invocations * 1e6, 3),
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def bench_handler_overhead(*, samples: int, latency: float = 0.0) -> Dict:
+    '''Lambda handler on one memory size against the fake backend'''
+    backend = FakeLambdaBackend(latency=latency)
+
+    event = {
+        'test_count': samples,
+        'memory_sets': [c.DEFAULT_MEMORY_SETS[0]],
+        'architectures': [c.DEFAULT_ARCHITECTURE],
+        'emit_metrics': False,
+    }
+
+    with backend.patch():
+        return measure(
+            lambda: handler(event=event, context={}),
+            invocations=samples,
+            latency=latency,
+            threads=c.DEFAULT_MAX_THREADS,
+        )
+
+
+def bench_run(*, samples: int, latency: float = 0.0) -> Dict:
+    '''Benchmark.run on one memory size against the fake backend'''
+    backend = FakeLambdaBackend(latency=latency)
+    benchmarking = Benchmark(
+        test_count=samples,
+        memory_sets=[c.DEFAULT_MEMORY_SETS[0]],
+        architectures=[c.DEFAULT_ARCHITECTURE],
+    )
+
+    with backend.patch():
+        return measure(
+            benchmarking.run,
+            invocations=samples,
+            latency=latency,
+            threads=benchmarking.max_threads,
+        )
+
+
+def bench_get_benchmark_durations(
+        *,
+        samples: int,
+        latency: float = 0.0,
+        ) -> Dict:
+    '''Benchmark.get_benchmark_durations against the fake backend'''
+    backend = FakeLambdaBackend(latency=latency)
+    benchmarking = Benchmark(test_count=samples)
+
+    with backend.patch():
+        return measure(
+            benchmarking.get_benchmark_durations,
+            invocations=samples,
+            latency=latency,
+            threads=benchmarking.max_threads,
+        )
+
+
+def bench_process_benchmark_results(*, samples: int, **kwargs) -> Dict:
+    '''Benchmark.process_benchmark_results over synthetic durations'''
+    benchmarking = Benchmark()
+    per_memory = max(samples // len(c.DEFAULT_MEMORY_SETS), 1)
+
+    results = [
+        {
+            'memory': memory,
+            'success': True,
+            'errors': [],
+            'average_duration': 100,
+            'durations': array('q', range(per_memory)),
+        }
+        for memory in c.DEFAULT_MEMORY_SETS
+    ]
+
+    return measure(
+        lambda: benchmarking.process_benchmark_results(results=results),
+        invocations=per_memory * len(c.DEFAULT_MEMORY_SETS),
+        repeat=10,
+    )
+
+
+BENCH_TARGETS = {
+    'handler': bench_handler_overhead,
+    'run': bench_run,
+    'get_benchmark_durations': bench_get_benchmark_durations,
+    'process_benchmark_results': bench_process_benchmark_results,
+}
+
+
+def bench_suite(
+        *,
+        sample_sizes: List[int] = c.BENCH_SAMPLE_SIZES,
+        latency: float = 0.0,
+        ) -> Dict:
+    '''Run every benchmark target at each sample size'''
+    return {
+        f'{name}:{samples}': target(samples=samples, latency=latency)
+        for name, target in BENCH_TARGETS.items()
+        for samples in sample_sizes
+    }
+
+
+def compare_to_baseline(
+        *,
+        results: Dict,
+        baseline: Dict,
+        tolerance: float = c.BENCH_REGRESSION_TOLERANCE,
+        ) -> List[str]:
+    '''List regressions of results against a baseline suite run'''
+    regressions = []
+
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+
+        reference = baseline[key]
+
+        min_throughput = \
+            reference['invocations_per_second'] * (1 - tolerance)
+        max_memory = reference['peak_memory_bytes'] * (1 + tolerance)
+
+        if result['invocations_per_second'] < min_throughput:
+            regressions.append(
+                f'{key}: {result["invocations_per_second"]} invocations/s, '
+                f'baseline {reference["invocations_per_second"]}'
+            )
+
+        if result['peak_memory_bytes'] > max_memory:
+            regressions.append(
+                f'{key}: {result["peak_memory_bytes"]} bytes peak memory, '
+                f'baseline {reference["peak_memory_bytes"]}'
+            )
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--samples', type=int, nargs='+', default=c.BENCH_SAMPLE_SIZES)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--baseline', metavar='PATH')
+    parser.add_argument(
+        '--tolerance', type=float, default=c.BENCH_REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    results = bench_suite(sample_sizes=args.samples, latency=args.latency)
+
+    print(json.dumps(results, indent=4))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_to_baseline(
+                results=results,
+                baseline=json.load(baseline_file),
+                tolerance=args.tolerance,
+            )
+
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+
+        sys.exit(1 if regressions else 0)
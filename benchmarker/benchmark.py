@@ -1,19 +1,73 @@
 '''Routine to benchmark Lambda performance with different memory allocations'''
 import concurrent.futures
+import hashlib
 import json
+import math
+import statistics
+import threading
 import time
+import uuid
 from typing import (
     Dict,
     List,
     Union,
 )
+from budget import BudgetScheduler
+from cache import ResultCache
+from collector import SQSCollector
+from columnar import (
+    available_format,
+    export_samples,
+)
+from concurrency import (
+    concurrency_curve,
+    concurrency_levels,
+    summarize_level,
+)
 import constants as c
+from control import (
+    pooled_variance_removed,
+    summarize_control,
+)
 import custom_exceptions as custom_exc
+from hardware import (
+    hardware_class,
+    pooled_mix,
+    reweighted_average,
+    reweighted_durations,
+    summarize_hardware,
+)
+from load import LoadGenerator
+from metrics import MetricsRegistry
+from model import extrapolate
+from regression import (
+    load_baseline,
+    overall_verdict,
+    sequential_test,
+)
+from replay import (
+    load_trace,
+    TraceReplayer,
+)
+from samples import (
+    Invocation,
+    SampleColumns,
+)
+from sketch import QuantileSketch
+from stats import (
+    confidence_intervals,
+    significance_tiers,
+)
+from tracing import Tracer
 from utils import (
     get_lambda_config,
     invoke_lambda,
+    is_throttling_error,
+    json_dumps,
     lambda_execution_cost,
     logger,
+    parse_invocation_report,
+    update_lambda_architecture,
     update_lambda_config,
 )
 
@@ -32,8 +86,138 @@ class Benchmark():
             lambda_event: Dict = c.DEFAULT_LAMBDA_EVENT,
             memory_sets: List[int] = c.DEFAULT_MEMORY_SETS,
             timeout: int = c.DEFAULT_LAMBDA_TIMEOUT,
+            mode: str = c.DEFAULT_MODE,
+            load_rate: float = c.DEFAULT_LOAD_RATE,
+            load_duration: float = c.DEFAULT_LOAD_DURATION,
+            load_arrivals: str = c.DEFAULT_LOAD_ARRIVALS,
+            architectures: List[str] = c.DEFAULT_ARCHITECTURES,
+            architecture_functions: Union[Dict[str, str], None] = None,
+            use_cache: bool = c.DEFAULT_USE_CACHE,
+            force_refresh: bool = False,
+            cache_path: str = c.CACHE_PATH,
+            cache_ttl: float = c.CACHE_TTL,
+            memory_floor: bool = False,
+            memory_headroom: float = c.DEFAULT_MEMORY_HEADROOM,
+            floor_test_count: int = c.DEFAULT_FLOOR_TEST_COUNT,
+            collector_queue_url: Union[str, None] = None,
+            async_timeout: float = c.DEFAULT_ASYNC_TIMEOUT,
+            collector=None,
+            trace: bool = False,
+            trace_format: str = c.DEFAULT_TRACE_FORMAT,
+            trace_path: str = c.TRACE_PATH,
+            batch_size: int = c.DEFAULT_BATCH_SIZE,
+            scaling_probe: bool = False,
+            scaling_max_workers: int = c.DEFAULT_SCALING_MAX_WORKERS,
+            calibrate: bool = False,
+            calibration_parameter: str = c.DEFAULT_CALIBRATION_PARAMETER,
+            calibration_window: List[float] = c.DEFAULT_CALIBRATION_WINDOW,
+            calibration_test_count: int = c.DEFAULT_CALIBRATION_TEST_COUNT,
+            baseline_path: Union[str, None] = None,
+            regression_threshold: float = c.REGRESSION_THRESHOLD,
+            regression_alpha: float = c.SIGNIFICANCE_ALPHA,
+            regression_batch_size: int = c.REGRESSION_BATCH_SIZE,
+            regression_max_samples: int = c.REGRESSION_MAX_SAMPLES,
+            budget: Union[float, None] = None,
+            region: Union[str, None] = None,
+            replay_trace_path: Union[str, None] = None,
+            replay_speedup: float = c.DEFAULT_REPLAY_SPEEDUP,
+            concurrency_sweep: bool = False,
+            concurrency_max: int = c.DEFAULT_CONCURRENCY_MAX,
+            concurrency_test_count: int = c.DEFAULT_CONCURRENCY_TEST_COUNT,
+            export_path: Union[str, None] = None,
+            export_format: str = c.DEFAULT_EXPORT_FORMAT,
+            hardware_reference_mix: Union[str, Dict[str, float], None] = None,
+            extrapolate: bool = False,
+            control_function: Union[str, None] = None,
+            control_test_count: int = c.DEFAULT_CONTROL_TEST_COUNT,
             **kwargs,
             ):
+        if mode not in c.BENCHMARK_MODES:
+            raise custom_exc.BenchmarkConfigError(
+                f'Invalid mode ({mode}), valid are '
+                f"{', '.join(c.BENCHMARK_MODES)}"
+            )
+
+        if not all(arch in c.ARCHITECTURES for arch in architectures):
+            raise custom_exc.BenchmarkConfigError(
+                f'Invalid architectures ({architectures}), valid are '
+                f"{', '.join(c.ARCHITECTURES)}"
+            )
+
+        if trace_format not in c.TRACE_FORMATS:
+            raise custom_exc.BenchmarkConfigError(
+                f'Invalid trace format ({trace_format}), valid are '
+                f"{', '.join(c.TRACE_FORMATS)}"
+            )
+
+        if type(batch_size) is not int or batch_size < 1:
+            raise custom_exc.BenchmarkConfigError(
+                f'Invalid batch size ({batch_size}), must be an integer '
+                'greater than 0 (zero)'
+            )
+
+        if calibrate and \
+                type(lambda_event.get(calibration_parameter)) is not int:
+            raise custom_exc.BenchmarkConfigError(
+                f'Cannot calibrate, lambda_event has no integer '
+                f'"{calibration_parameter}" to start from'
+            )
+
+        if budget is not None and (budget <= 0 or mode != c.MODE_CLOSED_LOOP):
+            raise custom_exc.BenchmarkConfigError(
+                f'Budget ({budget}) must be greater than 0 (zero) and is '
+                f'only supported in {c.MODE_CLOSED_LOOP} mode'
+            )
+
+        if mode == c.MODE_ASYNC and not (collector or collector_queue_url):
+            raise custom_exc.BenchmarkConfigError(
+                'A collector_queue_url is required in async mode'
+            )
+
+        if mode == c.MODE_REPLAY and not replay_trace_path:
+            raise custom_exc.BenchmarkConfigError(
+                'A replay_trace_path is required in replay mode'
+            )
+
+        if type(concurrency_max) is not int or concurrency_max < 1:
+            raise custom_exc.BenchmarkConfigError(
+                f'Invalid concurrency_max ({concurrency_max}), must be an '
+                'integer greater than 0 (zero)'
+            )
+
+        if export_path is not None:
+            export_format = available_format(export_format)
+
+        if hardware_reference_mix is not None and \
+                hardware_reference_mix != c.HARDWARE_POOLED_MIX and not (
+                    type(hardware_reference_mix) is dict and
+                    hardware_reference_mix and
+                    all(weight > 0
+                        for weight in hardware_reference_mix.values())):
+            raise custom_exc.BenchmarkConfigError(
+                f'Invalid hardware reference mix ({hardware_reference_mix}), '
+                f'must be "{c.HARDWARE_POOLED_MIX}" or a dict of positive '
+                'weights by hardware class'
+            )
+
+        if control_function is not None and mode != c.MODE_CLOSED_LOOP:
+            raise custom_exc.BenchmarkConfigError(
+                f'A control_function is only supported in '
+                f'{c.MODE_CLOSED_LOOP} mode'
+            )
+
+        if type(control_test_count) is not int or control_test_count < 1:
+            raise custom_exc.BenchmarkConfigError(
+                f'Invalid control_test_count ({control_test_count}), must be '
+                'an integer greater than 0 (zero)'
+            )
+
+        if replay_speedup <= 0:
+            raise custom_exc.BenchmarkConfigError(
+                f'Replay speedup ({replay_speedup}) must be greater than 0 '
+                '(zero)'
+            )
+
         # Public attributes
         self.verbose = verbose
         self.ignore_coldstart = ignore_coldstart
@@ -43,15 +227,91 @@ class Benchmark():
         self.lambda_event = lambda_event
         self.memory_sets = memory_sets
         self.timeout = timeout
+        self.mode = mode
+        self.load_rate = load_rate
+        self.load_duration = load_duration
+        self.load_arrivals = load_arrivals
+        self.architectures = architectures
+        self.architecture_functions = architecture_functions or {}
+        self.use_cache = use_cache
+        self.force_refresh = force_refresh
+        self.memory_floor = memory_floor
+        self.memory_headroom = memory_headroom
+        self.floor_test_count = floor_test_count
+        self.async_timeout = async_timeout
+        self.collector = collector
+        self.collector_queue_url = collector_queue_url
+        self.trace = trace
+        self.trace_format = trace_format
+        self.trace_path = trace_path
+        self.batch_size = batch_size
+        self.scaling_probe = scaling_probe
+        self.scaling_max_workers = scaling_max_workers
+        self.calibrate = calibrate
+        self.calibration_parameter = calibration_parameter
+        self.calibration_window = calibration_window
+        self.calibration_test_count = calibration_test_count
+        self.baseline_path = baseline_path
+        self.regression_threshold = regression_threshold
+        self.regression_alpha = regression_alpha
+        self.regression_batch_size = regression_batch_size
+        self.regression_max_samples = regression_max_samples
+        self.budget = budget
+        self.region = region
+        self.replay_trace_path = replay_trace_path
+        self.replay_speedup = replay_speedup
+        self.concurrency_sweep = concurrency_sweep
+        self.concurrency_max = concurrency_max
+        self.concurrency_test_count = concurrency_test_count
+        self.export_path = export_path
+        self.export_format = export_format
+        self.hardware_reference_mix = hardware_reference_mix
+        self.extrapolate = extrapolate
+        self.control_function = control_function
+        self.control_test_count = control_test_count
+
+        # Lambda client connections, one per invocation that can be in
+        # flight: the threads of a batch and its control canary, the
+        # workers of a load test or replay, or the top concurrency level
+        self.max_connections = max(
+            max_threads + 1,
+            c.LOAD_MAX_WORKERS if mode in (c.MODE_LOAD, c.MODE_REPLAY)
+            else 0,
+            concurrency_max if concurrency_sweep else 0,
+        )
 
         # Internal attributes
+        self.lambda_payload = self.serialize_event()
         self.results = {}
         self.benchmark_results = []
         self.public_errors = []
         self.original_config = {
             'memory': None,
             'timeout': None,
+            'architecture': None,
         }
+        self.twin_original_configs = {}
+        self.function_identities = {}
+        self.result_cache = ResultCache(path=cache_path, ttl=cache_ttl) \
+            if use_cache else None
+        self.memory_floor_result = None
+        self.calibration_result = None
+        self.budget_reports = []
+        self.export_reports = []
+        self.control_baseline = None
+        self.control_payload = None
+        self.control_timeout = None
+        self.control_factor = 1.0
+        self.current_memory = None
+        self.tracer = Tracer(enabled=trace)
+        self.metrics = MetricsRegistry()
+        self.replay_requests, self.replay_digest = \
+            load_trace(replay_trace_path) if mode == c.MODE_REPLAY \
+            else (None, None)
+        # Max Memory Used is only reported in the invocation log tail
+        self.log_type = 'Tail' if memory_floor else 'None'
+        self.active_function = self.lambda_function
+        self.current_architecture = None
 
         self.verbose_log([
             'Initialized Benchmark with the following params:'
@@ -61,7 +321,11 @@ class Benchmark():
             f'max_threads: {self.max_threads}, ',
             f'lambda_function: {self.lambda_function}, '
             f'lambda_event: {json.dumps(self.lambda_event)}, '
-            f'memory_sets: {json.dumps(self.memory_sets)}'
+            f'memory_sets: {json.dumps(self.memory_sets)}, '
+            f'mode: {self.mode}, '
+            f'region: {self.region}, '
+            f'batch_size: {self.batch_size}, '
+            f'architectures: {json.dumps(self.architectures)}'
         ])
 
     @property
@@ -90,9 +354,10 @@ class Benchmark():
             *,
             memory: Union[int, None] = None,
             timeout: Union[int, None] = None,
+            architecture: Union[str, None] = None,
             ) -> Dict:
         '''Set value for original Lambda configuration parameter'''
-        result = {'memory': False, 'timeout': False}
+        result = {'memory': False, 'timeout': False, 'architecture': False}
 
         if type(memory) is int:
             self.original_config['memory'] = memory
@@ -114,6 +379,17 @@ class Benchmark():
                 'Lambda configuration'
             )
 
+        if architecture in c.ARCHITECTURES:
+            self.original_config['architecture'] = architecture
+            self.current_architecture = architecture
+            result['architecture'] = True
+
+        elif architecture is not None:
+            raise custom_exc.SetOriginalConfigError(
+                f'Error setting reference for architecture ({architecture}) '
+                'original Lambda configuration'
+            )
+
         return result
 
     def store_original_config(self) -> tuple:
@@ -129,6 +405,7 @@ class Benchmark():
         try:
             config = get_lambda_config(
                 function_name=self.lambda_function,
+                region=self.region,
             )
 
             success = self.is_lambda_response_success(
@@ -151,11 +428,18 @@ class Benchmark():
                 self.set_original(
                     memory=config['Memory'],
                     timeout=config['Timeout'],
+                    architecture=config.get(
+                        'Architectures', [c.DEFAULT_ARCHITECTURE])[0],
                 )
 
                 result['memory'] = config['Memory']
                 result['timeout'] = config['Timeout']
 
+                self.function_identities[self.lambda_function] = {
+                    'code_sha256': config.get('CodeSha256'),
+                    'runtime': config.get('Runtime'),
+                }
+
         except Exception as exc:
             error = custom_exc.StoreOriginalConfigError(
                 'Could not get original configuration for Lambda '
@@ -173,11 +457,41 @@ class Benchmark():
         '''Restore original Lambda configuration'''
         self.verbose_log('Restoring original Lambda configuration parameters')
 
+        self.active_function = self.lambda_function
+
         response, success, error = self.set_new_config(
             new_memory=original_config['memory'],
             new_timeout=original_config['timeout'],
         )
 
+        architecture = original_config.get('architecture')
+
+        if success and architecture and \
+                architecture != self.current_architecture:
+            success, error = self.switch_architecture(
+                architecture=architecture,
+                allow_twin=False,
+            )
+
+        for function_name, config in self.twin_original_configs.items():
+            try:
+                update_lambda_config(
+                    function_name=function_name,
+                    region=self.region,
+                    memory_size=config['memory'],
+                    timeout=config['timeout'],
+                )
+
+            except Exception as exc:
+                success = False
+                error = custom_exc.RestoreOriginalConfigError(
+                    f'Cannot restore twin Lambda ({function_name}) original '
+                    'configurations'
+                )
+
+                logger.warning(error)
+                logger.exception(exc)
+
         return {
             'success': success,
             'error': error,
@@ -201,21 +515,40 @@ class Benchmark():
         self.results = []
         self.benchmark_results = []
 
+        # Serialize the event once, instead of on every invocation
+        self.lambda_payload = self.serialize_event()
+
         store_config_result = self.store_original_config()
 
         if store_config_result['error']:
             raise store_config_result['error']
 
-        # Cannot run this in parallel because we have only one Lambda to test
-        # To run parallel memory benchmarks, we'd need to deploy the same code
-        # in multiple Lambdas; within each benchmark we use concurrent threads
-        for memory in self.memory_sets:
-            self.benchmark_results.append(self.benchmark_memory(memory=memory))
+        # The function is restored even when benchmarking fails midway
+        try:
+            if self.baseline_path is not None:
+                return self.run_comparison()
 
-        self.results = self.process_benchmark_results(
-            results=self.benchmark_results,
-        )
+            self.results = self.run_memory_sets()
+
+        finally:
+            self.restore_config()
+
+        if self.trace:
+            try:
+                self.results['trace'] = self.tracer.export(
+                    path=self.trace_path,
+                    trace_format=self.trace_format,
+                )
+
+            except OSError as error:
+                logger.warning(f'Could not export trace: {error}')
 
+        self.verbose_log('Ended running benchmarking')
+
+        return self.results
+
+    def restore_config(self):
+        '''Restore the original configuration, reporting any failure'''
         restore_config_result = self.restore_original_config(
             original_config=self.original_config,
         )
@@ -230,277 +563,1916 @@ class Benchmark():
 
             logger.warning(error)
 
-        self.verbose_log('Ended running benchmarking')
+    def run_memory_sets(self) -> Dict:
+        '''Benchmark every memory size on every architecture'''
+        if self.result_cache is not None:
+            self.result_cache.load()
 
-        return self.results
+        memory_sets = self.memory_sets
 
-    def benchmark_memory(self, *, memory: int) -> Dict:
-        '''Benchmark a given memory size'''
-        self.verbose_log(f'  START benchmarking memory: {memory}')
+        if self.calibrate:
+            self.calibration_result = self.calibrate_workload()
 
-        result = {
-            'memory': memory,
-            'success': True,
-            'durations': [],
-            'average_duration': None,
-            'errors': [],
-        }
+        if self.memory_floor:
+            self.memory_floor_result = self.find_memory_floor()
+            floor = self.memory_floor_result['floor']
 
-        response, success, error = self.set_new_config(
-            new_memory=memory,
-            new_timeout=self.timeout,
-        )
+            if floor is not None:
+                memory_sets = [m for m in self.memory_sets if m >= floor]
 
-        if not success:
-            result['success'] = False
-            result['errors'].append(str(error))
+        if self.control_function is not None:
+            self.control_baseline = self.measure_control_baseline()
 
-            logger.warning(error)
-            logger.warning(f'Lambda API response: {str(response)}')
+        # Cannot run this in parallel because we have only one Lambda to test
+        # To run parallel memory benchmarks, we'd need to deploy the same code
+        # in multiple Lambdas; within each benchmark we use concurrent threads
+        for architecture in self.architectures:
+            pending_memory_sets = []
+
+            # Fill in cached results, then benchmark only missing sizes
+            for memory in memory_sets:
+                cached = self.get_cached_result(
+                    memory=memory,
+                    architecture=architecture,
+                )
 
-            return result
+                if cached is None:
+                    pending_memory_sets.append(memory)
 
-        time.sleep(c.SLEEP_AFTER_NEW_MEMORY_SET)
+                else:
+                    self.benchmark_results.append(cached)
 
-        result['durations'] = self.get_benchmark_durations()
+            if not pending_memory_sets:
+                continue
 
-        if len(result['durations']) == 0:
-            error = custom_exc.InvokeLambdaError(
-                'No durations were returned from invocations of Lambda '
-                f'({self.lambda_function}) with memory {memory}'
+            success, error = self.switch_architecture(
+                architecture=architecture,
             )
 
-            result['success'] = False
-            result['errors'].append(error)
+            # Partial results of a budgeted run are not cached
+            if success and self.budget is not None:
+                self.benchmark_results.extend(self.run_budgeted(
+                    memory_sets=pending_memory_sets,
+                    architecture=architecture,
+                ))
 
-            logger.warning(error)
+                continue
 
-            return result
+            for memory in pending_memory_sets:
+                if not success:
+                    self.benchmark_results.append({
+                        'memory': memory,
+                        'architecture': architecture,
+                        'success': False,
+                        'errors': [error],
+                    })
 
-        result['average_duration'] = \
-            round(sum(result['durations']) / len(result['durations']))
+                    continue
 
-        self.verbose_log(f'  DONE benchmarking memory: {memory}')
+                self.benchmark_results.append(self.benchmark_memory(
+                    memory=memory,
+                    architecture=architecture,
+                ))
 
-        return result
+                self.cache_result(result=self.benchmark_results[-1])
 
-    def get_benchmark_durations(self) -> list:
-        '''Run benchmarking of a given memory size'''
-        durations = []
-        runs = 0
-        max_runs = self.test_count / self.max_threads + 5
+        if self.export_path is not None:
+            self.export_reports = self.export_results(
+                results=self.benchmark_results,
+            )
 
-        while len(durations) < self.test_count:
-            pending = self.test_count - len(durations)
-            threads = min(self.max_threads, pending)
+        if self.result_cache is not None and self.result_cache.entries:
+            try:
+                self.result_cache.save()
 
-            self.verbose_log(
-                f'    Pending checks: {pending}, threads: {threads}')
+            except OSError as error:
+                logger.warning(f'Could not save result cache: {error}')
 
-            with concurrent.futures.ThreadPoolExecutor(threads) as executor:
-                invoke_futures = [
-                    executor.submit(self.get_execution_time)
-                    for i in range(0, threads)
-                ]
+        return self.process_benchmark_results(
+            results=self.benchmark_results,
+        )
+
+    def run_comparison(self) -> Dict:
+        '''Compare memory_sets against a baseline run, for a CI gate
 
-                for future in concurrent.futures.as_completed(invoke_futures):
-                    invocation = future.result()
+        Returns a verdict per memory size and an overall 'verdict': the
+        worst of 'regression', 'inconclusive', 'improvement' and
+        'no_change', or 'inconclusive' when no memory size could be
+        compared.
+        '''
+        self.verbose_log(f'Comparing against baseline: {self.baseline_path}')
 
-                    if invocation['success'] and not invocation['cold_start']:
-                        durations.append(invocation['duration'])
+        baseline = load_baseline(self.baseline_path)
+        architecture = self.current_architecture or c.DEFAULT_ARCHITECTURE
+        comparisons = []
 
-                durations_count = len(durations)
+        for memory in self.memory_sets:
+            reference = baseline.get((memory, architecture))
 
-                self.verbose_log(
-                    f'    Durations count: {durations_count}')
+            if reference is None:
+                error = custom_exc.BenchmarkConfigError(
+                    f'No baseline durations for memory ({memory}) and '
+                    f'architecture ({architecture})'
+                )
+
+            elif not self.apply_memory(memory=memory):
+                error = custom_exc.SetLambdaMemoryError(
+                    f'Cannot set memory ({memory}) to compare'
+                )
 
-            # Avoid falling in an infinite loop
-            if runs >= max_runs:
-                break
             else:
-                runs += 1
+                comparisons.append(self.compare_memory(
+                    memory=memory,
+                    architecture=architecture,
+                    baseline=reference,
+                ))
 
-        return durations
+                continue
 
-    def set_new_config(
+            logger.warning(error)
+            self.append_public_error(error=error)
+
+            comparisons.append({
+                'memory': memory,
+                'architecture': architecture,
+                'verdict': None,
+                'errors': [str(error)],
+            })
+
+        self.results = {
+            'verdict': overall_verdict(comparisons),
+            'comparison': {
+                'baseline': self.baseline_path,
+                'threshold': self.regression_threshold,
+                'alpha': self.regression_alpha,
+                'memory_sets': comparisons,
+            },
+        }
+
+        self.verbose_log(f"Comparison verdict: {self.results['verdict']}")
+
+        return self.results
+
+    def compare_memory(
             self,
             *,
-            new_memory: int,
-            new_timeout: int,
-            ) -> bool:
-        '''Set new memory for the Lambda'''
-        response = None
-        success = False
-        error = None
-
-        try:
-            response = update_lambda_config(
-                function_name=self.lambda_function,
-                memory_size=new_memory,
-                timeout=new_timeout,
+            memory: int,
+            architecture: str,
+            baseline: List,
+            ) -> Dict:
+        '''Sample a memory size in batches until the comparison is decided
+
+        The significance level is split across the planned looks at the data
+        (Bonferroni), so stopping early does not inflate false alarms.
+        '''
+        looks = max(math.ceil(
+            self.regression_max_samples / self.regression_batch_size), 1)
+        alpha = self.regression_alpha / looks
+        samples = SampleColumns()
+        comparison = {'verdict': None}
+
+        while comparison['verdict'] is None:
+            self.sample_invocations(
+                samples=samples,
+                count=self.regression_batch_size,
             )
 
-            success = self.is_lambda_response_success(
-                operation='set_memory',
-                response=response,
-            )
+            durations = samples.durations(
+                ignore_coldstart=self.ignore_coldstart)
+            final = len(samples) >= self.regression_max_samples
+
+            if len(durations) >= c.REGRESSION_MIN_SAMPLES:
+                comparison = sequential_test(
+                    baseline=baseline,
+                    current=durations,
+                    memory=memory,
+                    architecture=architecture,
+                    region=self.region,
+                    threshold=self.regression_threshold,
+                    alpha=alpha,
+                    final=final,
+                )
 
-        except Exception as exc:
-            error = custom_exc.SetLambdaMemoryError(
-                f'Cannot allocate new memory size ({new_memory} mb) to '
-                f'function ({self.lambda_function})'
-            )
+            elif final:
+                comparison['verdict'] = 'inconclusive'
+                comparison['errors'] = [
+                    f'Only {len(durations)} successful invocations'
+                ]
+                break
 
-            logger.warning(error)
-            logger.exception(exc)
+            self.verbose_log(
+                f'    {memory}: {len(durations)} samples, '
+                f"verdict: {comparison['verdict']}")
 
-        return response, success, error
+        comparison['invocations'] = len(samples)
 
-    def get_execution_time(self) -> Dict:
-        '''Invoke the Lambda function and check execution time'''
-        result = {
-            'success': False,
-            'error': None,
-            'duration': None,
-            'cold_start': False,
-        }
+        return dict(comparison, memory=memory, architecture=architecture)
 
-        try:
-            response = invoke_lambda(
-                function_name=self.lambda_function,
-                payload=self.lambda_event,
-                invocation_type='RequestResponse',
-                log_type='None',
-            )
+    def run_budgeted(
+            self,
+            *,
+            memory_sets: List[int],
+            architecture: str,
+            ) -> List[Dict]:
+        '''Benchmark memory sizes without spending more than the budget
+
+        A few probe invocations per size estimate the cost of a full sweep,
+        then a BudgetScheduler spreads the remaining samples where they
+        sharpen the cost ranking most. Sizes keep the samples collected
+        when the budget runs out. Probes are always run while some budget
+        remains, so a slow function can overshoot it by a few probes.
+        '''
+        scheduler = BudgetScheduler(
+            budget=self.budget - sum(
+                report['spent'] for report in self.budget_reports),
+            test_count=self.test_count,
+            architecture=architecture,
+            batch_size=self.batch_size,
+            timeout=self.timeout,
+            region=self.region,
+            ignore_coldstart=self.ignore_coldstart,
+        )
 
-            # Check whether payload has expected info
-            if type(response.get('Payload')) is not dict:
-                error = custom_exc.LambdaPayloadError(
-                    'Error in Lambda response Payload (type is not a Dict)'
-                )
+        results = {}
 
-                logger.warning(error)
+        for memory in memory_sets:
+            results[memory] = {
+                'memory': memory,
+                'architecture': architecture,
+                'success': True,
+                'samples': SampleColumns(),
+                'durations': [],
+                'average_duration': None,
+                'errors': [],
+            }
 
-                result['error'] = str(error)
+            # Probe costs are unknown until probed, only the spent is known
+            if scheduler.remaining <= 0:
+                error = 'Budget exhausted before probing this memory size'
 
-            elif type(response['Payload'].get('remaining_time')) is not int:
-                error = custom_exc.LambdaPayloadError(
-                    'No Integer "remaining_time" in Lambda Payload'
+            elif not self.apply_memory(memory=memory):
+                error = f'Cannot set memory ({memory})'
+
+            else:
+                samples = results[memory]['samples']
+
+                scheduler.add(memory=memory, samples=samples)
+
+                self.sample_invocations(
+                    samples=samples,
+                    count=c.BUDGET_PROBE_COUNT,
+                )
+                scheduler.charge(
+                    memory=memory,
+                    invocations=c.BUDGET_PROBE_COUNT,
                 )
 
-                logger.warning(error)
+                continue
 
-                result['error'] = str(error)
+            results[memory]['success'] = False
+            results[memory]['errors'].append(error)
 
-            else:
-                result['success'] = True
+        estimated_cost = scheduler.estimate()
 
-                result['duration'] = self.timeout - \
-                    response['Payload']['remaining_time']
+        self.verbose_log(
+            f'Estimated full sweep cost: US$ {estimated_cost}, '
+            f'budget: US$ {scheduler.budget}')
 
-                result['cold_start'] = \
-                    response['Payload'].get('cold_start', False)
+        while True:
+            batch = scheduler.next_batch()
 
-        except Exception as exc:
-            error = custom_exc.InvokeLambdaError(
-                f'Could not invoke Lambda ({self.lambda_function}) to check '
-                f'the execution time - Exception: {type(exc).__name__}'
+            if batch is None:
+                break
+
+            memory, invocations = batch
+
+            if memory != self.current_memory and \
+                    not self.apply_memory(memory=memory):
+                scheduler.drop(memory=memory)
+
+                continue
+
+            self.sample_invocations(
+                samples=results[memory]['samples'],
+                count=invocations,
             )
+            scheduler.charge(memory=memory, invocations=invocations)
 
-            logger.warning(error)
-            logger.exception(exc)
+        self.budget_reports.append(dict(
+            scheduler.report(),
+            estimated_cost=estimated_cost,
+        ))
 
-            result['error'] = str(error)
+        if scheduler.exhausted:
+            logger.warning(
+                f'Budget of US$ {scheduler.budget} spent before collecting '
+                f'{self.test_count} samples at every memory size'
+            )
 
-        return result
+        return [
+            self.complete_result(result=result) if result['success']
+            else result
+            for result in results.values()
+        ]
+
+    def sample_invocations(self, *, samples: SampleColumns, count: int):
+        '''Invoke the function count times concurrently, appending samples'''
+        invocations, control = self.invoke_batch(
+            count=count,
+            threads=min(self.max_threads, count),
+        )
 
-    def is_lambda_response_success(self, *, operation, response):
-        '''Validate Lambda response'''
-        if type(response) is not dict:
-            return False
+        for invocation in invocations:
+            samples.append(
+                invocation,
+                ignore_coldstart=self.ignore_coldstart,
+                control=control,
+            )
 
-        elif operation == 'get_lambda_config':
-            if 'Memory' in response and 'Timeout' in response:
-                return True
+    def invoke_batch(self, *, count: int, threads: int) -> tuple:
+        '''Invoke the function count times, alongside a control canary
 
-            else:
-                return False
+        Returns the invocations and the canary slowdown from its baseline
+        while they ran, 0 (zero) without a control canary.
+        '''
+        control = None
 
-        elif response['StatusCode'] in (200, 202, 204):
-            return True
+        with concurrent.futures.ThreadPoolExecutor(threads + 1) as executor:
+            if self.control_baseline is not None:
+                control = executor.submit(self.invoke_control)
 
-        else:
-            return False
+            invoke_futures = [
+                executor.submit(self.get_execution_time)
+                for i in range(0, count)
+            ]
 
-    def process_benchmark_results(self, *, results: Dict) -> Dict:
-        '''Process benchmark results'''
-        processed = {
-            'ranking': {
-                'cost': [],
-                'duration': [],
-            },
-            'logs': [],
-            'notes': [
-                'Lambda execution costs are in US$, following pricing page '
-                'as of March 25, 2019 (https://aws.amazon.com/lambda/pricing)',
-                'Lambda duration times are in milliseconds',
+            invocations = [
+                future.result()
+                for future in concurrent.futures.as_completed(invoke_futures)
             ]
-        }
 
-        for benchmark in results:
-            if not benchmark['success']:
-                processed['logs'].append({
-                    'memory': benchmark['memory'],
-                    'success': False,
-                    'errors': [str(error) for error in benchmark['errors']],
-                })
-                self.append_public_error(error=benchmark['errors'])
+        if control is None:
+            return invocations, 0.0
 
-                continue
+        duration = control.result()
 
-            # Calculate cost of execution for ranking
-            try:
-                execution_cost = lambda_execution_cost(
-                    memory=benchmark['memory'],
-                    duration=benchmark['average_duration'],
-                )
+        # A failed canary invocation carries over the last known slowdown
+        if duration is not None:
+            self.control_factor = duration / self.control_baseline['average']
 
-            except Exception as error:
-                logger.warning(error)
-                logger.exception(error)
-                self.append_public_error(error=error)
+        return invocations, self.control_factor
 
-                processed['logs'].append({
-                    'memory': benchmark['memory'],
-                    'success': False,
-                    'errors': [str(error)],
-                })
+    def invoke_control(self) -> Union[float, None]:
+        '''Duration of a control canary invocation, None when unusable'''
+        invocation = self.get_execution_time(
+            payload=self.control_payload,
+            function_name=self.control_function,
+            timeout=self.control_timeout,
+        )
 
-                continue
+        if not invocation.success or invocation.cold_start:
+            return None
 
-            # Populate financial performance ranking
-            processed['ranking']['cost'].append({
-                'memory': benchmark['memory'],
-                'cost': execution_cost,
-            })
+        return invocation.duration
 
-            # Populate speed performance ranking
+    def measure_control_baseline(self) -> Union[Dict, None]:
+        '''Average duration of the control canary before any measurement
+
+        The canary is a function, or a pinned alias (function:alias), whose
+        configuration never changes during the benchmark. It is invoked with
+        the benchmark event, serialized once so it stays the same.
+        '''
+        self.control_payload = self.lambda_payload
+        self.control_factor = 1.0
+
+        try:
+            config = get_lambda_config(
+                function_name=self.control_function,
+                region=self.region,
+            )
+            # Configurations are in seconds, remaining times in milliseconds
+            self.control_timeout = config['Timeout'] * 1000
+
+        except Exception as exc:
+            error = custom_exc.ControlCanaryError(
+                f'Could not get control canary ({self.control_function}) '
+                f'configuration - Exception: {type(exc).__name__}'
+            )
+
+            logger.warning(error)
+            self.append_public_error(error=error)
+
+            return None
+
+        durations = [
+            duration
+            for duration in (
+                self.invoke_control() for i in range(self.control_test_count)
+            )
+            if duration is not None
+        ]
+
+        if not durations:
+            error = custom_exc.ControlCanaryError(
+                'No durations were returned from invocations of the control '
+                f'canary ({self.control_function})'
+            )
+
+            logger.warning(error)
+            self.append_public_error(error=error)
+
+            return None
+
+        return {
+            'function': self.control_function,
+            'average': round(
+                sum(durations) / len(durations), c.DURATION_DECIMALS),
+            'samples': len(durations),
+        }
+
+    def serialize_event(self, event: Union[Dict, None] = None) -> bytes:
+        '''Serialize the Lambda event, asking for batch_size iterations'''
+        event = self.lambda_event if event is None else event
+
+        if self.batch_size > 1:
+            return json_dumps(dict(
+                event,
+                **{c.BATCH_ITERATIONS_KEY: self.batch_size},
+            ))
+
+        return json_dumps(event)
+
+    def function_identity(self, *, function_name: str) -> Dict:
+        '''Code hash and runtime identifying a function deployment'''
+        if function_name not in self.function_identities:
+            try:
+                config = get_lambda_config(
+                    function_name=function_name,
+                    region=self.region,
+                )
+
+            except Exception as exc:
+                logger.warning(
+                    f'Cannot get Lambda ({function_name}) code identity')
+                logger.exception(exc)
+
+                config = {}
+
+            self.function_identities[function_name] = {
+                'code_sha256': config.get('CodeSha256'),
+                'runtime': config.get('Runtime'),
+            }
+
+        return self.function_identities[function_name]
+
+    def cache_key(
+            self,
+            *,
+            memory: int,
+            architecture: str,
+            ) -> Union[str, None]:
+        '''Result cache key, None when the function code is unknown'''
+        function_name = self.architecture_functions.get(
+            architecture, self.lambda_function)
+
+        identity = self.function_identity(function_name=function_name)
+
+        if not identity['code_sha256']:
+            return None
+
+        return ResultCache.key(
+            code_sha256=identity['code_sha256'],
+            architecture=architecture,
+            runtime=identity['runtime'],
+            memory=memory,
+            event=hashlib.sha256(self.lambda_payload).hexdigest(),
+            **{name: getattr(self, name) for name in c.CACHE_KEY_ATTRIBUTES},
+        )
+
+    def get_cached_result(
+            self,
+            *,
+            memory: int,
+            architecture: str,
+            ) -> Union[Dict, None]:
+        '''Get a previous benchmark result from the cache, if any'''
+        if self.result_cache is None or self.force_refresh:
+            return None
+
+        # Normalized durations are relative to this run's canary baseline
+        if self.control_function is not None:
+            return None
+
+        key = self.cache_key(memory=memory, architecture=architecture)
+
+        if key is None:
+            return None
+
+        cached = self.result_cache.get(key)
+
+        if cached is not None:
+            self.verbose_log(
+                f'  CACHED memory: {memory} ({architecture})')
+
+            cached = dict(cached, cached=True)
+
+        return cached
+
+    def cache_result(self, *, result: Dict):
+        '''Store a successful benchmark result in the cache'''
+        if self.result_cache is None or not result['success']:
+            return None
+
+        if self.control_function is not None:
+            return None
+
+        key = self.cache_key(
+            memory=result['memory'],
+            architecture=result['architecture'],
+        )
+
+        if key is None:
+            return None
+
+        cacheable = {
+            name: value
+            for name, value in result.items()
+            if name != 'samples'
+        }
+        cacheable['durations'] = list(result['durations'])
+
+        if 'hardware_durations' in result:
+            cacheable['hardware_durations'] = {
+                hardware: list(durations)
+                for hardware, durations in
+                result['hardware_durations'].items()
+            }
+
+        self.result_cache.set(key, cacheable)
+
+    def export_results(self, *, results: List[Dict]) -> List[Dict]:
+        '''Export the raw samples of results to columnar files
+
+        Cached results keep no raw samples, they are not exported again.
+        '''
+        reports = []
+
+        for result in results:
+            if result.get('samples') is None:
+                continue
+
+            try:
+                report = export_samples(
+                    samples=result['samples'],
+                    directory=self.export_path,
+                    function_name=self.architecture_functions.get(
+                        result['architecture'], self.lambda_function),
+                    memory=result['memory'],
+                    architecture=result['architecture'],
+                    export_format=self.export_format,
+                )
+
+            except OSError as error:
+                logger.warning(f'Could not export samples: {error}')
+                self.append_public_error(error=error)
+
+                continue
+
+            reports.append({
+                'memory': report['memory'],
+                'architecture': report['architecture'],
+                'path': report['path'],
+                'format': report['format'],
+                'rows': report['rows'],
+            })
+
+        return reports
+
+    def switch_architecture(
+            self,
+            *,
+            architecture: str,
+            allow_twin: bool = True,
+            ) -> tuple:
+        '''Point benchmark invocations to a function on a given architecture
+
+        Uses the twin function configured for the architecture, if any, or
+        else redeploys the benchmarked function code on that architecture.
+        '''
+        self.verbose_log(f'Switching to architecture: {architecture}')
+
+        twin_function = self.architecture_functions.get(architecture)
+
+        if allow_twin and twin_function:
+            self.active_function = twin_function
+
+            if twin_function not in self.twin_original_configs:
+                try:
+                    config = get_lambda_config(
+                        function_name=twin_function,
+                        region=self.region,
+                    )
+
+                    self.twin_original_configs[twin_function] = {
+                        'memory': config['Memory'],
+                        'timeout': config['Timeout'],
+                    }
+
+                except Exception as exc:
+                    error = custom_exc.SetLambdaArchitectureError(
+                        f'Cannot get twin function ({twin_function}) of '
+                        f'architecture ({architecture}) - Exception: '
+                        f'{type(exc).__name__}'
+                    )
+
+                    logger.warning(error)
+                    logger.exception(exc)
+
+                    self.active_function = self.lambda_function
+
+                    return False, error
+
+            return True, None
+
+        self.active_function = self.lambda_function
+
+        if architecture == self.current_architecture:
+            return True, None
+
+        success = False
+        error = None
+
+        with self.tracer.span(
+                'architecture_update',
+                function=self.lambda_function,
+                architecture=architecture) as span:
+            try:
+                response = update_lambda_architecture(
+                    function_name=self.lambda_function,
+                    region=self.region,
+                    architecture=architecture,
+                )
+
+                success = self.is_lambda_response_success(
+                    operation='set_architecture',
+                    response=response,
+                )
+
+            except Exception as exc:
+                logger.exception(exc)
+
+            if not success:
+                span['outcome'] = 'SetLambdaArchitectureError'
+
+        self.metrics.inc(
+            'config_updates',
+            function=self.lambda_function,
+            setting='architecture',
+        )
+
+        if success:
+            self.current_architecture = architecture
+
+            self.wait_until_ready(seconds=c.SLEEP_AFTER_NEW_ARCHITECTURE_SET)
+
+        else:
+            error = custom_exc.SetLambdaArchitectureError(
+                f'Cannot switch function ({self.lambda_function}) to '
+                f'architecture ({architecture})'
+            )
+
+            logger.warning(error)
+
+        return success, error
+
+    def benchmark_memory(
+            self,
+            *,
+            memory: int,
+            architecture: str = c.DEFAULT_ARCHITECTURE,
+            ) -> Dict:
+        '''Benchmark a given memory size'''
+        self.verbose_log(
+            f'  START benchmarking memory: {memory} ({architecture})')
+
+        result = {
+            'memory': memory,
+            'architecture': architecture,
+            'success': True,
+            'samples': None,
+            'durations': [],
+            'average_duration': None,
+            'errors': [],
+        }
+
+        response, success, error = self.set_new_config(
+            new_memory=memory,
+            new_timeout=self.timeout,
+        )
+
+        if not success:
+            result['success'] = False
+            result['errors'].append(str(error))
+
+            logger.warning(error)
+            logger.warning(f'Lambda API response: {str(response)}')
+
+            return result
+
+        self.current_memory = memory
+
+        self.wait_until_ready(seconds=c.SLEEP_AFTER_NEW_MEMORY_SET)
+
+        if self.mode == c.MODE_LOAD:
+            result['samples'], result['load'] = self.get_load_results()
+
+        elif self.mode == c.MODE_ASYNC:
+            result['samples'], result['async'] = self.get_async_results()
+
+        elif self.mode == c.MODE_REPLAY:
+            result['samples'], result['replay'] = self.get_replay_results(
+                memory=memory,
+                architecture=architecture,
+            )
+
+        else:
+            result['samples'] = self.get_benchmark_durations()
+
+        if self.scaling_probe:
+            result['scaling'] = self.probe_scaling()
+
+        if self.concurrency_sweep:
+            result['concurrency'] = self.sweep_concurrency()
+
+        self.complete_result(result=result)
+
+        self.verbose_log(f'  DONE benchmarking memory: {memory}')
+
+        return result
+
+    def complete_result(self, *, result: Dict) -> Dict:
+        '''Set the durations and average duration of a result's samples'''
+        if result['samples'] is None and 'load' in result:
+            return self.complete_sketched_result(result=result)
+
+        # A replay reproduces the cold starts of the trace, they are kept
+        ignore_coldstart = self.ignore_coldstart and 'replay' not in result
+
+        result['durations'] = result['samples'].durations(
+            ignore_coldstart=ignore_coldstart,
+        )
+
+        if len(result['durations']) == 0:
+            error = custom_exc.InvokeLambdaError(
+                'No durations were returned from invocations of Lambda '
+                f"({self.lambda_function}) with memory {result['memory']}"
+            )
+
+            result['success'] = False
+            result['errors'].append(error)
+
+            logger.warning(error)
+
+            return result
+
+        controls = result['samples'].controls(
+            ignore_coldstart=ignore_coldstart,
+        )
+
+        # Durations measured alongside a canary are ranked normalized
+        if any(controls):
+            raw = result['durations']
+            result['durations'] = result['samples'].normalized_durations(
+                ignore_coldstart=ignore_coldstart,
+            )
+            result['raw_average_duration'] = round(
+                sum(raw) / len(raw), c.DURATION_DECIMALS)
+            result['control'] = summarize_control(
+                raw=raw,
+                normalized=result['durations'],
+                controls=controls,
+            )
+
+        result['average_duration'] = round(
+            sum(result['durations']) / len(result['durations']),
+            c.DURATION_DECIMALS,
+        )
+
+        # Broken down by hardware class on the same, normalized, durations
+        by_hardware = result['samples'].durations_by_hardware(
+            ignore_coldstart=ignore_coldstart,
+            normalized=True,
+        )
+
+        if by_hardware:
+            result['hardware'] = summarize_hardware(by_hardware)
+            result['hardware_durations'] = by_hardware
+
+        return result
+
+    def complete_sketched_result(self, *, result: Dict) -> Dict:
+        '''Set the average and percentiles of a load test's duration sketch
+
+        Load tests without raw samples keep no durations, so their sizes are
+        ranked but left out of significance statistics.
+        '''
+        sketch = QuantileSketch.from_dict(result['load']['duration_sketch'])
+        result['durations'] = []
+
+        if not sketch.count:
+            error = custom_exc.InvokeLambdaError(
+                'No durations were returned from invocations of Lambda '
+                f"({self.lambda_function}) with memory {result['memory']}"
+            )
+
+            result['success'] = False
+            result['errors'].append(error)
+
+            logger.warning(error)
+
+            return result
+
+        result['average_duration'] = round(
+            sketch.sum / sketch.count, c.DURATION_DECIMALS)
+        result['percentiles'] = sketch.percentiles()
+
+        return result
+
+    def get_benchmark_durations(self) -> SampleColumns:
+        '''Run benchmarking of a given memory size
+
+        Batched invocations return batch_size samples each, so fewer
+        invocations are needed to collect test_count samples.
+        '''
+        samples = SampleColumns()
+        runs = 0
+        max_runs = self.test_count / (self.max_threads * self.batch_size) + 5
+
+        while samples.valid_count < self.test_count:
+            pending = self.test_count - samples.valid_count
+            threads = min(
+                self.max_threads,
+                math.ceil(pending / self.batch_size),
+            )
+
+            self.verbose_log(
+                f'    Pending checks: {pending}, threads: {threads}')
+
+            invocations, control = self.invoke_batch(
+                count=threads,
+                threads=threads,
+            )
+
+            for invocation in invocations:
+                samples.append(
+                    invocation,
+                    ignore_coldstart=self.ignore_coldstart,
+                    control=control,
+                )
+
+            self.verbose_log(f'    Durations count: {samples.valid_count}')
+
+            # Avoid falling in an infinite loop
+            if runs >= max_runs:
+                break
+            else:
+                runs += 1
+
+        return samples
+
+    def calibrate_workload(self) -> Dict:
+        '''Search a workload size whose durations land in the target window
+
+        The calibration parameter is an integer event value that makes the
+        workload longer as it grows (e.g. Fibonacci's 'n'). An exponential
+        search, then a binary search, at the largest memory size finds the
+        smallest value reaching the window's low end. The value is then
+        checked against the window's high end at the smallest memory size.
+        '''
+        low_ms, high_ms = self.calibration_window
+        parameter = self.calibration_parameter
+        smallest = min(self.memory_sets)
+        largest = max(self.memory_sets)
+
+        self.verbose_log(
+            f'Calibrating "{parameter}" for durations of '
+            f'{low_ms}-{high_ms} ms')
+
+        result = {
+            'parameter': parameter,
+            'value': self.lambda_event[parameter],
+            'window': [low_ms, high_ms],
+            'fits': False,
+            'durations': [],
+            'probes': [],
+        }
+
+        if not self.apply_memory(memory=largest):
+            return result
+
+        measured = {}
+
+        def long_enough(value: int) -> bool:
+            # Failed invocations (e.g. timeouts) count as too long
+            if value not in measured:
+                measured[value] = self.measure_workload(value=value)
+                result['probes'].append({
+                    'memory': largest,
+                    'value': value,
+                    'duration': measured[value],
+                })
+
+            return measured[value] is None or measured[value] >= low_ms
+
+        # Exponential search bracketing the smallest long enough value
+        value = self.lambda_event[parameter]
+        step = 1
+
+        if long_enough(value):
+            upper = value
+            lower = max(value - step, 0)
+
+            while lower > 0 and long_enough(lower) and \
+                    len(measured) < c.CALIBRATION_MAX_PROBES:
+                upper = lower
+                step *= 2
+                lower = max(upper - step, 0)
+
+        else:
+            lower = value
+            upper = value + step
+
+            while not long_enough(upper) and \
+                    len(measured) < c.CALIBRATION_MAX_PROBES:
+                lower = upper
+                step *= 2
+                upper = lower + step
+
+        # Binary search within the bracket
+        while upper - lower > 1 and len(measured) < c.CALIBRATION_MAX_PROBES:
+            middle = (lower + upper) // 2
+
+            if long_enough(middle):
+                upper = middle
+
+            else:
+                lower = middle
+
+        result['value'] = upper
+        result['durations'].append({
+            'memory': largest,
+            'duration': measured.get(upper),
+        })
+
+        if smallest != largest and self.apply_memory(memory=smallest):
+            result['durations'].append({
+                'memory': smallest,
+                'duration': self.measure_workload(value=upper),
+            })
+
+        result['fits'] = all(
+            item['duration'] is not None and
+            low_ms <= item['duration'] <= high_ms
+            for item in result['durations']
+        ) and len(result['durations']) == len({smallest, largest})
+
+        if not result['fits']:
+            logger.warning(
+                f'No "{parameter}" value keeps durations within '
+                f'{low_ms}-{high_ms} ms at every memory size, using {upper} '
+                f"(durations: {result['durations']})"
+            )
+
+        self.lambda_event = dict(self.lambda_event, **{parameter: upper})
+        self.lambda_payload = self.serialize_event()
+
+        self.verbose_log(f'Calibrated "{parameter}": {upper}')
+
+        return result
+
+    def apply_memory(self, *, memory: int) -> bool:
+        '''Set a memory size and wait for it to be ready, True if applied'''
+        response, success, error = self.set_new_config(
+            new_memory=memory,
+            new_timeout=self.timeout,
+        )
+
+        if not success:
+            logger.warning(error)
+
+            return False
+
+        self.current_memory = memory
+
+        self.wait_until_ready(seconds=c.SLEEP_AFTER_NEW_MEMORY_SET)
+
+        return True
+
+    def measure_workload(self, *, value: int) -> Union[float, None]:
+        '''Median warm duration with the calibration parameter set to value
+
+        None when no invocation succeeded, e.g. all timed out.
+        '''
+        self.lambda_payload = self.serialize_event(dict(
+            self.lambda_event,
+            **{self.calibration_parameter: value},
+        ))
+
+        samples = SampleColumns()
+
+        for i in range(self.calibration_test_count):
+            samples.append(self.get_execution_time())
+
+        durations = samples.durations(ignore_coldstart=True)
+
+        if not durations:
+            return None
+
+        return statistics.median(durations)
+
+    def find_memory_floor(self) -> Dict:
+        '''Binary search the lowest memory size that safely fits the workload
+
+        A size fits when no invocation runs out of memory and the peak Max
+        Memory Used stays under the memory size minus the headroom percent.
+        '''
+        self.verbose_log(
+            f'Searching memory floor with {self.memory_headroom}% headroom')
+
+        candidates = [
+            memory
+            for memory in sorted(c.LAMBDA_COST_BY_MEMORY)
+            if min(self.memory_sets) <= memory <= max(self.memory_sets)
+        ]
+
+        result = {
+            'floor': None,
+            'headroom': self.memory_headroom,
+            'pruned': [],
+            'probes': [],
+        }
+
+        low = 0
+        high = len(candidates) - 1
+
+        while low <= high:
+            middle = (low + high) // 2
+            probe = self.probe_memory(memory=candidates[middle])
+
+            result['probes'].append(probe)
+
+            if probe['fits']:
+                result['floor'] = candidates[middle]
+                high = middle - 1
+
+            else:
+                low = middle + 1
+
+        if result['floor'] is None:
+            error = custom_exc.MemoryFloorError(
+                f'No memory size up to {max(self.memory_sets)} mb fits '
+                f'Lambda ({self.lambda_function}) with '
+                f'{self.memory_headroom}% headroom'
+            )
+
+            self.append_public_error(error=error)
+
+            logger.warning(error)
+
+        else:
+            result['pruned'] = [
+                memory for memory in self.memory_sets
+                if memory < result['floor']
+            ]
+
+        self.verbose_log(f"Memory floor: {result['floor']}")
+
+        return result
+
+    def probe_memory(self, *, memory: int) -> Dict:
+        '''Measure peak memory usage and OOM errors at a memory size'''
+        self.verbose_log(f'  Probing memory usage at: {memory}')
+
+        probe = {
+            'memory': memory,
+            'fits': False,
+            'max_memory_used': None,
+            'out_of_memory': 0,
+            'errors': 0,
+        }
+
+        if not self.apply_memory(memory=memory):
+            return probe
+
+        samples = SampleColumns()
+
+        self.sample_invocations(samples=samples, count=self.floor_test_count)
+
+        out_of_memory_code = c.SAMPLE_ERROR_CODES['LambdaOutOfMemoryError']
+        success_code = c.SAMPLE_ERROR_CODES[None]
+
+        probe['out_of_memory'] = samples.error_code.count(out_of_memory_code)
+        probe['errors'] = len(samples) - \
+            samples.error_code.count(success_code)
+
+        if any(samples.max_memory_used):
+            probe['max_memory_used'] = max(samples.max_memory_used)
+
+        probe['fits'] = \
+            probe['out_of_memory'] == 0 and \
+            probe['max_memory_used'] is not None and \
+            probe['max_memory_used'] <= \
+            memory * (1 - self.memory_headroom / 100)
+
+        return probe
+
+    def probe_scaling(self) -> Union[Dict, None]:
+        '''Multi-core scaling report of the scaling probe function
+
+        The probe times a CPU kernel on 1..scaling_max_workers processes and
+        reports the speedup and efficiency of each, and its effective vCPU
+        count (highest speedup reached).
+        '''
+        try:
+            response = invoke_lambda(
+                function_name=self.active_function,
+                region=self.region,
+                payload=json_dumps(dict(
+                    self.lambda_event,
+                    max_workers=self.scaling_max_workers,
+                )),
+                invocation_type='RequestResponse',
+                max_connections=self.max_connections,
+            )
+
+        except Exception as exc:
+            logger.warning(
+                f'Could not invoke Lambda ({self.active_function}) to probe '
+                f'multi-core scaling - Exception: {type(exc).__name__}'
+            )
+
+            return None
+
+        payload = response.get('Payload')
+
+        if type(payload) is not dict or \
+                type(payload.get('scaling')) is not dict:
+            logger.warning(custom_exc.LambdaPayloadError(
+                'No "scaling" report in Lambda Payload, is '
+                f'({self.active_function}) the scaling probe function?'
+            ))
+
+            return None
+
+        return payload['scaling']
+
+    def sweep_concurrency(self) -> List[Dict]:
+        '''Measure the current memory size at each concurrency level
+
+        Levels double from 1 to concurrency_max. Each level measures at
+        least concurrency_test_count invocations, in steady state.
+        '''
+        levels = []
+
+        for concurrency in concurrency_levels(self.concurrency_max):
+            requests = max(
+                self.concurrency_test_count,
+                concurrency * c.CONCURRENCY_MIN_ROUNDS,
+            )
+
+            self.verbose_log(
+                f'    Concurrency: {concurrency}, requests: {requests}')
+
+            samples, elapsed = self.measure_concurrency(
+                concurrency=concurrency,
+                requests=requests,
+            )
+
+            levels.append(summarize_level(
+                concurrency=concurrency,
+                samples=samples,
+                elapsed=elapsed,
+            ))
+
+        return levels
+
+    def measure_concurrency(
+            self,
+            *,
+            concurrency: int,
+            requests: int,
+            ) -> tuple:
+        '''Run requests with a fixed number of invocations in flight
+
+        Each worker first sends an unmeasured warm-up invocation, which
+        absorbs the cold starts of the new sandboxes. Workers then invoke in
+        a closed loop until all requests were sent, so throughput is only
+        measured once every worker is warm.
+        '''
+        samples = SampleColumns()
+        lock = threading.Lock()
+        sent = 0
+        start = []
+        barrier = threading.Barrier(
+            concurrency, action=lambda: start.append(time.perf_counter()))
+
+        def worker():
+            nonlocal sent
+
+            self.get_execution_time()
+            barrier.wait()
+
+            while True:
+                with lock:
+                    if sent >= requests:
+                        return
+
+                    sent += 1
+
+                invocation = self.get_execution_time()
+
+                with lock:
+                    samples.append(invocation, ignore_coldstart=False)
+
+        with concurrent.futures.ThreadPoolExecutor(
+                concurrency, thread_name_prefix='concurrency') as executor:
+            for future in [
+                    executor.submit(worker) for i in range(concurrency)]:
+                future.result()
+
+        return samples, time.perf_counter() - start[0]
+
+    def get_load_results(self) -> tuple:
+        '''Run an open-loop load test on the current memory size'''
+        self.verbose_log(
+            f'    Load test: {self.load_rate} req/s ({self.load_arrivals}) '
+            f'for {self.load_duration} seconds')
+
+        generator = LoadGenerator(
+            invoke=self.get_execution_time,
+            rate=self.load_rate,
+            duration=self.load_duration,
+            arrivals=self.load_arrivals,
+            ignore_coldstart=self.ignore_coldstart,
+            # Raw samples are only needed to export them
+            keep_samples=self.export_path is not None,
+        )
+
+        statistics = generator.run()
+
+        self.verbose_log(
+            f"    Achieved throughput: {statistics['achieved_throughput']} "
+            f"req/s, throttle rate: {statistics['throttle_rate']}")
+
+        return generator.samples, statistics
+
+    def get_replay_results(
+            self,
+            *,
+            memory: int,
+            architecture: str,
+            ) -> tuple:
+        '''Replay the traffic trace on the current memory size
+
+        Every invocation that ran is priced, cold starts and errors
+        included, so the total cost is what serving the trace would cost at
+        this memory size. Throttled requests, which are not billed, are not.
+        '''
+        self.verbose_log(
+            f'    Replaying {len(self.replay_requests)} requests '
+            f'({self.replay_speedup}x speed)')
+
+        replayer = TraceReplayer(
+            invoke=lambda payload: self.get_execution_time(payload=payload),
+            requests=self.replay_requests,
+            speedup=self.replay_speedup,
+        )
+
+        statistics = replayer.run()
+        samples = replayer.samples
+        billed_errors = [
+            c.SAMPLE_ERROR_CODES[name] for name in c.BILLED_SAMPLE_ERRORS]
+
+        # Errors are billed up to their wall time, as their duration is
+        # unknown. Billed in 100ms increments, priced once in total.
+        billed_duration = sum(
+            math.ceil(duration / 100) * 100
+            for duration in samples.durations(ignore_coldstart=False)
+        ) + sum(
+            math.ceil(min(samples.overhead[index], self.timeout) / 100) * 100
+            for index in range(len(samples))
+            if samples.error_code[index] in billed_errors
+        )
+
+        statistics['total_cost'] = round(
+            lambda_execution_cost(
+                memory=memory,
+                duration=billed_duration,
+                architecture=architecture,
+                region=self.region,
+            ) + statistics['requests'] * c.LAMBDA_REQUEST_COST,
+            6,
+        )
+
+        self.verbose_log(
+            f"    Total cost: {statistics['total_cost']}, cold start rate: "
+            f"{statistics['cold_start_rate']}")
+
+        return samples, statistics
+
+    def correlated_payload(self, *, correlation_id: str) -> bytes:
+        '''Serialized event tagged with a correlation ID
+
+        Splices the ID into the pre-serialized event instead of serializing
+        the event again for every invocation.
+        '''
+        tag = json_dumps({c.CORRELATION_ID_KEY: correlation_id})
+
+        if self.lambda_payload.strip() == b'{}':
+            return tag
+
+        return tag[:-1] + b',' + self.lambda_payload.lstrip()[1:]
+
+    def fire_async_invocation(self, *, correlation_id: str) -> bool:
+        '''Send an asynchronous ('Event') invocation, True if accepted'''
+        self.metrics.inc(
+            'async_invocations',
+            function=self.active_function,
+            memory=self.current_memory,
+        )
+
+        try:
+            response = invoke_lambda(
+                function_name=self.active_function,
+                region=self.region,
+                payload=self.correlated_payload(correlation_id=correlation_id),
+                invocation_type='Event',
+                max_connections=self.max_connections,
+            )
+
+            return self.is_lambda_response_success(
+                operation='invoke_async',
+                response=response,
+            )
+
+        except Exception as exc:
+            if is_throttling_error(exc):
+                logger.warning(
+                    f'Async invocation of Lambda ({self.active_function}) '
+                    'was throttled'
+                )
+
+            else:
+                logger.exception(exc)
+
+            return False
+
+    def get_async_results(self) -> tuple:
+        '''Fan out async invocations and collect their results from a queue
+
+        Fires enough invocations for test_count samples, each tagged with a
+        correlation ID, and drains the collector in batches until every
+        result arrived or the async_timeout elapsed.
+        '''
+        if self.collector is None:
+            self.collector = SQSCollector(
+                queue_url=self.collector_queue_url,
+                region=self.region,
+            )
+
+        invocation_count = math.ceil(self.test_count / self.batch_size)
+        correlation_ids = [uuid.uuid4().hex for i in range(invocation_count)]
+        start = time.perf_counter()
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_threads) as pool:
+            accepted = list(pool.map(
+                lambda correlation_id: self.fire_async_invocation(
+                    correlation_id=correlation_id),
+                correlation_ids,
+            ))
+
+        fire_elapsed = time.perf_counter() - start
+
+        pending = {
+            correlation_id
+            for correlation_id, fired in zip(correlation_ids, accepted)
+            if fired
+        }
+        fired_count = len(pending)
+
+        self.verbose_log(
+            f'    Fired {fired_count} async invocations in '
+            f'{fire_elapsed:.2f} seconds')
+
+        samples = SampleColumns()
+        deadline = start + self.async_timeout
+
+        while pending and time.perf_counter() < deadline:
+            for record in self.collector.drain():
+                request = record.get('requestPayload') or {}
+                correlation_id = request.get(c.CORRELATION_ID_KEY)
+
+                # Ignore stale records from other runs or memory sizes
+                if correlation_id not in pending:
+                    continue
+
+                pending.discard(correlation_id)
+                samples.append(
+                    self.parse_async_record(record=record),
+                    ignore_coldstart=self.ignore_coldstart,
+                )
+
+        for correlation_id in pending:
+            invocation = Invocation()
+            invocation.set_error(custom_exc.AsyncResultMissingError(
+                f'No result collected for invocation ({correlation_id})'
+            ))
+            samples.append(invocation)
+
+        statistics = {
+            'fired': fired_count,
+            'fire_errors': invocation_count - fired_count,
+            'fire_rate': round(fired_count / fire_elapsed, 3)
+            if fire_elapsed else None,
+            'received': fired_count - len(pending),
+            'missing': len(pending),
+            'elapsed': round(time.perf_counter() - start, 3),
+        }
+
+        return samples, statistics
+
+    def parse_async_record(self, *, record: Dict) -> Invocation:
+        '''Build an invocation from a Lambda destination record'''
+        result = Invocation()
+
+        condition = (record.get('requestContext') or {}).get('condition')
+        payload = record.get('responsePayload')
+
+        if condition not in (None, 'Success'):
+            result.set_error(custom_exc.InvokeLambdaError(
+                f'Async invocation failed ({condition})'
+            ))
+
+        elif type(payload) is not dict or \
+                type(payload.get('remaining_time')) is not int:
+            result.set_error(custom_exc.LambdaPayloadError(
+                'No Integer "remaining_time" in async result payload'
+            ))
+
+        else:
+            result.success = True
+            result.duration = self.timeout - payload['remaining_time']
+            result.cold_start = payload.get('cold_start', False)
+            result.iterations = self.parse_iterations(payload=payload)
+            result.hardware = hardware_class(
+                payload.get(c.CPU_FINGERPRINT_KEY))
+
+        return result
+
+    def parse_iterations(self, *, payload: Dict) -> Union[List, None]:
+        '''Per-iteration durations reported by a batched invocation'''
+        if self.batch_size == 1:
+            return None
+
+        durations = payload.get(c.BATCH_DURATIONS_KEY)
+
+        if type(durations) is not list or not durations:
+            logger.warning(
+                f'No "{c.BATCH_DURATIONS_KEY}" in Lambda Payload, using the '
+                'invocation duration as a single sample'
+            )
+
+            return None
+
+        return durations
+
+    def set_new_config(
+            self,
+            *,
+            new_memory: int,
+            new_timeout: int,
+            ) -> bool:
+        '''Set new memory for the Lambda'''
+        response = None
+        success = False
+        error = None
+
+        with self.tracer.span(
+                'config_update',
+                function=self.active_function,
+                memory=new_memory,
+                timeout=new_timeout) as span:
+            try:
+                response = update_lambda_config(
+                    function_name=self.active_function,
+                    region=self.region,
+                    memory_size=new_memory,
+                    timeout=new_timeout,
+                )
+
+                success = self.is_lambda_response_success(
+                    operation='set_memory',
+                    response=response,
+                )
+
+            except Exception as exc:
+                error = custom_exc.SetLambdaMemoryError(
+                    f'Cannot allocate new memory size ({new_memory} mb) to '
+                    f'function ({self.active_function})'
+                )
+
+                logger.warning(error)
+                logger.exception(exc)
+
+            if not success:
+                span['outcome'] = type(error).__name__ if error else 'failed'
+
+        self.metrics.inc(
+            'config_updates',
+            function=self.active_function,
+            setting='memory',
+        )
+
+        return response, success, error
+
+    def wait_until_ready(self, *, seconds: float):
+        '''Wait for a configuration change to propagate'''
+        with self.tracer.span('readiness_wait', seconds=seconds):
+            time.sleep(seconds)
+
+    def get_execution_time(
+            self,
+            *,
+            payload: Union[bytes, None] = None,
+            function_name: Union[str, None] = None,
+            timeout: Union[int, None] = None,
+            ) -> Invocation:
+        '''Invoke the Lambda function and check execution time
+
+        Sends the benchmark event, or the given serialized payload, to the
+        function benchmarked or another one configured with `timeout`.
+        '''
+        function_name = function_name or self.active_function
+        timeout = timeout or self.timeout
+        result = Invocation()
+        span = None
+        latency = None
+        retries = 0
+
+        try:
+            start = time.perf_counter()
+
+            with self.tracer.span(
+                    'invocation',
+                    function=function_name,
+                    memory=self.current_memory) as span:
+                response = invoke_lambda(
+                    function_name=function_name,
+                    region=self.region,
+                    payload=payload or self.lambda_payload,
+                    invocation_type='RequestResponse',
+                    log_type=self.log_type,
+                    max_connections=self.max_connections,
+                )
+
+            elapsed = (time.perf_counter() - start) * 1000
+            latency = elapsed
+            retries = (response.get('ResponseMetadata') or {}).get(
+                'RetryAttempts', 0)
+
+            # Keep only the payload fields needed, not the whole response
+            payload = response.get('Payload')
+            report = parse_invocation_report(response=response)
+
+            result.max_memory_used = report['max_memory_used']
+
+            if report['out_of_memory']:
+                error = custom_exc.LambdaOutOfMemoryError(
+                    f'Lambda ({function_name}) ran out of memory'
+                )
+
+                logger.warning(error)
+
+                result.set_error(error)
+
+            # Check whether payload has expected info
+            elif type(payload) is not dict:
+                error = custom_exc.LambdaPayloadError(
+                    'Error in Lambda response Payload (type is not a Dict)'
+                )
+
+                logger.warning(error)
+
+                result.set_error(error)
+
+            elif type(payload.get('remaining_time')) is not int:
+                error = custom_exc.LambdaPayloadError(
+                    'No Integer "remaining_time" in Lambda Payload'
+                )
+
+                logger.warning(error)
+
+                result.set_error(error)
+
+            else:
+                result.success = True
+                result.duration = timeout - payload['remaining_time']
+                result.overhead = max(elapsed - result.duration, 0.0)
+                result.cold_start = payload.get('cold_start', False)
+                result.iterations = self.parse_iterations(payload=payload)
+                result.hardware = hardware_class(
+                    payload.get(c.CPU_FINGERPRINT_KEY))
+
+        except Exception as exc:
+            if is_throttling_error(exc):
+                error = custom_exc.LambdaThrottledError(
+                    f'Invocation of Lambda ({function_name}) was throttled'
+                )
+
+                logger.warning(error)
+
+            else:
+                error = custom_exc.InvokeLambdaError(
+                    f'Could not invoke Lambda ({function_name}) to check '
+                    f'the execution time - Exception: '
+                    f'{type(exc).__name__}'
+                )
+
+                logger.warning(error)
+                logger.exception(exc)
+
+            result.set_error(error)
+
+        # Failures have no duration, their wall time bounds what is billed
+        if not result.success:
+            result.overhead = (time.perf_counter() - start) * 1000
+
+        if span is not None:
+            span['outcome'] = 'ok' if result.success \
+                else c.SAMPLE_ERROR_NAMES[result.error_code]
+
+            # Cold start invocations are the warm-up of a new configuration
+            if result.cold_start:
+                span['name'] = 'warm_up'
+
+        self.record_invocation_metrics(
+            result=result,
+            latency=latency,
+            retries=retries,
+            function_name=function_name,
+        )
+
+        return result
+
+    def record_invocation_metrics(
+            self,
+            *,
+            result: Invocation,
+            latency: Union[float, None],
+            retries: int,
+            function_name: Union[str, None] = None,
+            ):
+        '''Update metrics for an invocation'''
+        labels = {
+            'function': function_name or self.active_function,
+            'memory': self.current_memory,
+        }
+
+        if self.region is not None:
+            labels['region'] = self.region
+
+        self.metrics.inc('invocations', **labels)
+
+        if result.cold_start:
+            self.metrics.inc('cold_starts', **labels)
+
+        if retries:
+            self.metrics.inc('retries', retries, **labels)
+
+        if not result.success:
+            error_name = c.SAMPLE_ERROR_NAMES[result.error_code]
+
+            self.metrics.inc('errors', error=error_name, **labels)
+
+            if error_name == 'LambdaThrottledError':
+                self.metrics.inc('throttles', **labels)
+
+        if latency is not None:
+            self.metrics.observe('invocation_latency', latency, **labels)
+
+    def is_lambda_response_success(self, *, operation, response):
+        '''Validate Lambda response'''
+        if type(response) is not dict:
+            return False
+
+        elif operation == 'get_lambda_config':
+            if 'Memory' in response and 'Timeout' in response:
+                return True
+
+            else:
+                return False
+
+        status_code = response.get(
+            'StatusCode',
+            response.get('ResponseMetadata', {}).get('HTTPStatusCode'),
+        )
+
+        if status_code in (200, 202, 204):
+            return True
+
+        else:
+            return False
+
+    def process_benchmark_results(self, *, results: Dict) -> Dict:
+        '''Process benchmark results'''
+        processed = {
+            'ranking': {
+                'cost': [],
+                'duration': [],
+            },
+            'logs': [],
+            'notes': [
+                'Lambda execution costs are in US$, following pricing page '
+                'as of March 25, 2019 (https://aws.amazon.com/lambda/pricing)',
+                'Lambda duration times are in milliseconds',
+                'Lambda arm64 costs are priced per GB-second relative to '
+                'x86_64 (https://aws.amazon.com/lambda/pricing)',
+            ]
+        }
+
+        # Successful benchmarks to compare for statistical significance
+        candidates = []
+
+        results, hardware = self.stratify_hardware(results=results)
+
+        if hardware is not None:
+            processed['hardware'] = hardware
+
+        for benchmark in results:
+            architecture = benchmark.get(
+                'architecture', c.DEFAULT_ARCHITECTURE)
+
+            if not benchmark['success']:
+                processed['logs'].append({
+                    'memory': benchmark['memory'],
+                    'architecture': architecture,
+                    'success': False,
+                    'errors': [str(error) for error in benchmark['errors']],
+                })
+                self.append_public_error(error=benchmark['errors'])
+
+                continue
+
+            # Calculate cost of execution for ranking
+            try:
+                execution_cost = lambda_execution_cost(
+                    memory=benchmark['memory'],
+                    duration=benchmark['average_duration'],
+                    architecture=architecture,
+                    region=self.region,
+                )
+
+            except Exception as error:
+                logger.warning(error)
+                logger.exception(error)
+                self.append_public_error(error=error)
+
+                processed['logs'].append({
+                    'memory': benchmark['memory'],
+                    'architecture': architecture,
+                    'success': False,
+                    'errors': [str(error)],
+                })
+
+                continue
+
+            # Replays are ranked by what serving the whole trace costs
+            if 'replay' in benchmark:
+                execution_cost = benchmark['replay']['total_cost']
+
+            # Populate financial performance ranking
+            processed['ranking']['cost'].append({
+                'memory': benchmark['memory'],
+                'architecture': architecture,
+                'cost': execution_cost,
+            })
+
+            # Populate speed performance ranking
             processed['ranking']['duration'].append({
                 'memory': benchmark['memory'],
+                'architecture': architecture,
                 'duration': benchmark['average_duration'],
             })
 
             # Populate benchmark details for debugging/verification purposes
             processed['logs'].append({
                 'memory': benchmark['memory'],
+                'architecture': architecture,
                 'succcess': False,
                 'duration': {
                     'average': benchmark['average_duration'],
-                    'all_invocations': benchmark['durations'],
+                    'all_invocations': list(benchmark['durations']),
                 },
                 'execution_cost': execution_cost,
             })
 
+            if 'percentiles' in benchmark:
+                processed['logs'][-1]['duration']['percentiles'] = \
+                    benchmark['percentiles']
+
+            # Sketched durations cannot be tested for significance
+            if len(benchmark['durations']):
+                candidates.append({
+                    'id': (benchmark['memory'], architecture),
+                    'durations': benchmark['durations'],
+                    'cost': execution_cost,
+                })
+
+            if 'load' in benchmark:
+                processed['logs'][-1]['load'] = benchmark['load']
+
+            if 'async' in benchmark:
+                processed['logs'][-1]['async'] = benchmark['async']
+
+            if 'replay' in benchmark:
+                processed['logs'][-1]['replay'] = benchmark['replay']
+
+            if benchmark.get('cached'):
+                processed['logs'][-1]['cached'] = True
+
+            if benchmark.get('hardware'):
+                processed['logs'][-1]['hardware'] = benchmark['hardware']
+
+            if 'control' in benchmark:
+                processed['logs'][-1]['control'] = benchmark['control']
+                processed['logs'][-1]['duration']['raw_average'] = \
+                    benchmark['raw_average_duration']
+
+            if 'unweighted_average_duration' in benchmark:
+                processed['logs'][-1]['duration']['unweighted_average'] = \
+                    benchmark['unweighted_average_duration']
+
+            if benchmark.get('concurrency'):
+                processed.setdefault('concurrency', []).append(
+                    concurrency_curve(
+                        memory=benchmark['memory'],
+                        architecture=architecture,
+                        levels=benchmark['concurrency'],
+                    )
+                )
+
+            if benchmark.get('scaling'):
+                processed['logs'][-1]['scaling'] = benchmark['scaling']
+                processed.setdefault('scaling', []).append(
+                    self.summarize_scaling(
+                        memory=benchmark['memory'],
+                        architecture=architecture,
+                        scaling=benchmark['scaling'],
+                    )
+                )
+
+        if self.region is not None:
+            processed['region'] = self.region
+
+        if self.mode == c.MODE_REPLAY:
+            processed['notes'].append(
+                'Replay costs are the total cost of serving the traffic '
+                'trace, cold starts and per-request fees included')
+
+        if self.memory_floor_result is not None:
+            processed['memory_floor'] = self.memory_floor_result
+
+        if self.calibration_result is not None:
+            processed['calibration'] = self.calibration_result
+
+        if self.budget is not None:
+            processed['budget'] = self.budget_reports
+
+        if self.export_reports:
+            processed['export'] = self.export_reports
+
+        if candidates:
+            processed['statistics'] = self.compare_benchmarks(
+                candidates=candidates,
+            )
+
+        if self.control_baseline is not None:
+            processed['control'] = self.summarize_control_run(
+                results=results,
+            )
+            processed['notes'].append(
+                'Durations are normalized by the slowdown of the control '
+                'canary from its baseline, control.raw_ranking ranks them '
+                'as measured')
+
+        if self.extrapolate and candidates:
+            processed['extrapolation'] = self.extrapolate_memory(
+                candidates=candidates,
+            )
+            processed['notes'].append(
+                'Extrapolated costs are priced per GB-second at any memory '
+                'size, billed per 100 ms, excluding per-request fees')
+
         # Order rankings by best performers
         processed['ranking']['cost'] = sorted(
             processed['ranking']['cost'],
@@ -512,8 +2484,237 @@ class Benchmark():
             key=lambda k: k['duration'],
         )
 
+        for key in ('scaling', 'concurrency'):
+            if key in processed:
+                processed[key].sort(
+                    key=lambda item: (item['architecture'], item['memory']))
+
         return processed
 
+    def stratify_hardware(self, *, results: List[Dict]) -> tuple:
+        '''Hardware mix of each memory size, reweighted to a reference mix
+
+        With a hardware_reference_mix, each result's average duration is
+        replaced by the average over its hardware classes weighted by the
+        reference mix, so sizes are ranked as if they ran on the same hosts.
+        Its durations are resampled to the same mix, which significance is
+        tested on. Returns the results and the hardware report, None
+        without any hardware fingerprint.
+        '''
+        stratified = [
+            result for result in results
+            if result['success'] and result.get('hardware')
+        ]
+
+        if not stratified:
+            return results, None
+
+        mix = self.hardware_reference_mix
+
+        if mix == c.HARDWARE_POOLED_MIX:
+            mix = pooled_mix([result['hardware'] for result in stratified])
+
+        report = {
+            'reference_mix': mix,
+            'mix': [
+                {
+                    'memory': result['memory'],
+                    'architecture': result['architecture'],
+                    'mix': {
+                        hardware: item['share']
+                        for hardware, item in result['hardware'].items()
+                    },
+                }
+                for result in stratified
+            ],
+        }
+
+        if mix is None:
+            return results, report
+
+        reweighted = []
+
+        for result in results:
+            if result['success'] and result.get('hardware'):
+                weighted = reweighted_average(result['hardware'], mix)
+                result = dict(result, hardware=dict(
+                    result['hardware'], reweighted=weighted))
+
+                if weighted['average'] is not None:
+                    result['unweighted_average_duration'] = \
+                        result['average_duration']
+                    result['average_duration'] = weighted['average']
+                    result['durations'] = reweighted_durations(
+                        result['hardware_durations'], mix)
+
+            reweighted.append(result)
+
+        return reweighted, report
+
+    def summarize_control_run(self, *, results: List[Dict]) -> Dict:
+        '''Canary baseline, drift, variance removed and raw rankings'''
+        normalized = [
+            result for result in results
+            if result['success'] and 'control' in result
+        ]
+        raw_ranking = {
+            'cost': [],
+            'duration': [],
+        }
+
+        for result in normalized:
+            architecture = result.get('architecture', c.DEFAULT_ARCHITECTURE)
+
+            try:
+                raw_ranking['cost'].append({
+                    'memory': result['memory'],
+                    'architecture': architecture,
+                    'cost': lambda_execution_cost(
+                        memory=result['memory'],
+                        duration=result['raw_average_duration'],
+                        architecture=architecture,
+                        region=self.region,
+                    ),
+                })
+
+            # Already reported when ranking normalized durations
+            except custom_exc.CalculateLambdaExecutionCostError:
+                continue
+
+            raw_ranking['duration'].append({
+                'memory': result['memory'],
+                'architecture': architecture,
+                'duration': result['raw_average_duration'],
+            })
+
+        for key in raw_ranking:
+            raw_ranking[key].sort(key=lambda item: item[key])
+
+        return dict(
+            pooled_variance_removed(
+                [result['control'] for result in normalized]),
+            baseline=self.control_baseline,
+            raw_ranking=raw_ranking,
+        )
+
+    def extrapolate_memory(self, *, candidates: List[Dict]) -> List[Dict]:
+        '''Duration and cost predicted at every memory size, by architecture
+
+        The memory sizes benchmarked are the probes of a duration model
+        (see model.py), fitted separately for each architecture.
+        '''
+        observations = {}
+
+        for candidate in candidates:
+            memory, architecture = candidate['id']
+            observations.setdefault(architecture, {})[memory] = \
+                list(candidate['durations'])
+
+        extrapolations = []
+
+        for architecture, probes in sorted(observations.items()):
+            try:
+                extrapolations.append(extrapolate(
+                    observations=probes,
+                    architecture=architecture,
+                    region=self.region,
+                ))
+
+            except ValueError as error:
+                logger.warning(error)
+                self.append_public_error(error=error)
+
+        return extrapolations
+
+    def summarize_scaling(
+            self,
+            *,
+            memory: int,
+            architecture: str,
+            scaling: Dict,
+            ) -> Dict:
+        '''Effective vCPUs and parallel efficiency at a memory size'''
+        runs = scaling.get('runs') or []
+        best = max(runs, key=lambda run: run['speedup'], default={})
+
+        return {
+            'memory': memory,
+            'architecture': architecture,
+            'cpu_count': scaling.get('cpu_count'),
+            'effective_vcpus': scaling.get('effective_vcpus'),
+            'best_workers': best.get('workers'),
+            'efficiency': best.get('efficiency'),
+            'parallel_benefit':
+                (scaling.get('effective_vcpus') or 0) >= c.SCALING_MIN_SPEEDUP,
+        }
+
+    def compare_benchmarks(self, *, candidates: List[Dict]) -> Dict:
+        '''Confidence intervals, significance tiers and recommendation
+
+        Memory sizes whose durations are not significantly different are
+        grouped in tiers; the cheapest size in the fastest tier is
+        recommended.
+        '''
+        intervals = []
+        costs = {}
+
+        for candidate in candidates:
+            memory, architecture = candidate['id']
+            costs[candidate['id']] = candidate['cost']
+
+            ci = confidence_intervals(candidate['durations'])
+
+            intervals.append({
+                'memory': memory,
+                'architecture': architecture,
+                'method': ci['method'],
+                'median': {
+                    'low': ci['median'][0],
+                    'high': ci['median'][1],
+                },
+                'cost': {
+                    'low': lambda_execution_cost(
+                        memory=memory,
+                        duration=ci['mean'][0],
+                        architecture=architecture,
+                        region=self.region,
+                    ),
+                    'high': lambda_execution_cost(
+                        memory=memory,
+                        duration=ci['mean'][1],
+                        architecture=architecture,
+                        region=self.region,
+                    ),
+                },
+            })
+
+        significance = significance_tiers(candidates)
+
+        def describe(group_id):
+            return {'memory': group_id[0], 'architecture': group_id[1]}
+
+        best_tier = significance['tiers'][0]
+        recommended = min(best_tier, key=lambda group_id: costs[group_id])
+
+        return {
+            'confidence': c.CONFIDENCE_LEVEL,
+            'alpha': significance['alpha'],
+            'intervals': intervals,
+            'pairwise': [
+                dict(test, a=describe(test['a']), b=describe(test['b']))
+                for test in significance['pairwise']
+            ],
+            'tiers': [
+                [describe(group_id) for group_id in tier]
+                for tier in significance['tiers']
+            ],
+            'recommendation': dict(
+                describe(recommended),
+                cost=costs[recommended],
+                tier_size=len(best_tier),
+            ),
+        }
+
 
 if __name__ == '__main__':
     pass
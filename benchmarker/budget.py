@@ -0,0 +1,277 @@
+'''Cost-budgeted allocation of benchmark samples across memory sizes'''
+import math
+import statistics
+from typing import (
+    Dict,
+    List,
+    Tuple,
+    Union,
+)
+import constants as c
+import custom_exceptions as custom_exc
+from samples import SampleColumns
+from utils import lambda_execution_cost
+
+
+class BudgetScheduler():
+    '''Spend a budget on the samples that most sharpen the cost ranking
+
+    Every memory size first gets min_samples samples. Then each batch goes
+    to the size whose mean cost estimate gains the most precision per
+    dollar (variance reduction over invocation cost), among sizes that can
+    still be the cheapest. Sizes stop at test_count samples and scheduling
+    stops once no batch fits in the remaining budget. Sizes whose batches
+    keep failing entirely (e.g. out of memory) are retired.
+    '''
+
+    def __init__(
+            self,
+            *,
+            budget: float,
+            test_count: int = c.DEFAULT_TEST_COUNT,
+            architecture: str = c.DEFAULT_ARCHITECTURE,
+            batch_size: int = c.DEFAULT_BATCH_SIZE,
+            timeout: int = c.DEFAULT_LAMBDA_TIMEOUT,
+            min_samples: int = c.BUDGET_MIN_SAMPLES,
+            max_batch: int = c.BUDGET_BATCH_SIZE,
+            max_failed_batches: int = c.BUDGET_MAX_FAILED_BATCHES,
+            region: Union[str, None] = None,
+            ignore_coldstart: bool = c.IGNORE_COLDSTART,
+            ):
+        if budget <= 0:
+            raise custom_exc.BenchmarkConfigError(
+                f'Budget ({budget}) must be greater than 0 (zero)'
+            )
+
+        self.budget = budget
+        self.test_count = test_count
+        self.architecture = architecture
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.min_samples = min_samples
+        self.max_batch = max_batch
+        self.max_failed_batches = max_failed_batches
+        self.region = region
+        self.ignore_coldstart = ignore_coldstart
+
+        self.samples = {}
+        self.invocations = {}
+        # Samples already charged and consecutive failed batches, by size
+        self.charged = {}
+        self.failed_batches = {}
+        self.retired = []
+        self.spent = 0.0
+        self.exhausted = False
+
+    @property
+    def remaining(self) -> float:
+        return self.budget - self.spent
+
+    def add(self, *, memory: int, samples: SampleColumns):
+        '''Schedule a memory size, whose samples are appended elsewhere'''
+        self.samples[memory] = samples
+        self.invocations[memory] = 0
+        self.charged[memory] = len(samples)
+        self.failed_batches[memory] = 0
+
+    def drop(self, *, memory: int):
+        '''Stop scheduling a memory size, e.g. when it cannot be set'''
+        self.samples.pop(memory, None)
+
+    def invocation_cost(self, *, memory: int) -> float:
+        '''Estimated cost of one invocation at a memory size
+
+        Uses the median duration sampled so far, or the timeout before any
+        sample, plus the per-request fee.
+        '''
+        durations = self.samples[memory].durations(ignore_coldstart=False) \
+            if memory in self.samples else None
+
+        duration = statistics.median(durations) * self.batch_size \
+            if durations else self.timeout
+
+        return lambda_execution_cost(
+            memory=memory,
+            duration=duration,
+            architecture=self.architecture,
+            region=self.region,
+        ) + c.LAMBDA_REQUEST_COST
+
+    def failure_cost(self, *, memory: int, wall_time: float) -> float:
+        '''Estimated cost of one failed invocation at a memory size
+
+        Failures are billed like other invocations of the size, at its
+        median duration. When none succeeded, they are billed for the wall
+        time measured by the client, which bounds their duration, or the
+        timeout when it is unknown.
+        '''
+        if len(self.samples[memory].durations(ignore_coldstart=False)):
+            return self.invocation_cost(memory=memory)
+
+        duration = min(wall_time, self.timeout) if wall_time \
+            else self.timeout
+
+        return lambda_execution_cost(
+            memory=memory,
+            duration=duration,
+            architecture=self.architecture,
+            region=self.region,
+        ) + c.LAMBDA_REQUEST_COST
+
+    def charge(self, *, memory: int, invocations: int):
+        '''Account for invocations run at a memory size
+
+        Failed invocations add one sample each, the ones appended since the
+        last charge tell how many of the invocations failed.
+        '''
+        samples = self.samples[memory]
+        wall_times = [
+            samples.overhead[index]
+            for index in range(self.charged.get(memory, 0), len(samples))
+            if samples.error_code[index] != c.SAMPLE_ERROR_CODES[None]
+        ][:invocations]
+        failed = len(wall_times)
+
+        self.charged[memory] = len(samples)
+        self.invocations[memory] = \
+            self.invocations.get(memory, 0) + invocations
+        self.spent += \
+            (invocations - failed) * self.invocation_cost(memory=memory) + \
+            sum(
+                self.failure_cost(memory=memory, wall_time=wall_time)
+                for wall_time in wall_times
+            )
+
+        if invocations and failed == invocations:
+            self.failed_batches[memory] = \
+                self.failed_batches.get(memory, 0) + 1
+
+            if self.failed_batches[memory] >= self.max_failed_batches:
+                self.retire(memory=memory)
+
+        else:
+            self.failed_batches[memory] = 0
+
+    def retire(self, *, memory: int):
+        '''Stop scheduling a memory size whose invocations keep failing'''
+        if memory not in self.retired:
+            self.retired.append(memory)
+
+    def estimate(self) -> float:
+        '''Estimated cost of a full sweep of test_count samples per size'''
+        invocations = math.ceil(self.test_count / self.batch_size)
+
+        return round(sum(
+            invocations * self.invocation_cost(memory=memory)
+            for memory in self.samples
+        ), 6)
+
+    def mean_cost(self, *, memory: int) -> Union[Tuple[float, float], None]:
+        '''Mean sample cost, priced per millisecond, and its standard error'''
+        durations = self.samples[memory].durations(
+            ignore_coldstart=self.ignore_coldstart)
+
+        if len(durations) < 2:
+            return None
+
+        rate = c.LAMBDA_COST_BY_ARCHITECTURE[self.architecture][memory] / 100 \
+            * c.LAMBDA_REGION_PRICE_RATIOS.get(self.region, 1.0)
+
+        return (
+            rate * statistics.fmean(durations),
+            rate * statistics.stdev(durations) / math.sqrt(len(durations)),
+        )
+
+    def contenders(self, memory_sets: List[int]) -> List[int]:
+        '''Memory sizes whose cost interval overlaps the cheapest one's'''
+        estimates = {
+            memory: self.mean_cost(memory=memory) for memory in self.samples
+        }
+        known = [estimate for estimate in estimates.values() if estimate]
+
+        if not known:
+            return memory_sets
+
+        cheapest = min(mean + 2 * error for mean, error in known)
+
+        return [
+            memory for memory in memory_sets
+            if estimates[memory] is None or
+            estimates[memory][0] - 2 * estimates[memory][1] <= cheapest
+        ]
+
+    def priority(self, *, memory: int) -> float:
+        '''Reduction of the mean cost variance per dollar of one invocation'''
+        estimate = self.mean_cost(memory=memory)
+
+        if estimate is None:
+            return math.inf
+
+        count = len(self.samples[memory].durations(
+            ignore_coldstart=self.ignore_coldstart))
+        variance = estimate[1] ** 2 * count
+
+        # Variance of the mean drops from s2 / n to s2 / (n + batch_size)
+        reduction = variance / count - variance / (count + self.batch_size)
+
+        return reduction / self.invocation_cost(memory=memory)
+
+    def next_batch(self) -> Union[Tuple[int, int], None]:
+        '''Memory size and invocation count of the next batch, or None'''
+        pending = [
+            memory for memory, samples in self.samples.items()
+            if samples.valid_count < self.test_count and
+            memory not in self.retired
+        ]
+        affordable = [
+            memory for memory in pending
+            if self.invocation_cost(memory=memory) <= self.remaining
+        ]
+
+        if not affordable:
+            self.exhausted = bool(pending)
+
+            return None
+
+        starved = [
+            memory for memory in affordable
+            if self.samples[memory].valid_count < self.min_samples
+        ]
+
+        if starved:
+            memory = min(
+                starved, key=lambda m: self.samples[m].valid_count)
+
+        else:
+            memory = max(
+                self.contenders(affordable) or affordable,
+                key=lambda m: self.priority(memory=m),
+            )
+
+        missing = self.test_count - self.samples[memory].valid_count
+        invocations = min(
+            self.max_batch,
+            math.ceil(missing / self.batch_size),
+            int(self.remaining // self.invocation_cost(memory=memory)),
+        )
+
+        return memory, invocations
+
+    def report(self) -> Dict:
+        '''Budget, spend and invocations per memory size'''
+        return {
+            'budget': self.budget,
+            'spent': round(self.spent, 6),
+            'exhausted': self.exhausted,
+            'architecture': self.architecture,
+            'retired': self.retired,
+            'invocations': [
+                {
+                    'memory': memory,
+                    'invocations': invocations,
+                    'samples': self.samples[memory].valid_count
+                    if memory in self.samples else 0,
+                }
+                for memory, invocations in self.invocations.items()
+            ],
+        }
@@ -0,0 +1,112 @@
+'''Persistent cache of benchmark results'''
+import collections
+import hashlib
+import json
+import os
+import time
+from typing import (
+    Dict,
+    Union,
+)
+import constants as c
+from utils import logger
+
+
+class ResultCache():
+    '''JSON file backed result cache with TTL and LRU eviction
+
+    Entries are kept in least to most recently used order, so the oldest
+    entries are evicted first when the cache grows beyond max_entries.
+    '''
+
+    def __init__(
+            self,
+            *,
+            path: str = c.CACHE_PATH,
+            ttl: float = c.CACHE_TTL,
+            max_entries: int = c.CACHE_MAX_ENTRIES,
+            ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(**parts) -> str:
+        '''Build a cache key from the parts identifying a result'''
+        serialized = json.dumps(parts, sort_keys=True, default=str)
+
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def load(self) -> int:
+        '''Load entries from the cache file, returns the entries count'''
+        try:
+            with open(self.path) as cache_file:
+                entries = json.load(cache_file)
+
+        except FileNotFoundError:
+            return 0
+
+        except (OSError, ValueError) as error:
+            logger.warning(f'Ignoring unreadable result cache: {error}')
+
+            return 0
+
+        self.entries = collections.OrderedDict(
+            (entry['key'], entry) for entry in entries
+        )
+        self.prune()
+
+        return len(self.entries)
+
+    def save(self):
+        '''Write entries to the cache file atomically'''
+        self.prune()
+
+        temp_path = f'{self.path}.tmp'
+
+        with open(temp_path, 'w') as cache_file:
+            json.dump(list(self.entries.values()), cache_file)
+
+        os.replace(temp_path, self.path)
+
+    def get(self, key: str) -> Union[Dict, None]:
+        '''Get a result from the cache, None if missing or expired'''
+        entry = self.entries.get(key)
+
+        if entry is None or self.is_expired(entry):
+            self.entries.pop(key, None)
+            self.misses += 1
+
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        return entry['result']
+
+    def set(self, key: str, result: Dict):
+        '''Store a result in the cache, evicting least recently used ones'''
+        self.entries[key] = {
+            'key': key,
+            'created': time.time(),
+            'result': result,
+        }
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def is_expired(self, entry: Dict) -> bool:
+        '''Whether an entry is older than the cache TTL'''
+        return time.time() - entry['created'] > self.ttl
+
+    def prune(self):
+        '''Drop expired entries and enforce the maximum entries count'''
+        for key in [k for k, v in self.entries.items() if self.is_expired(v)]:
+            del self.entries[key]
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
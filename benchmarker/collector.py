@@ -0,0 +1,96 @@
+'''Collectors of measurements from asynchronous Lambda invocations
+
+Asynchronous ('Event') invocations return no payload, so the benchmarked
+function results are collected from a queue instead. With an SQS queue set
+as the function's on-success and on-failure destination, Lambda pushes a
+record for each invocation with its request and response payloads:
+
+{
+    'requestContext': {'condition': 'Success', ...},
+    'requestPayload': {'_correlation_id': '...', ...},
+    'responsePayload': {'remaining_time': 299000, 'cold_start': False},
+}
+'''
+import queue
+from typing import (
+    Dict,
+    List,
+    Union,
+)
+import constants as c
+from utils import (
+    json_loads,
+    JSON_DECODE_ERRORS,
+    logger,
+    sqs_client,
+)
+
+
+class LocalQueueCollector():
+    '''In-process collector, a stand-in for a destination queue in tests'''
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def put(self, record: Dict):
+        '''Push a destination record to the queue'''
+        self.queue.put(record)
+
+    def drain(self, *, max_records: int = c.ASYNC_DRAIN_BATCH_SIZE) -> List:
+        '''Get up to max_records records, waiting briefly for the first'''
+        records = []
+
+        try:
+            records.append(
+                self.queue.get(timeout=c.ASYNC_DRAIN_WAIT_SECONDS))
+
+            while len(records) < max_records:
+                records.append(self.queue.get_nowait())
+
+        except queue.Empty:
+            pass
+
+        return records
+
+
+class SQSCollector():
+    '''Collector draining Lambda destination records from an SQS queue'''
+
+    def __init__(self, *, queue_url: str, region: Union[str, None] = None):
+        self.queue_url = queue_url
+        self.client = sqs_client(region=region)
+
+    def drain(self, *, max_records: int = c.ASYNC_DRAIN_BATCH_SIZE) -> List:
+        '''Receive and delete a batch of records from the queue'''
+        response = self.client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_records, c.SQS_MAX_BATCH_SIZE),
+            WaitTimeSeconds=c.ASYNC_DRAIN_WAIT_SECONDS,
+        )
+
+        messages = response.get('Messages', [])
+
+        if not messages:
+            return []
+
+        self.client.delete_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=[
+                {
+                    'Id': str(index),
+                    'ReceiptHandle': message['ReceiptHandle'],
+                }
+                for index, message in enumerate(messages)
+            ],
+        )
+
+        records = []
+
+        for message in messages:
+            try:
+                records.append(json_loads(message['Body']))
+
+            except JSON_DECODE_ERRORS:
+                logger.warning('Unable to parse collector record JSON.')
+
+        return records
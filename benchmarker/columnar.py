@@ -0,0 +1,371 @@
+'''Columnar export of raw invocation samples, loaded back memory-mapped
+
+Usage: python columnar.py EXPORT_PATH [--function fibonacci] [--memory 1024]
+
+Samples are written in one directory per partition, Hive style:
+
+EXPORT_PATH/function=fibonacci/memory=1024/architecture=x86_64/
+
+Each partition holds its columns as an Arrow IPC file when pyarrow is
+installed, one NumPy .npy file per column when NumPy is, or one raw
+little-endian file per column otherwise, next to a JSON manifest. All three
+formats are memory-mapped on load, so columns are read from the page cache
+without copying and summaries only hold one chunk in memory at a time.
+'''
+import argparse
+from array import array
+import functools
+import json
+import math
+import mmap
+import os
+import sys
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Union,
+)
+import constants as c
+import custom_exceptions as custom_exc
+from samples import SampleColumns
+from stats import numpy_module
+
+
+@functools.lru_cache(maxsize=None)
+def arrow_module():
+    '''pyarrow, imported on first use since it is slow to import, or None'''
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+
+    except ImportError:
+        return None
+
+    return pyarrow
+
+
+def available_format(export_format: str = c.DEFAULT_EXPORT_FORMAT) -> str:
+    '''Resolve 'auto' to the best columnar format installed'''
+    if export_format not in c.EXPORT_FORMATS:
+        raise custom_exc.BenchmarkConfigError(
+            f'Invalid export format ({export_format}), valid are '
+            f"{', '.join(c.EXPORT_FORMATS)}"
+        )
+
+    if export_format == 'auto':
+        if arrow_module() is not None:
+            return 'arrow'
+
+        return 'npy' if numpy_module() is not None else 'raw'
+
+    if export_format == 'arrow' and arrow_module() is None or \
+            export_format == 'npy' and numpy_module() is None:
+        raise custom_exc.BenchmarkConfigError(
+            f'Export format ({export_format}) requires a library that is '
+            'not installed'
+        )
+
+    return export_format
+
+
+def partition_path(
+        directory: str,
+        *,
+        function_name: str,
+        memory: int,
+        architecture: str = c.DEFAULT_ARCHITECTURE,
+        ) -> str:
+    '''Directory of the samples of a function, memory and architecture'''
+    return os.path.join(
+        directory,
+        f'function={function_name}',
+        f'memory={memory}',
+        f'architecture={architecture}',
+    )
+
+
+def little_endian(column: array) -> array:
+    '''Column in little-endian byte order, the order of exported files'''
+    if sys.byteorder == 'little':
+        return column
+
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+
+    return swapped
+
+
+def export_samples(
+        *,
+        samples: SampleColumns,
+        directory: str,
+        function_name: str,
+        memory: int,
+        architecture: str = c.DEFAULT_ARCHITECTURE,
+        export_format: str = c.DEFAULT_EXPORT_FORMAT,
+        ) -> Dict:
+    '''Write the sample columns to their partition, replacing previous ones'''
+    export_format = available_format(export_format)
+    path = partition_path(
+        directory,
+        function_name=function_name,
+        memory=memory,
+        architecture=architecture,
+    )
+
+    os.makedirs(path, exist_ok=True)
+
+    columns = {
+        name: getattr(samples, name) for name in c.SAMPLE_COLUMN_TYPES}
+
+    if export_format == 'arrow':
+        pa = arrow_module()
+        table = pa.table({
+            name: pa.array(column, type=getattr(
+                pa, c.ARROW_COLUMN_TYPES[name])())
+            for name, column in columns.items()
+        })
+
+        with pa.OSFile(os.path.join(path, c.EXPORT_ARROW_FILE), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    else:
+        for name, column in columns.items():
+            if export_format == 'npy':
+                np = numpy_module()
+                np.save(
+                    os.path.join(path, f'{name}.npy'),
+                    np.frombuffer(column, dtype=column.typecode),
+                )
+
+            else:
+                with open(os.path.join(path, f'{name}.bin'), 'wb') as file:
+                    little_endian(column).tofile(file)
+
+    manifest = {
+        'format': export_format,
+        'rows': len(samples),
+        'function': function_name,
+        'memory': memory,
+        'architecture': architecture,
+        'columns': dict(c.SAMPLE_COLUMN_TYPES),
+        'hardware_classes': samples.hardware_classes,
+    }
+
+    with open(os.path.join(path, c.EXPORT_MANIFEST_FILE), 'w') as file:
+        json.dump(manifest, file)
+
+    return dict(manifest, path=path)
+
+
+class MappedPartition():
+    '''Memory-mapped columns of an exported partition
+
+    Columns are zero-copy views: an Arrow ChunkedArray, a NumPy memmap or a
+    memoryview, depending on the export format. Use as a context manager,
+    or close() it, to unmap the files.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(os.path.join(path, c.EXPORT_MANIFEST_FILE)) as file:
+            self.manifest = json.load(file)
+
+        self.format = self.manifest['format']
+        self.rows = self.manifest['rows']
+        self._maps = []
+        self._table = None
+
+        if self.format == 'arrow':
+            pa = arrow_module()
+            source = pa.memory_map(os.path.join(path, c.EXPORT_ARROW_FILE))
+            self._maps.append(source)
+            self._table = pa.ipc.open_file(source).read_all()
+
+    def __enter__(self) -> 'MappedPartition':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def column(self, name: str):
+        '''Zero-copy view of a column'''
+        typecode = self.manifest['columns'][name]
+
+        if self.format == 'arrow':
+            return self._table.column(name)
+
+        if self.format == 'npy':
+            return numpy_module().load(
+                os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+
+        if not self.rows:
+            return memoryview(array(typecode))
+
+        if sys.byteorder != 'little':
+            raise custom_exc.CustomBenchmarkException(
+                'Raw column files can only be mapped on little-endian hosts')
+
+        with open(os.path.join(self.path, f'{name}.bin'), 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._maps.append(mapped)
+
+        return memoryview(mapped).cast(typecode)
+
+    def chunks(
+            self,
+            name: str,
+            *,
+            chunk_rows: int = c.EXPORT_CHUNK_ROWS,
+            ) -> Iterator[List]:
+        '''Values of a column, as lists of at most chunk_rows values'''
+        column = self.column(name)
+
+        try:
+            for start in range(0, self.rows, chunk_rows):
+                chunk = column[start:start + chunk_rows]
+
+                yield chunk.to_pylist() if self.format == 'arrow' \
+                    else chunk.tolist()
+
+        finally:
+            # Views must be released before their map can be closed
+            if type(column) is memoryview:
+                column.release()
+
+    def close(self):
+        '''Unmap the column files'''
+        self._table = None
+
+        for mapped in self._maps:
+            try:
+                mapped.close()
+
+            # A view of the map is still held by the caller
+            except BufferError:
+                pass
+
+        self._maps = []
+
+
+def summarize_partition(
+        path: str,
+        *,
+        chunk_rows: int = c.EXPORT_CHUNK_ROWS,
+        ) -> Dict:
+    '''Summary statistics of a partition, streamed from its mapped columns
+
+    Durations of successful invocations are summarized chunk by chunk,
+    merging each chunk's count, mean and sum of squared deviations (Chan et
+    al.), so memory use does not grow with the number of samples.
+    '''
+    success_code = c.SAMPLE_ERROR_CODES[None]
+    count = 0
+    mean = 0.0
+    squares = 0.0
+    low = math.inf
+    high = -math.inf
+    cold_starts = 0
+    errors = 0
+
+    with MappedPartition(path) as partition:
+        for durations, error_codes, cold in zip(
+                partition.chunks('duration', chunk_rows=chunk_rows),
+                partition.chunks('error_code', chunk_rows=chunk_rows),
+                partition.chunks('cold_start', chunk_rows=chunk_rows)):
+            valid = [
+                duration
+                for duration, error_code in zip(durations, error_codes)
+                if error_code == success_code
+            ]
+
+            cold_starts += sum(cold)
+            errors += len(durations) - len(valid)
+
+            if not valid:
+                continue
+
+            chunk_mean = sum(valid) / len(valid)
+            chunk_squares = sum((value - chunk_mean) ** 2 for value in valid)
+            total = count + len(valid)
+            delta = chunk_mean - mean
+
+            squares += chunk_squares + delta ** 2 * count * len(valid) / total
+            mean += delta * len(valid) / total
+            count = total
+            low = min(low, min(valid))
+            high = max(high, max(valid))
+
+        manifest = partition.manifest
+
+    return {
+        'function': manifest['function'],
+        'memory': manifest['memory'],
+        'architecture': manifest['architecture'],
+        'format': manifest['format'],
+        'rows': manifest['rows'],
+        'count': count,
+        'mean': round(mean, c.DURATION_DECIMALS) if count else None,
+        'stdev': round(math.sqrt(squares / (count - 1)), c.DURATION_DECIMALS)
+        if count > 1 else None,
+        'min': low if count else None,
+        'max': high if count else None,
+        'cold_starts': cold_starts,
+        'errors': errors,
+    }
+
+
+def partitions(
+        directory: str,
+        *,
+        function_name: Union[str, None] = None,
+        memory: Union[int, None] = None,
+        ) -> List[str]:
+    '''Paths of the exported partitions, optionally of one function/memory'''
+    paths = []
+
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+
+        if c.EXPORT_MANIFEST_FILE not in files:
+            continue
+
+        parts = dict(
+            part.split('=', 1)
+            for part in os.path.relpath(root, directory).split(os.sep)
+            if '=' in part
+        )
+
+        if function_name is not None and \
+                parts.get('function') != function_name:
+            continue
+
+        if memory is not None and parts.get('memory') != str(memory):
+            continue
+
+        paths.append(root)
+
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', metavar='EXPORT_PATH')
+    parser.add_argument('--function', default=None)
+    parser.add_argument('--memory', type=int, default=None)
+    args = parser.parse_args()
+
+    summaries = [
+        summarize_partition(path)
+        for path in partitions(
+            args.path,
+            function_name=args.function,
+            memory=args.memory,
+        )
+    ]
+
+    print(json.dumps(summaries, indent=4))
@@ -0,0 +1,121 @@
+'''Duration and throughput of a function across in-flight concurrency levels'''
+import math
+from typing import (
+    Dict,
+    List,
+    Sequence,
+    Union,
+)
+import constants as c
+from load import latency_percentiles
+from samples import SampleColumns
+
+
+def concurrency_levels(max_concurrency: int) -> List[int]:
+    '''Doubling concurrency levels 1, 2, 4... up to max_concurrency'''
+    levels = []
+    level = 1
+
+    while level < max_concurrency:
+        levels.append(level)
+        level *= 2
+
+    levels.append(max_concurrency)
+
+    return levels
+
+
+def summarize_level(
+        *,
+        concurrency: int,
+        samples: SampleColumns,
+        elapsed: float,
+        ) -> Dict:
+    '''Throughput, durations and latencies measured at a concurrency level'''
+    success_code = c.SAMPLE_ERROR_CODES[None]
+    requests = len(samples)
+    successes = samples.error_code.count(success_code)
+
+    latencies = [
+        samples.duration[index] + samples.overhead[index]
+        for index in range(requests)
+        if samples.error_code[index] == success_code
+    ]
+
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'throughput': round(successes / elapsed, 3) if elapsed else None,
+        'error_rate': round(1 - successes / requests, 4) if requests else 0,
+        'duration': latency_percentiles(
+            samples.durations(ignore_coldstart=False)),
+        'latency': latency_percentiles(latencies),
+    }
+
+
+def find_knee(xs: Sequence[float], ys: Sequence[float]) -> Union[int, None]:
+    '''Index of the knee of an increasing, concave curve, or None
+
+    Kneedle method: with both axes normalized to 0-1, the knee is the point
+    farthest above the straight line joining the curve's ends.
+    '''
+    if len(xs) < 3:
+        return None
+
+    x_span = xs[-1] - xs[0]
+    y_low = min(ys)
+    y_span = max(ys) - y_low
+
+    if not x_span or not y_span:
+        return None
+
+    differences = [
+        (y - y_low) / y_span - (x - xs[0]) / x_span
+        for x, y in zip(xs, ys)
+    ]
+    knee = max(range(len(differences)), key=differences.__getitem__)
+
+    return knee if differences[knee] > 0 else None
+
+
+def concurrency_curve(
+        *,
+        memory: int,
+        architecture: str,
+        levels: List[Dict],
+        degradation: float = c.CONCURRENCY_DEGRADATION,
+        ) -> Dict:
+    '''Curve of a memory size across concurrency levels, with its knee
+
+    The knee is the concurrency level past which throughput stops growing
+    in proportion, found on a log2 concurrency scale since levels double.
+    The curve degrades at the first level whose median duration exceeds the
+    single-request median by more than `degradation` (relative).
+    '''
+    measured = [
+        level for level in levels
+        if level['throughput'] and level['duration']['p50'] is not None
+    ]
+
+    knee = find_knee(
+        [math.log2(level['concurrency']) for level in measured],
+        [level['throughput'] for level in measured],
+    )
+
+    degrades_at = None
+
+    if measured:
+        baseline = measured[0]['duration']['p50']
+
+        for level in measured[1:]:
+            if level['duration']['p50'] > baseline * (1 + degradation):
+                degrades_at = level['concurrency']
+                break
+
+    return {
+        'memory': memory,
+        'architecture': architecture,
+        'knee': measured[knee]['concurrency'] if knee is not None else None,
+        'degrades_at': degrades_at,
+        'levels': levels,
+    }
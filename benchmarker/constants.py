@@ -1,4 +1,5 @@
 '''Constant values for memory benchmark Lambda'''
+import logging
 
 
 VALID_EVENT_ARGS = [
@@ -10,9 +11,74 @@ VALID_EVENT_ARGS = [
     'lambda_event',
     'memory_sets',
     'timeout',
+    'mode',
+    'load_rate',
+    'load_duration',
+    'load_arrivals',
+    'architectures',
+    'architecture_functions',
+    'use_cache',
+    'force_refresh',
+    'cache_path',
+    'cache_ttl',
+    'memory_floor',
+    'memory_headroom',
+    'floor_test_count',
+    'collector_queue_url',
+    'async_timeout',
+    'trace',
+    'trace_format',
+    'trace_path',
+    'emit_metrics',
+    'batch_size',
+    'scaling_probe',
+    'scaling_max_workers',
+    'calibrate',
+    'calibration_parameter',
+    'calibration_window',
+    'calibration_test_count',
+    'baseline_path',
+    'regression_threshold',
+    'regression_alpha',
+    'regression_batch_size',
+    'regression_max_samples',
+    'budget',
+    'regions',
+    'replay_trace_path',
+    'replay_speedup',
+    'concurrency_sweep',
+    'concurrency_max',
+    'concurrency_test_count',
+    'export_path',
+    'export_format',
+    'hardware_reference_mix',
+    'extrapolate',
+    'control_function',
+    'control_test_count',
 ]
+MODE_CLOSED_LOOP = 'closed_loop'
+MODE_LOAD = 'load'
+MODE_ASYNC = 'async'
+MODE_REPLAY = 'replay'
+BENCHMARK_MODES = [
+    MODE_CLOSED_LOOP,
+    MODE_LOAD,
+    MODE_ASYNC,
+    MODE_REPLAY,
+]
+DEFAULT_MODE = MODE_CLOSED_LOOP
 IGNORE_COLDSTART = True
 DEFAULT_TEST_COUNT = 50
+DEFAULT_BATCH_SIZE = 1  # Workload iterations per invocation
+BATCH_ITERATIONS_KEY = 'iterations'  # Event key read by the function
+BATCH_DURATIONS_KEY = 'iteration_durations'  # Payload key, in milliseconds
+DURATION_DECIMALS = 3
+DEFAULT_SCALING_MAX_WORKERS = 6  # Lambda allocates up to 6 vCPUs
+SCALING_MIN_SPEEDUP = 1.5  # Speedup from which parallel work pays off
+DEFAULT_CALIBRATION_PARAMETER = 'n'  # Integer event key sizing the workload
+DEFAULT_CALIBRATION_WINDOW = [200, 2000]  # Target duration, in milliseconds
+DEFAULT_CALIBRATION_TEST_COUNT = 3  # Invocations per calibration probe
+CALIBRATION_MAX_PROBES = 20
 DEFAULT_MAX_THREADS = 10
 DEFAULT_LAMBDA_FUNCTION = 'fibonacci'
 DEFAULT_LAMBDA_EVENT = {
@@ -30,7 +96,39 @@ DEFAULT_MEMORY_SETS = [
     3008,
 ]
 DEFAULT_LAMBDA_TIMEOUT = 300000
+ARCHITECTURES = [
+    'x86_64',
+    'arm64',
+]
+DEFAULT_ARCHITECTURE = 'x86_64'
+DEFAULT_ARCHITECTURES = [DEFAULT_ARCHITECTURE]
 SLEEP_AFTER_NEW_MEMORY_SET = 2
+SLEEP_AFTER_NEW_ARCHITECTURE_SET = 10
+LOAD_ARRIVALS = [
+    'constant',
+    'poisson',
+]
+DEFAULT_LOAD_ARRIVALS = 'constant'
+DEFAULT_LOAD_RATE = 50  # Requests per second
+DEFAULT_LOAD_DURATION = 300  # Seconds
+LOAD_MAX_WORKERS = 512
+LOAD_WINDOW_SECONDS = 10
+LOAD_PERCENTILES = [50, 90, 99]
+SKETCH_RELATIVE_ACCURACY = 0.01  # Quantile estimates within 1% of exact
+SKETCH_MAX_BUCKETS = 2048
+SKETCH_MIN_VALUE = 1e-9  # Values below count as zero
+DEFAULT_REPLAY_SPEEDUP = 1.0  # Replay trace gaps in real time
+REPLAY_OFFSET_KEY = 'offset'
+REPLAY_EVENT_KEY = 'event'
+DEFAULT_CONCURRENCY_MAX = 64
+DEFAULT_CONCURRENCY_TEST_COUNT = 20  # Measured invocations per level
+CONCURRENCY_MIN_ROUNDS = 3  # Measured invocations per worker, at least
+CONCURRENCY_DEGRADATION = 0.1  # Median duration increase over 1 request
+AWS_MAX_POOL_CONNECTIONS = 50  # Per client, at least
+THROTTLING_ERROR_CODES = [
+    'TooManyRequestsException',
+    'ThrottlingException',
+]
 LAMBDA_COST_BY_MEMORY = {
     128:  0.000000208,
     192:  0.000000313,
@@ -79,6 +177,176 @@ LAMBDA_COST_BY_MEMORY = {
     2944: 0.000004793,
     3008: 0.000004897,
 }
+SAMPLE_ERROR_CODES = {
+    None: 0,
+    'Unknown': 1,
+    'InvokeLambdaError': 2,
+    'LambdaPayloadError': 3,
+    'LambdaThrottledError': 4,
+    'LambdaOutOfMemoryError': 5,
+}
+SAMPLE_ERROR_NAMES = {code: name for name, code in SAMPLE_ERROR_CODES.items()}
+# Errors of invocations that ran, and were billed, in the function
+BILLED_SAMPLE_ERRORS = [
+    'LambdaPayloadError',
+    'LambdaOutOfMemoryError',
+]
+# Array typecodes of SampleColumns columns, as exported
+SAMPLE_COLUMN_TYPES = {
+    'duration': 'd',
+    'overhead': 'f',
+    'cold_start': 'b',
+    'error_code': 'b',
+    'max_memory_used': 'H',
+    'hardware': 'H',
+    'control': 'f',
+}
+ARROW_COLUMN_TYPES = {
+    'duration': 'float64',
+    'overhead': 'float32',
+    'cold_start': 'int8',
+    'error_code': 'int8',
+    'max_memory_used': 'uint16',
+    'hardware': 'uint16',
+    'control': 'float32',
+}
+EXPORT_FORMATS = [
+    'auto',
+    'arrow',
+    'npy',
+    'raw',
+]
+DEFAULT_EXPORT_FORMAT = 'auto'
+EXPORT_MANIFEST_FILE = '_manifest.json'
+EXPORT_ARROW_FILE = 'samples.arrow'
+EXPORT_CHUNK_ROWS = 65536  # Rows held in memory at once by summaries
+CPU_FINGERPRINT_KEY = 'cpu'  # Payload key of the host CPU fingerprint
+HARDWARE_POOLED_MIX = 'pooled'  # Reference mix of all memory sizes pooled
+LAMBDA_MIN_MEMORY = 128
+LAMBDA_MAX_MEMORY = 10240
+LAMBDA_FULL_VCPU_MEMORY = 1769  # Memory size allocated one full vCPU
+LAMBDA_MAX_VCPUS = 6
+EXTRAPOLATION_STEP = 1  # MB between predicted memory sizes
+EXTRAPOLATION_NEXT_PROBES = 3  # Suggested sizes to measure next
+EXTRAPOLATION_PROBE_SAMPLES = 10  # Assumed samples per suggested probe
+EXTRAPOLATION_COST_DECIMALS = 12
+DEFAULT_CONTROL_TEST_COUNT = 10  # Canary invocations of the baseline
+DEFAULT_MEMORY_HEADROOM = 20  # Percent of memory size kept free
+DEFAULT_FLOOR_TEST_COUNT = 5
+OUT_OF_MEMORY_MARKERS = [
+    'Runtime exited',
+    'Runtime.OutOfMemory',
+    'Runtime.ExitError',
+    'MemoryError',
+]
+CORRELATION_ID_KEY = '_correlation_id'
+DEFAULT_ASYNC_TIMEOUT = 300  # Seconds to wait for all async results
+ASYNC_DRAIN_BATCH_SIZE = 100
+ASYNC_DRAIN_WAIT_SECONDS = 1
+SQS_MAX_BATCH_SIZE = 10
+SIGNIFICANCE_ALPHA = 0.05
+CONFIDENCE_LEVEL = 0.95
+BOOTSTRAP_RESAMPLES = 1000
+BOOTSTRAP_SEED = None
+BOOTSTRAP_CHUNK_ELEMENTS = 1000000  # Max resampled values held at once
+BOOTSTRAP_MAX_WORKERS = 4
+BOOTSTRAP_PARALLEL_MIN_SAMPLES = 100000
+BOOTSTRAP_MAX_SAMPLES_STDLIB = 500
+REGRESSION_THRESHOLD = 0.05  # Relative change in duration or cost that counts
+REGRESSION_BATCH_SIZE = 20  # Invocations between sequential tests
+REGRESSION_MIN_SAMPLES = 10
+REGRESSION_MAX_SAMPLES = 200
+BUDGET_PROBE_COUNT = 3  # Invocations per memory size to estimate costs
+BUDGET_MIN_SAMPLES = 5  # Samples every memory size gets before ranking
+BUDGET_BATCH_SIZE = 10  # Most invocations per scheduled batch
+BUDGET_MAX_FAILED_BATCHES = 3  # Failed batches in a row to retire a size
+REGRESSION_EXIT_CODES = {
+    'no_change': 0,
+    'improvement': 0,
+    'regression': 1,
+    'inconclusive': 2,
+}
+TRACE_FORMATS = [
+    'chrome',
+    'otlp',
+]
+DEFAULT_TRACE_FORMAT = 'chrome'
+TRACE_PATH = '/tmp/lambda-benchmark-trace.json'
+TRACE_SERVICE_NAME = 'lambda-memory-benchmark'
+OTLP_SPAN_KIND_INTERNAL = 1
+OTLP_STATUS_OK = 1
+OTLP_STATUS_ERROR = 2
+METRICS_NAMESPACE = 'LambdaMemoryBenchmark'
+METRICS_PREFIX = 'lambda_benchmark_'
+PROMETHEUS_PORT = 9100
+LATENCY_BUCKETS_MS = [
+    5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000,
+    300000, 900000,
+]
+DEFAULT_USE_CACHE = True
+CACHE_PATH = '/tmp/lambda-benchmark-cache.json'
+CACHE_TTL = 7 * 24 * 3600  # Seconds
+CACHE_MAX_ENTRIES = 1000
+# Benchmark attributes a cached result depends on, besides function identity
+CACHE_KEY_ATTRIBUTES = [
+    'mode',
+    'test_count',
+    'ignore_coldstart',
+    'timeout',
+    'max_threads',
+    'batch_size',
+    'load_rate',
+    'load_duration',
+    'load_arrivals',
+    'async_timeout',
+    'scaling_probe',
+    'scaling_max_workers',
+    'concurrency_sweep',
+    'concurrency_max',
+    'concurrency_test_count',
+    'region',
+    'replay_digest',
+    'replay_speedup',
+]
+BENCH_SAMPLE_SIZES = [1000, 10000, 100000]
+BENCH_REGRESSION_TOLERANCE = 0.2
+INIT_TIME_MODULE = 'lambda_function'
+INIT_TIME_BUDGET_MS = 150  # Cold import budget of the Lambda handler module
+INIT_TIME_RUNS = 3
+INIT_TIME_TOP = 10
+INIT_DEFERRED_MODULES = [  # Slow modules kept out of the cold start
+    'boto3',
+    'botocore',
+    'http.server',
+    'numpy',
+    'pprint',
+    'urllib.request',
+]
+LAMBDA_REQUEST_COST = 0.0000002  # US$ 0.20 per 1M requests
+# Lambda price per GB-second relative to us-east-1, in regions priced higher
+LAMBDA_REGION_PRICE_RATIOS = {
+    'af-south-1': 0.0000221 / 0.0000166667,
+    'ap-east-1': 0.00002292 / 0.0000166667,
+    'me-south-1': 0.0000206 / 0.0000166667,
+}
+# Lambda price per GB-second of arm64 (Graviton) relative to x86_64
+ARM64_PRICE_RATIO = 0.0000133334 / 0.0000166667
+# Price per GB-second, to price any memory size (billed per 100 ms)
+LAMBDA_GB_SECOND_PRICE = {
+    'x86_64': 0.0000166667,
+    'arm64': 0.0000133334,
+}
+LAMBDA_COST_BY_ARCHITECTURE = {
+    'x86_64': LAMBDA_COST_BY_MEMORY,
+    'arm64': {
+        memory: round(cost * ARM64_PRICE_RATIO, 9)
+        for memory, cost in LAMBDA_COST_BY_MEMORY.items()
+    },
+}
+PAYLOAD_LOGGER_NAME = 'benchmarker.payload'
+PAYLOAD_LOG_LEVEL = logging.INFO
+PAYLOAD_LOG_MAX_CHARS = 4096
+PAYLOAD_LOG_MAX_ITEMS = 10
 PAYLOAD_PRINT_MSG = {
     'event': 'EVENT PAYLOAD:',
     'response': 'RESPONSE OBJECT:',
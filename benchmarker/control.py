@@ -0,0 +1,72 @@
+'''Normalization of benchmark durations by a control canary function
+
+Durations measured minutes apart drift with the load of the Lambda fleet,
+which skews comparisons between memory sizes. A canary function, whose
+configuration never changes, is invoked alongside every batch of
+invocations: its slowdown from its own baseline is the drift at the time of
+the batch, and the batch's durations are divided by it.
+'''
+import statistics
+from typing import (
+    Dict,
+    List,
+    Sequence,
+)
+import constants as c
+
+
+def summarize_control(
+        *,
+        raw: Sequence[float],
+        normalized: Sequence[float],
+        controls: Sequence[float],
+        ) -> Dict:
+    '''Drift and variance removed by normalization at a memory size
+
+    'variance_removed' is the share of the variance of raw durations gone
+    from normalized ones. It is negative when the canary is noisier than
+    the drift it cancels.
+    '''
+    factors = [control for control in controls if control]
+    raw_variance = statistics.variance(raw) if len(raw) > 1 else 0.0
+    variance = statistics.variance(normalized) \
+        if len(normalized) > 1 else 0.0
+
+    return {
+        'count': len(raw),
+        'factor': round(sum(factors) / len(factors), 4) if factors else None,
+        'min_factor': round(min(factors), 4) if factors else None,
+        'max_factor': round(max(factors), 4) if factors else None,
+        'raw_variance': round(raw_variance, c.DURATION_DECIMALS),
+        'variance': round(variance, c.DURATION_DECIMALS),
+        'variance_removed':
+            round(1 - variance / raw_variance, 4) if raw_variance else None,
+    }
+
+
+def pooled_variance_removed(summaries: List[Dict]) -> Dict:
+    '''Variance removed across memory sizes, pooling their variances
+
+    Variances are pooled within each memory size, so differences between
+    sizes do not count as variance.
+    '''
+    raw = sum(
+        (item['count'] - 1) * item['raw_variance']
+        for item in summaries if item['count'] > 1
+    )
+    normalized = sum(
+        (item['count'] - 1) * item['variance']
+        for item in summaries if item['count'] > 1
+    )
+    factors = [
+        factor
+        for item in summaries
+        for factor in (item['min_factor'], item['max_factor'])
+        if factor is not None
+    ]
+
+    return {
+        'variance_removed': round(1 - normalized / raw, 4) if raw else None,
+        'min_factor': min(factors, default=None),
+        'max_factor': max(factors, default=None),
+    }
@@ -6,6 +6,11 @@ class CustomBenchmarkException(Exception):
     pass
 
 
+class BenchmarkConfigError(CustomBenchmarkException):
+    '''Invalid Benchmark configuration parameters'''
+    pass
+
+
 class SetOriginalConfigError(CustomBenchmarkException):
     '''Error setting local reference of original Lambda configuration'''
     pass
@@ -31,11 +36,41 @@ class SetLambdaMemoryError(CustomBenchmarkException):
     pass
 
 
+class SetLambdaArchitectureError(CustomBenchmarkException):
+    '''Error setting new Lambda architecture'''
+    pass
+
+
+class MemoryFloorError(CustomBenchmarkException):
+    '''Error finding the minimal memory size fitting a Lambda workload'''
+    pass
+
+
+class ControlCanaryError(CustomBenchmarkException):
+    '''Error measuring the baseline of a control canary function'''
+    pass
+
+
 class InvokeLambdaError(CustomBenchmarkException):
     '''Error Invoking Lambda'''
     pass
 
 
+class AsyncResultMissingError(InvokeLambdaError):
+    '''Result of an asynchronous invocation was not collected in time'''
+    pass
+
+
+class LambdaThrottledError(InvokeLambdaError):
+    '''Lambda invocation rejected due to throttling'''
+    pass
+
+
+class LambdaOutOfMemoryError(InvokeLambdaError):
+    '''Lambda invocation ran out of memory'''
+    pass
+
+
 class LambdaPayloadError(CustomBenchmarkException):
     '''Error on Lambda response payload'''
     pass
@@ -0,0 +1,127 @@
+'''Breakdown of benchmark durations by the hardware class of their hosts
+
+Lambda sandboxes land on hosts of different CPU generations, which adds
+variance to durations and can skew comparisons between memory sizes that
+happened to land on a different mix of hosts. Durations are grouped by
+hardware class and, optionally, averaged with the same reference mix of
+classes at every memory size.
+'''
+import statistics
+from typing import (
+    Dict,
+    List,
+    Sequence,
+    Union,
+)
+import constants as c
+
+
+def hardware_class(cpu: Union[Dict, None]) -> Union[str, None]:
+    '''Hardware class of a CPU fingerprint: model and instruction set flags
+
+    The clock speed and CPU count are left out, since they vary with load
+    and memory size rather than with the host generation.
+    '''
+    if type(cpu) is not dict or not cpu.get('model'):
+        return None
+
+    digest = cpu.get('flags_digest')
+
+    return f"{cpu['model']} [{digest}]" if digest else cpu['model']
+
+
+def summarize_hardware(durations: Dict[str, Sequence]) -> Dict[str, Dict]:
+    '''Share, mean and median duration of each hardware class'''
+    total = sum(len(values) for values in durations.values())
+
+    return {
+        hardware: {
+            'count': len(values),
+            'share': round(len(values) / total, 4),
+            'mean': round(sum(values) / len(values), c.DURATION_DECIMALS),
+            'median': statistics.median(values),
+        }
+        for hardware, values in sorted(durations.items())
+        if len(values)
+    }
+
+
+def pooled_mix(summaries: List[Dict[str, Dict]]) -> Dict[str, float]:
+    '''Share of each hardware class across all memory sizes'''
+    counts = {}
+
+    for summary in summaries:
+        for hardware, item in summary.items():
+            counts[hardware] = counts.get(hardware, 0) + item['count']
+
+    total = sum(counts.values())
+
+    return {
+        hardware: round(count / total, 4)
+        for hardware, count in sorted(counts.items())
+    } if total else {}
+
+
+def reweighted_average(
+        summary: Dict[str, Dict],
+        mix: Dict[str, float],
+        ) -> Dict:
+    '''Mean duration as if hosts were drawn from the reference mix
+
+    Classes of the mix not sampled at this memory size are left out and the
+    remaining weights renormalized; 'coverage' is the weight share that was
+    sampled, 1 when every class of the mix was.
+    '''
+    sampled = [hardware for hardware in mix if hardware in summary]
+    weight = sum(mix[hardware] for hardware in sampled)
+    total = sum(mix.values())
+
+    if not weight:
+        return {
+            'average': None,
+            'coverage': 0,
+            'missing': sorted(mix),
+        }
+
+    average = sum(
+        mix[hardware] * summary[hardware]['mean'] for hardware in sampled
+    ) / weight
+
+    return {
+        'average': round(average, c.DURATION_DECIMALS),
+        'coverage': round(weight / total, 4),
+        'missing': sorted(set(mix) - set(sampled)),
+    }
+
+
+def reweighted_durations(
+        durations: Dict[str, Sequence],
+        mix: Dict[str, float],
+        ) -> List[float]:
+    '''Durations resampled as if hosts were drawn from the reference mix
+
+    Each sampled class of the mix contributes its weight's share of the
+    samples, picked at evenly spaced quantiles of its durations, so that
+    significance is tested on the same mix the averages are weighted by.
+    '''
+    sampled = [
+        hardware for hardware in mix if len(durations.get(hardware, []))
+    ]
+    weight = sum(mix[hardware] for hardware in sampled)
+    total = sum(len(durations[hardware]) for hardware in sampled)
+
+    if not weight:
+        return []
+
+    resampled = []
+
+    for hardware in sampled:
+        values = sorted(durations[hardware])
+        count = round(total * mix[hardware] / weight)
+
+        resampled.extend(
+            values[int((index + 0.5) * len(values) / count)]
+            for index in range(count)
+        )
+
+    return resampled
@@ -0,0 +1,107 @@
+'''Cold import time of the benchmarker Lambda, like python -X importtime
+
+Usage: python init_time.py [--module lambda_function] [--runs 5]
+    [--budget 150] [--top 10]
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import (
+    Dict,
+)
+import constants as c
+
+
+def parse_importtime(output: str) -> Dict:
+    '''Parse `-X importtime` output into cumulative time per module (ms)
+
+    Lines look like 'import time:  self [us] | cumulative | imported package'
+    and nested imports are indented under the module importing them.
+    '''
+    modules = {}
+
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+
+        modules[name.strip()] = int(cumulative_us) / 1000
+
+    return modules
+
+
+def measure_import(module: str = c.INIT_TIME_MODULE) -> Dict:
+    '''Import a module in a fresh interpreter and time each import'''
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = parse_importtime(process.stderr)
+
+    return {
+        'module': module,
+        'total_ms': modules.get(module),
+        'modules': modules,
+    }
+
+
+def measure_init(
+        module: str = c.INIT_TIME_MODULE,
+        *,
+        runs: int = c.INIT_TIME_RUNS,
+        top: int = c.INIT_TIME_TOP,
+        ) -> Dict:
+    '''Fastest of several cold imports, with the slowest imported modules
+
+    Deferred modules (e.g. boto3) are reported when they are imported at
+    module load anyway.
+    '''
+    measures = [measure_import(module) for i in range(runs)]
+    fastest = min(measures, key=lambda measure: measure['total_ms'])
+    modules = fastest['modules']
+
+    return {
+        'module': module,
+        'runs': runs,
+        'total_ms': fastest['total_ms'],
+        'imports': len(modules),
+        'slowest': [
+            {'module': name, 'cumulative_ms': cumulative}
+            for name, cumulative in sorted(
+                modules.items(), key=lambda item: -item[1])
+            if name != module
+        ][:top],
+        'deferred_imported': [
+            name for name in c.INIT_DEFERRED_MODULES if name in modules
+        ],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default=c.INIT_TIME_MODULE)
+    parser.add_argument('--runs', type=int, default=c.INIT_TIME_RUNS)
+    parser.add_argument(
+        '--budget', type=float, default=c.INIT_TIME_BUDGET_MS,
+        help='maximum cold import time in milliseconds')
+    parser.add_argument('--top', type=int, default=c.INIT_TIME_TOP)
+    args = parser.parse_args()
+
+    result = measure_init(args.module, runs=args.runs, top=args.top)
+
+    print(json.dumps(result, indent=4))
+
+    if result['total_ms'] > args.budget or result['deferred_imported']:
+        print(
+            f"OVER BUDGET {result['total_ms']} ms (budget {args.budget} ms), "
+            f"deferred modules imported: {result['deferred_imported']}"
+        )
+
+        sys.exit(1)
@@ -2,9 +2,11 @@
 from typing import Dict
 from benchmark import Benchmark
 import custom_exceptions as custom_exc
+import metrics
+from regions import MultiRegionBenchmark
 from utils import (
+    log_payload,
     logger,
-    print_payload,
     validate_event,
 )
 
@@ -23,10 +25,98 @@ def handler(event: Dict, context: Dict) -> Dict:
     :lambda_event: (dict) event to provide the Lambda
     :memory_sets: (list) list of memory allocations to benchmark
         AWS Lambda accepts memory from 128 to 3008 Mb in increments of 128 Mb
+    :timeout: (int) Lambda timeout to set while benchmarking
+    :mode: (str) 'closed_loop' to invoke a new request after one finishes,
+        'load' to send requests at a target rate (open-loop), 'async' to
+        fan out 'Event' invocations and collect results from a queue or
+        'replay' to replay a recorded traffic trace
+    :load_rate: (float) requests per second to send in 'load' mode
+    :load_duration: (float) seconds to run the load test for each memory
+    :load_arrivals: (str) 'constant' or 'poisson' request arrivals
+    :architectures: (list) architectures to benchmark, 'x86_64' and/or
+        'arm64', defaults to 'x86_64' only; the function code is redeployed
+        on each architecture
+    :architecture_functions: (dict) optional twin function to benchmark for
+        an architecture, e.g. {'arm64': 'fibonacci-arm64'}, when the code
+        package cannot be redeployed as is (container images, native deps)
+    :use_cache: (bool) reuse results cached for the same function code,
+        runtime, architecture, memory, event and mode
+    :force_refresh: (bool) benchmark again, ignoring cached results
+    :cache_path: (str) path of the result cache file
+    :cache_ttl: (float) seconds until cached results expire
+    :memory_floor: (bool) search the smallest memory size fitting the
+        workload first, and skip smaller sizes in the benchmark
+    :memory_headroom: (float) percent of memory size that must stay free
+        above the peak Max Memory Used
+    :floor_test_count: (int) invocations per memory size probed
+    :collector_queue_url: (str) SQS queue set as the benchmarked function's
+        destination, where 'async' mode results are collected from
+    :async_timeout: (float) seconds to wait for async results
+    :trace: (bool) record a span for each config update, readiness wait,
+        warm-up and invocation, exported to trace_path
+    :trace_format: (str) 'chrome' trace-event JSON (Perfetto) or 'otlp'
+    :trace_path: (str) path of the exported trace file
+    :emit_metrics: (bool) print metrics in CloudWatch Embedded Metric Format
+    :batch_size: (int) workload iterations per invocation, each returned as
+        a sample; the function must honor the 'iterations' event key
+    :scaling_probe: (bool) invoke the function once more at each memory size
+        to get its multi-core 'scaling' report; meant for the scaling probe
+        function, which runs a CPU kernel on 1..N processes
+    :scaling_max_workers: (int) most workers the scaling probe runs on
+    :calibrate: (bool) tune the workload first, so durations land in the
+        calibration window at both the smallest and largest memory sizes
+    :calibration_parameter: (str) integer lambda_event key sizing the
+        workload, e.g. 'n' for the Fibonacci function
+    :calibration_window: (list) lowest and highest target durations (ms)
+    :calibration_test_count: (int) invocations per calibration probe
+    :baseline_path: (str) results file of a previous run; compares memory_sets
+        against it and returns a regression verdict instead of a ranking
+    :regression_threshold: (float) relative duration or cost change that
+        counts as a regression or improvement, e.g. 0.05 for 5%
+    :regression_alpha: (float) significance level of the comparison
+    :regression_batch_size: (int) invocations between sequential tests
+    :regression_max_samples: (int) samples per memory size to stop at when
+        the comparison is still undecided
+    :budget: (float) most US$ to spend on invocations of the benchmarked
+        function; samples are spread where they sharpen the cost ranking
+        most and partial rankings are returned once it is spent
+    :regions: (list) regions where the function is deployed under the same
+        name; the benchmark runs in all of them at once, each region with
+        its own pooled clients and prices, and results are merged with a
+        cross-region comparison
+    :replay_trace_path: (str) JSON lines file of recorded requests, each
+        with its arrival 'offset' in seconds and its 'event', replayed on
+        each memory size in 'replay' mode; ranked by total trace cost
+    :replay_speedup: (float) factor compressing the gaps between replayed
+        requests; shorter idle gaps understate cold starts
+    :concurrency_sweep: (bool) also measure each memory size with 1, 2,
+        4... concurrency_max invocations in flight, returning a memory by
+        concurrency grid of durations and throughput with the knee of each
+        curve and the level where durations start to degrade
+    :concurrency_max: (int) highest concurrency level of the sweep
+    :concurrency_test_count: (int) measured invocations per level, at least
+    :export_path: (str) directory where raw samples are written as columns,
+        partitioned by function, memory and architecture, to be analyzed
+        memory-mapped with columnar.py instead of parsing the results JSON
+    :export_format: (str) 'auto', 'arrow' (needs pyarrow), 'npy' (needs
+        NumPy) or 'raw' little-endian column files
+    :hardware_reference_mix: (str|dict) when the function reports a 'cpu'
+        fingerprint, durations are broken down by hardware class (CPU model
+        and flags); 'pooled' averages every memory size over the mix of
+        classes seen across all sizes, or a dict gives weights by class
+    :extrapolate: (bool) fit a duration model on the memory sizes
+        benchmarked, used as probes (e.g. [128, 512, 1769, 3008]), to predict
+        duration and cost at every size from 128 to 10240 MB, with the sizes
+        to benchmark next to narrow the predictions most
+    :control_function: (str) name of a canary function, or pinned alias
+        (function:alias), invoked alongside every batch of invocations with
+        an unchanged configuration; durations are divided by its slowdown
+        from its baseline to cancel drift, closed loop mode only
+    :control_test_count: (int) canary invocations to measure its baseline
     '''
     try:
         # Log event payload for debugging and security purposes
-        print_payload(payload_type='event', payload_obj=event)
+        log_payload(payload_type='event', payload_obj=event)
 
         valid, error = validate_event(event=event)
 
@@ -38,10 +128,20 @@ def handler(event: Dict, context: Dict) -> Dict:
             }
 
         else:
-            benchmarking = Benchmark(**event)
+            if event.get('regions'):
+                benchmarking = MultiRegionBenchmark(**event)
+
+            else:
+                benchmarking = Benchmark(**event)
 
             results = benchmarking.run()
 
+            if event.get('emit_metrics', True):
+                for line in benchmarking.metrics.to_emf():
+                    print(line)
+
+            metrics.registry.merge(benchmarking.metrics)
+
             response = {
                 'status': 200,
                 'results': results,
@@ -71,7 +171,7 @@ def handler(event: Dict, context: Dict) -> Dict:
             }
 
     # Log response object for debugging and security purposes
-    print_payload(payload_type='response', payload_obj=response)
+    log_payload(payload_type='response', payload_obj=response)
 
     return response
 
@@ -81,6 +181,9 @@ if __name__ == '__main__':
 
     pp = pprint.PrettyPrinter(indent=4)
 
+    server = metrics.serve_prometheus()
+    print(f'Serving metrics at http://localhost:{server.server_port}/metrics')
+
     event = {
         'verbose': True,
         'ignore_coldstart': True,
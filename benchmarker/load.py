@@ -0,0 +1,226 @@
+'''Open-loop load generator to test Lambda throughput at a target rate'''
+import concurrent.futures
+import random
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    Union,
+)
+import constants as c
+import custom_exceptions as custom_exc
+from samples import (
+    Invocation,
+    SampleColumns,
+)
+from sketch import QuantileSketch
+from utils import percentile
+
+
+class LoadGenerator():
+    '''Send requests at a target rate, regardless of response times
+
+    Latencies are measured from each request's scheduled arrival time, so
+    time spent queued behind slow requests is accounted for. They are kept
+    in a quantile sketch per window, and Lambda durations in one sketch, so
+    memory stays flat in long tests. Raw samples are only kept when asked,
+    e.g. to export them.
+    '''
+
+    def __init__(
+            self,
+            *,
+            invoke: Callable[[], Invocation],
+            rate: float = c.DEFAULT_LOAD_RATE,
+            duration: float = c.DEFAULT_LOAD_DURATION,
+            arrivals: str = c.DEFAULT_LOAD_ARRIVALS,
+            max_workers: int = c.LOAD_MAX_WORKERS,
+            window: float = c.LOAD_WINDOW_SECONDS,
+            ignore_coldstart: bool = c.IGNORE_COLDSTART,
+            keep_samples: bool = False,
+            seed: Union[int, None] = None,
+            ):
+        if arrivals not in c.LOAD_ARRIVALS:
+            raise custom_exc.BenchmarkConfigError(
+                f'Invalid load arrivals ({arrivals}), valid are '
+                f"{', '.join(c.LOAD_ARRIVALS)}"
+            )
+
+        if rate <= 0 or duration <= 0:
+            raise custom_exc.BenchmarkConfigError(
+                f'Load rate ({rate}) and duration ({duration}) must be '
+                'greater than 0 (zero)'
+            )
+
+        self.invoke = invoke
+        self.rate = rate
+        self.duration = duration
+        self.arrivals = arrivals
+        self.max_workers = max_workers
+        self.window = window
+        self.ignore_coldstart = ignore_coldstart
+        self.random = random.Random(seed)
+
+        self.samples = SampleColumns() if keep_samples else None
+        self.durations = QuantileSketch()
+        self.windows = {}
+        self.requests = 0
+        self.successes = 0
+        self.throttles = 0
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._outstanding = 0
+        self.max_concurrency = 0
+        self.max_outstanding = 0
+
+    def arrival_offsets(self) -> Iterator[float]:
+        '''Arrival times in seconds, relative to the start of the run'''
+        offset = 0.0
+
+        while True:
+            if self.arrivals == 'poisson':
+                offset += self.random.expovariate(self.rate)
+
+            else:
+                offset += 1 / self.rate
+
+            if offset >= self.duration:
+                return
+
+            yield offset
+
+    def run(self) -> Dict:
+        '''Run the load test and return its statistics'''
+        start = time.perf_counter()
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as pool:
+            for offset in self.arrival_offsets():
+                delay = start + offset - time.perf_counter()
+
+                if delay > 0:
+                    time.sleep(delay)
+
+                with self._lock:
+                    self._outstanding += 1
+                    self.max_outstanding = max(
+                        self.max_outstanding, self._outstanding)
+
+                pool.submit(self.request, start=start, offset=offset)
+
+        elapsed = time.perf_counter() - start
+
+        return self.statistics(elapsed=elapsed)
+
+    def request(self, *, start: float, offset: float):
+        '''Send one request and record its outcome'''
+        with self._lock:
+            self._in_flight += 1
+            self.max_concurrency = max(self.max_concurrency, self._in_flight)
+
+        try:
+            invocation = self.invoke()
+
+        finally:
+            latency = (time.perf_counter() - start - offset) * 1000
+
+            with self._lock:
+                self._in_flight -= 1
+                self._outstanding -= 1
+
+        with self._lock:
+            self.add_durations(invocation)
+
+            if self.samples is not None:
+                self.samples.append(
+                    invocation, ignore_coldstart=self.ignore_coldstart)
+
+            window = self.windows.get(int(offset // self.window))
+
+            if window is None:
+                window = self.windows[int(offset // self.window)] = {
+                    'latency': QuantileSketch(),
+                    'successes': 0,
+                    'throttles': 0,
+                }
+
+            window['latency'].add(latency)
+
+            self.requests += 1
+
+            if invocation.success:
+                window['successes'] += 1
+                self.successes += 1
+
+            elif invocation.error_code == \
+                    c.SAMPLE_ERROR_CODES['LambdaThrottledError']:
+                window['throttles'] += 1
+                self.throttles += 1
+
+    def add_durations(self, invocation: Invocation):
+        '''Add the valid durations of an invocation to the duration sketch
+
+        Follows SampleColumns: batched invocations add one duration per
+        iteration, of which only the first counts as a cold start.
+        '''
+        if not invocation.success:
+            return
+
+        durations = invocation.iterations or [invocation.duration]
+
+        for index, duration in enumerate(durations):
+            if self.ignore_coldstart and invocation.cold_start and not index:
+                continue
+
+            self.durations.add(duration)
+
+    def statistics(self, *, elapsed: float) -> Dict:
+        '''Summarize throughput, latency, concurrency and throttling'''
+        requests = self.requests
+        successes = self.successes
+        throttles = self.throttles
+
+        latency = QuantileSketch()
+
+        for window in self.windows.values():
+            latency.merge(window['latency'])
+
+        return {
+            'target_rate': self.rate,
+            'arrivals': self.arrivals,
+            'duration': round(elapsed, 3),
+            'requests': requests,
+            'achieved_throughput': round(successes / elapsed, 3),
+            'throttle_rate': round(throttles / requests, 4) if requests else 0,
+            'error_rate':
+                round(1 - successes / requests, 4) if requests else 0,
+            'max_concurrency': self.max_concurrency,
+            'max_outstanding': self.max_outstanding,
+            'latency': latency.percentiles(),
+            'latency_relative_accuracy': latency.relative_accuracy,
+            'latency_sketch': latency.to_dict(),
+            'lambda_duration': self.durations.percentiles(),
+            'duration_sketch': self.durations.to_dict(),
+            'windows': [
+                {
+                    'start': index * self.window,
+                    'requests': len(window['latency']),
+                    'throughput': round(window['successes'] / self.window, 3),
+                    'throttles': window['throttles'],
+                    'latency': window['latency'].percentiles(),
+                }
+                for index, window in sorted(self.windows.items())
+            ],
+        }
+
+
+def latency_percentiles(latencies) -> Dict:
+    '''Percentiles of latencies in milliseconds'''
+    ordered = sorted(latencies)
+
+    return {
+        f'p{q}': round(percentile(ordered, q), 3) if ordered else None
+        for q in c.LOAD_PERCENTILES
+    }
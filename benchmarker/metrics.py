@@ -0,0 +1,248 @@
+'''In-process metrics registry with counters and latency histograms'''
+from bisect import bisect_left
+import json
+import threading
+import time
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+import constants as c
+
+
+class Histogram():
+    '''Fixed-bucket histogram, cheap to update'''
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', 'max')
+
+    def __init__(self, bounds: List[float] = c.LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        # Last bucket counts observations above the highest bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        # Bucket bounds only bound the largest observation, it is kept
+        self.max = None
+
+    def observe(self, value: float):
+        '''Add an observation'''
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: 'Histogram'):
+        '''Add the observations of another histogram with the same bounds'''
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+
+        self.sum += other.sum
+        self.count += other.count
+
+        if other.max is not None and (self.max is None or
+                                      other.max > self.max):
+            self.max = other.max
+
+    def quantile(self, q: float) -> float:
+        '''Upper bound of the bucket holding the q (0-1) quantile'''
+        if not self.count:
+            return None
+
+        target = q * self.count
+        cumulative = 0
+
+        for index, count in enumerate(self.counts):
+            cumulative += count
+
+            if cumulative >= target:
+                break
+
+        return self.bounds[min(index, len(self.bounds) - 1)]
+
+
+class MetricsRegistry():
+    '''Counters and histograms keyed by metric name and label values'''
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name: str, labels: Dict) -> Tuple:
+        '''Metric name and sorted label pairs, leaving out unset labels'''
+        return (name, tuple(sorted(
+            (label, value) for label, value in labels.items()
+            if value is not None
+        )))
+
+    def inc(self, name: str, value: int = 1, **labels):
+        '''Increment a counter'''
+        key = self.key(name, labels)
+
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        '''Add an observation to a histogram'''
+        key = self.key(name, labels)
+
+        with self._lock:
+            histogram = self.histograms.get(key)
+
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+
+            histogram.observe(value)
+
+    def merge(self, other: 'MetricsRegistry'):
+        '''Add the metrics of another registry to this one'''
+        with self._lock:
+            for key, value in other.counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+            for key, histogram in other.histograms.items():
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(histogram.bounds)
+
+                self.histograms[key].merge(histogram)
+
+    def to_emf(self, *, namespace: str = c.METRICS_NAMESPACE) -> List[str]:
+        '''CloudWatch Embedded Metric Format lines, one per label set
+
+        Histograms are summarized as count, average, p50, p99 and max.
+        '''
+        by_labels = {}
+
+        for (name, labels), value in self.counters.items():
+            by_labels.setdefault(labels, {})[name] = (value, 'Count')
+
+        for (name, labels), histogram in self.histograms.items():
+            metrics = by_labels.setdefault(labels, {})
+            metrics[f'{name}_count'] = (histogram.count, 'Count')
+            metrics[f'{name}_avg'] = (
+                histogram.sum / histogram.count if histogram.count else 0,
+                'Milliseconds',
+            )
+
+            for q, suffix in ((0.5, 'p50'), (0.99, 'p99')):
+                metrics[f'{name}_{suffix}'] = (
+                    histogram.quantile(q), 'Milliseconds')
+
+            metrics[f'{name}_max'] = (histogram.max, 'Milliseconds')
+
+        lines = []
+        timestamp = int(time.time() * 1000)
+
+        for labels, metrics in by_labels.items():
+            record = {
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': namespace,
+                        'Dimensions': [[label for label, value in labels]],
+                        'Metrics': [
+                            {'Name': name, 'Unit': unit}
+                            for name, (value, unit) in sorted(metrics.items())
+                        ],
+                    }],
+                },
+            }
+            record.update({label: str(value) for label, value in labels})
+            record.update({
+                name: value for name, (value, unit) in metrics.items()
+            })
+
+            lines.append(json.dumps(record))
+
+        return lines
+
+    def to_prometheus(self) -> str:
+        '''Metrics in the Prometheus text exposition format'''
+        lines = []
+        typed = set()
+
+        def labels_text(labels, **extra) -> str:
+            pairs = list(labels) + list(extra.items())
+
+            if not pairs:
+                return ''
+
+            return '{' + ','.join(
+                f'{label}="{value}"' for label, value in pairs) + '}'
+
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f'{c.METRICS_PREFIX}{name}_total'
+
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} counter')
+                typed.add(metric)
+
+            lines.append(f'{metric}{labels_text(labels)} {value}')
+
+        for (name, labels), histogram in sorted(
+                self.histograms.items(), key=lambda item: item[0]):
+            metric = f'{c.METRICS_PREFIX}{name}'
+
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} histogram')
+                typed.add(metric)
+
+            cumulative = 0
+
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'{metric}_bucket{labels_text(labels, le=bound)} '
+                    f'{cumulative}'
+                )
+
+            lines.append(
+                f'{metric}_bucket{labels_text(labels, le="+Inf")} '
+                f'{histogram.count}'
+            )
+            lines.append(f'{metric}_sum{labels_text(labels)} {histogram.sum}')
+            lines.append(
+                f'{metric}_count{labels_text(labels)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry, cumulative across runs, served to Prometheus
+registry = MetricsRegistry()
+
+
+def serve_prometheus(
+        *,
+        metrics: MetricsRegistry = registry,
+        port: int = c.PROMETHEUS_PORT,
+        ):
+    '''Serve metrics at /metrics on a background thread, for local runs'''
+    # Imported here, the Lambda runtime never serves metrics
+    import http.server
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+
+            body = metrics.to_prometheus().encode('utf-8')
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('', port), MetricsHandler)
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
@@ -0,0 +1,303 @@
+'''Amdahl-style model of duration across Lambda memory sizes
+
+Lambda allocates CPU in proportion to memory, a full vCPU at 1769 MB and up
+to 6 vCPUs at 10240 MB. A workload running `workers` threads gets a CPU
+share of min(memory / 1769, workers), so its duration follows
+
+    t(m) = serial + parallel / min(m / 1769, workers)
+
+where `serial` is the time not bound by CPU (network, I/O waits) and
+`parallel` the CPU time at one full vCPU. The model is linear in serial and
+parallel, which are fitted by least squares on the measured durations of a
+few probe sizes, for each candidate worker count.
+'''
+import math
+from typing import (
+    Dict,
+    List,
+    Sequence,
+    Union,
+)
+import constants as c
+from stats import normal_quantile
+
+
+def cpu_share(memory: float, *, workers: int = 1) -> float:
+    '''vCPUs usable by a workload running `workers` threads at a memory size'''
+    return min(memory / c.LAMBDA_FULL_VCPU_MEMORY, workers)
+
+
+class DurationModel():
+    '''Least squares fit of t(m) = serial + parallel / cpu_share(m)'''
+
+    def __init__(self, *, workers: int = 1):
+        self.workers = workers
+        self.serial = None
+        self.parallel = None
+        self.sigma = None
+        self.r_squared = None
+        self.count = 0
+        self.x_mean = None
+        self.sxx = None
+        self.probes = []
+
+    def design(self, memory: float) -> float:
+        '''Regressor of a memory size: inverse of its CPU share'''
+        return 1 / cpu_share(memory, workers=self.workers)
+
+    def fit(self, observations: Dict[int, Sequence[float]]) -> 'DurationModel':
+        '''Fit on durations measured at each probe memory size'''
+        points = [
+            (self.design(memory), duration)
+            for memory, durations in observations.items()
+            for duration in durations
+        ]
+        self.probes = sorted(observations)
+        self.count = len(points)
+
+        if len({x for x, y in points}) < 2:
+            raise ValueError(
+                'Fitting the duration model requires durations of at least '
+                'two memory sizes with different CPU shares')
+
+        self.x_mean = sum(x for x, y in points) / self.count
+        y_mean = sum(y for x, y in points) / self.count
+        self.sxx = sum((x - self.x_mean) ** 2 for x, y in points)
+        sxy = sum((x - self.x_mean) * (y - y_mean) for x, y in points)
+
+        self.parallel = sxy / self.sxx
+        self.serial = y_mean - self.parallel * self.x_mean
+
+        residuals = sum(
+            (y - self.serial - self.parallel * x) ** 2 for x, y in points)
+        total = sum((y - y_mean) ** 2 for x, y in points)
+
+        self.sigma = math.sqrt(residuals / (self.count - 2)) \
+            if self.count > 2 else 0.0
+        self.r_squared = 1 - residuals / total if total else 1.0
+
+        return self
+
+    @property
+    def residual_sum(self) -> float:
+        return self.sigma ** 2 * max(self.count - 2, 0)
+
+    def variance_factor(
+            self,
+            memory: float,
+            *,
+            count: Union[int, None] = None,
+            x_mean: Union[float, None] = None,
+            sxx: Union[float, None] = None,
+            ) -> float:
+        '''Variance of the predicted mean duration, in units of sigma^2
+
+        The design (count, mean and spread of regressors) defaults to the
+        fitted one, another can be given to evaluate further probes.
+        '''
+        count = count or self.count
+        x_mean = self.x_mean if x_mean is None else x_mean
+        sxx = sxx or self.sxx
+
+        return 1 / count + (self.design(memory) - x_mean) ** 2 / sxx
+
+    def predict(
+            self,
+            memory: float,
+            *,
+            confidence: float = c.CONFIDENCE_LEVEL,
+            ) -> tuple:
+        '''Predicted mean duration and its confidence band'''
+        duration = self.serial + self.parallel * self.design(memory)
+        z = normal_quantile(0.5 + confidence / 2)
+        error = z * self.sigma * math.sqrt(self.variance_factor(memory))
+
+        return duration, max(duration - error, 0.0), duration + error
+
+
+def fit_duration_model(
+        observations: Dict[int, Sequence[float]],
+        *,
+        max_workers: int = c.LAMBDA_MAX_VCPUS,
+        ) -> DurationModel:
+    '''Fit the model for 1..max_workers workers, keep the closest fit
+
+    Worker counts that predict a negative serial or parallel time are not
+    physical and only kept when no count gives a physical fit. Counts that
+    cannot be fitted, e.g. one worker when every probe has a full vCPU or
+    more, are skipped.
+    '''
+    fits = []
+    error = None
+
+    for workers in range(1, max_workers + 1):
+        try:
+            model = DurationModel(workers=workers).fit(observations)
+
+        except ValueError as exc:
+            error = exc
+            continue
+
+        physical = model.serial >= 0 and model.parallel >= 0
+
+        fits.append((not physical, model.residual_sum, workers, model))
+
+    if not fits:
+        raise error
+
+    return min(fits)[-1]
+
+
+def gb_second_cost(
+        *,
+        memory: float,
+        duration: float,
+        architecture: str = c.DEFAULT_ARCHITECTURE,
+        region: Union[str, None] = None,
+        ) -> float:
+    '''Cost of an invocation at any memory size, billed per 100 ms'''
+    billed_seconds = math.ceil(duration / 100) / 10
+
+    return billed_seconds * memory / 1024 * \
+        c.LAMBDA_GB_SECOND_PRICE[architecture] * \
+        c.LAMBDA_REGION_PRICE_RATIOS.get(region, 1.0)
+
+
+def next_probes(
+        model: DurationModel,
+        *,
+        candidates: Sequence[int],
+        count: int = c.EXTRAPOLATION_NEXT_PROBES,
+        samples: int = c.EXTRAPOLATION_PROBE_SAMPLES,
+        ) -> List[int]:
+    '''Probe sizes that most reduce the prediction uncertainty
+
+    Greedily picks the candidate whose `samples` more measurements would
+    most reduce the prediction variance averaged over all candidates
+    (I-optimal design). The variance only depends on where durations are
+    measured, not on their values, so picks are chained without measuring.
+    '''
+    designs = [model.design(memory) for memory in candidates]
+    n = model.count
+    x_mean = model.x_mean
+    sxx = model.sxx
+    picks = []
+
+    # Mean of (x - x_mean)^2 over candidates is their variance plus the
+    # squared distance of their mean to x_mean, no need to sum each time
+    design_mean = sum(designs) / len(designs)
+    design_variance = sum(
+        (x - design_mean) ** 2 for x in designs) / len(designs)
+
+    def average_variance(n, x_mean, sxx) -> float:
+        return 1 / n + (design_variance + (design_mean - x_mean) ** 2) / sxx
+
+    def add_probe(x: float) -> tuple:
+        new_n = n + samples
+        new_mean = (n * x_mean + samples * x) / new_n
+        new_sxx = sxx + n * samples / new_n * (x - x_mean) ** 2
+
+        return new_n, new_mean, new_sxx
+
+    # Regressors repeat past the vCPU cap, evaluate each distinct one once
+    distinct = {}
+
+    for memory, x in zip(candidates, designs):
+        distinct.setdefault(round(x, 9), memory)
+
+    for i in range(count):
+        best = min(
+            distinct.items(),
+            key=lambda item: average_variance(*add_probe(item[0])),
+        )
+
+        picks.append(best[1])
+        n, x_mean, sxx = add_probe(best[0])
+        del distinct[best[0]]
+
+    return sorted(picks)
+
+
+def extrapolate(
+        *,
+        observations: Dict[int, Sequence[float]],
+        architecture: str = c.DEFAULT_ARCHITECTURE,
+        region: Union[str, None] = None,
+        min_memory: int = c.LAMBDA_MIN_MEMORY,
+        max_memory: int = c.LAMBDA_MAX_MEMORY,
+        step: int = c.EXTRAPOLATION_STEP,
+        confidence: float = c.CONFIDENCE_LEVEL,
+        ) -> Dict:
+    '''Predicted duration and cost at every memory size from probe sizes
+
+    Predictions are returned as columns, one value per memory size, with
+    the low and high ends of their confidence bands. The cost band follows
+    from the duration band.
+    '''
+    model = fit_duration_model(observations)
+    memories = list(range(min_memory, max_memory + 1, step))
+
+    predictions = {
+        'memory': memories,
+        'duration': [],
+        'duration_low': [],
+        'duration_high': [],
+        'cost': [],
+        'cost_low': [],
+        'cost_high': [],
+    }
+
+    for memory in memories:
+        duration, low, high = model.predict(memory, confidence=confidence)
+
+        for key, value in (
+                ('duration', duration),
+                ('duration_low', low),
+                ('duration_high', high)):
+            predictions[key].append(round(value, c.DURATION_DECIMALS))
+
+        for key, value in (
+                ('cost', duration),
+                ('cost_low', low),
+                ('cost_high', high)):
+            predictions[key].append(round(gb_second_cost(
+                memory=memory,
+                duration=value,
+                architecture=architecture,
+                region=region,
+            ), c.EXTRAPOLATION_COST_DECIMALS))
+
+    def best(key: str) -> Dict:
+        index = min(
+            range(len(memories)),
+            key=lambda i: (predictions[key][i], memories[i]),
+        )
+
+        return {
+            name: values[index] for name, values in predictions.items()}
+
+    return {
+        'architecture': architecture,
+        'model': {
+            'serial': round(model.serial, c.DURATION_DECIMALS),
+            'parallel': round(model.parallel, c.DURATION_DECIMALS),
+            'workers': model.workers,
+            'sigma': round(model.sigma, c.DURATION_DECIMALS),
+            'r_squared': round(model.r_squared, 4),
+            'probes': model.probes,
+            'samples': model.count,
+        },
+        'confidence': confidence,
+        'best': {
+            'cost': best('cost'),
+            'duration': best('duration'),
+        },
+        'next_probes': next_probes(
+            model,
+            candidates=[
+                memory for memory in memories
+                if memory not in observations
+            ],
+        ),
+        'predictions': predictions,
+    }
@@ -0,0 +1,159 @@
+'''Benchmark the same function deployed in several regions at once'''
+import concurrent.futures
+import os
+from typing import (
+    Dict,
+    List,
+)
+from benchmark import Benchmark
+import constants as c
+import custom_exceptions as custom_exc
+from metrics import MetricsRegistry
+from utils import logger
+
+
+class MultiRegionBenchmark():
+    '''Run the benchmark sweep in every region concurrently
+
+    Each region gets its own Benchmark, talking to the region's endpoints
+    with its own pooled clients and priced at the region's Lambda price.
+    Results are merged into per-region rankings and a cross-region
+    comparison.
+    '''
+
+    def __init__(self, *, regions: List[str], **params):
+        if type(regions) is not list or not regions:
+            raise custom_exc.BenchmarkConfigError(
+                'Argument "regions" must be a non-empty list of regions')
+
+        self.regions = list(dict.fromkeys(regions))
+
+        # Regions must not overwrite each other's cache and trace files
+        for key, default in (
+                ('cache_path', c.CACHE_PATH),
+                ('trace_path', c.TRACE_PATH)):
+            params[key] = params.get(key, default)
+
+        self.benchmarks = {
+            region: Benchmark(
+                **dict(
+                    params,
+                    region=region,
+                    cache_path=region_path(params['cache_path'], region),
+                    trace_path=region_path(params['trace_path'], region),
+                )
+            )
+            for region in self.regions
+        }
+
+        self.public_errors = []
+        self.metrics = MetricsRegistry()
+        self.results = {}
+
+    def run(self) -> Dict:
+        '''Run the benchmark in all regions and merge their results'''
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(self.regions),
+                thread_name_prefix='region') as executor:
+            futures = {
+                region: executor.submit(benchmark.run)
+                for region, benchmark in self.benchmarks.items()
+            }
+
+        region_results = {}
+
+        for region, future in futures.items():
+            benchmark = self.benchmarks[region]
+
+            try:
+                region_results[region] = future.result()
+
+            # A failing region must not discard the other regions results
+            except Exception as error:
+                logger.warning(f'Benchmark failed in {region}: {error}')
+                benchmark.append_public_error(error=error)
+
+            self.public_errors.extend(
+                f'{region}: {error}' for error in benchmark.public_errors)
+            self.metrics.merge(benchmark.metrics)
+
+        self.results = merge_region_results(results=region_results)
+
+        return self.results
+
+
+def region_path(path: str, region: str) -> str:
+    '''Path with the region appended to the file name'''
+    root, extension = os.path.splitext(path)
+
+    return f'{root}-{region}{extension}'
+
+
+def merge_region_results(*, results: Dict[str, Dict]) -> Dict:
+    '''Merge per-region results, ranking and comparing the regions
+
+    The 'comparison' holds, for each memory size and architecture measured
+    in more than one region, the duration and cost in each region relative
+    to the best region.
+    '''
+    merged = {
+        'regions': results,
+        'ranking': {
+            'cost': [],
+            'duration': [],
+        },
+        'comparison': [],
+    }
+
+    measured = {}
+
+    for region, result in results.items():
+        # Baseline comparisons return a verdict rather than a ranking
+        ranking = result.get('ranking', {'cost': [], 'duration': []})
+
+        for item in ranking['cost']:
+            merged['ranking']['cost'].append(dict(item, region=region))
+
+            measured.setdefault(
+                (item['memory'], item['architecture']), {}
+            ).setdefault(region, {})['cost'] = item['cost']
+
+        for item in ranking['duration']:
+            merged['ranking']['duration'].append(dict(item, region=region))
+
+            measured.setdefault(
+                (item['memory'], item['architecture']), {}
+            ).setdefault(region, {})['duration'] = item['duration']
+
+    merged['ranking']['cost'].sort(key=lambda k: k['cost'])
+    merged['ranking']['duration'].sort(key=lambda k: k['duration'])
+
+    for (memory, architecture), by_region in sorted(measured.items()):
+        if len(by_region) < 2:
+            continue
+
+        fastest = min(by_region, key=lambda r: by_region[r]['duration'])
+        cheapest = min(by_region, key=lambda r: by_region[r]['cost'])
+        best_duration = by_region[fastest]['duration']
+        best_cost = by_region[cheapest]['cost']
+
+        merged['comparison'].append({
+            'memory': memory,
+            'architecture': architecture,
+            'fastest_region': fastest,
+            'cheapest_region': cheapest,
+            'regions': {
+                region: {
+                    'duration': values['duration'],
+                    'cost': values['cost'],
+                    'relative_duration': round(
+                        values['duration'] / best_duration, 4)
+                    if best_duration else None,
+                    'relative_cost': round(values['cost'] / best_cost, 4)
+                    if best_cost else None,
+                }
+                for region, values in sorted(by_region.items())
+            },
+        })
+
+    return merged
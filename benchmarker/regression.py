@@ -0,0 +1,182 @@
+'''Regression gate of a focused benchmark run against a baseline run
+
+Usage: python regression.py --baseline results.json --memory 1024
+    [--function fibonacci] [--region us-east-1] [--event '{"n": 30}']
+    [--threshold 0.05]
+
+The baseline is the results of a previous run (or the benchmarker Lambda
+response holding them). Exits with 0 when there is no regression, 1 on a
+regression and 2 when the comparison is inconclusive.
+'''
+import argparse
+import json
+import statistics
+import sys
+from typing import (
+    Dict,
+    List,
+    Sequence,
+    Tuple,
+    Union,
+)
+import constants as c
+from stats import (
+    confidence_intervals,
+    mann_whitney_u,
+)
+from utils import lambda_execution_cost
+
+
+def baseline_durations(results: Dict) -> Dict[Tuple, List]:
+    '''Durations of a baseline run, by (memory, architecture)'''
+    # Accept the benchmarker Lambda response as well as bare results
+    if 'results' in results and 'logs' not in results:
+        results = results['results']
+
+    durations = {}
+
+    for log in results.get('logs', []):
+        invocations = (log.get('duration') or {}).get('all_invocations')
+
+        if not invocations:
+            continue
+
+        key = (log['memory'], log.get('architecture', c.DEFAULT_ARCHITECTURE))
+        durations[key] = invocations
+
+    return durations
+
+
+def load_baseline(path: str) -> Dict[Tuple, List]:
+    '''Load baseline durations from a results JSON file'''
+    with open(path) as baseline_file:
+        return baseline_durations(json.load(baseline_file))
+
+
+def sequential_test(
+        *,
+        baseline: Sequence,
+        current: Sequence,
+        memory: int,
+        architecture: str = c.DEFAULT_ARCHITECTURE,
+        region: Union[str, None] = None,
+        threshold: float = c.REGRESSION_THRESHOLD,
+        alpha: float = c.SIGNIFICANCE_ALPHA,
+        final: bool = False,
+        ) -> Dict:
+    '''Decide regression, improvement or no change, if the data is clear
+
+    A regression (improvement) is a significantly slower (faster) median
+    whose duration or billed cost changed by more than `threshold`. No
+    change is decided once the confidence interval of the current median
+    lies within `threshold` of the baseline median. The verdict is None
+    while undecided, and 'inconclusive' when still undecided on the `final`
+    look.
+    '''
+    baseline_median = statistics.median(baseline)
+    current_median = statistics.median(current)
+
+    duration_change = current_median / baseline_median - 1
+
+    baseline_cost = lambda_execution_cost(
+        memory=memory,
+        duration=baseline_median,
+        architecture=architecture,
+        region=region,
+    )
+    current_cost = lambda_execution_cost(
+        memory=memory,
+        duration=current_median,
+        architecture=architecture,
+        region=region,
+    )
+    cost_change = current_cost / baseline_cost - 1 if baseline_cost else 0.0
+
+    p_value = mann_whitney_u(current, baseline)['p_value']
+    significant = p_value < alpha
+
+    result = {
+        'verdict': None,
+        'conclusive': True,
+        'samples': len(current),
+        'baseline_samples': len(baseline),
+        'baseline_median': baseline_median,
+        'current_median': current_median,
+        'duration_change': round(duration_change, 4),
+        'cost_change': round(cost_change, 4),
+        'p_value': round(p_value, 6),
+    }
+
+    if significant and current_median > baseline_median and \
+            max(duration_change, cost_change) > threshold:
+        result['verdict'] = 'regression'
+
+    elif significant and current_median < baseline_median and \
+            min(duration_change, cost_change) < -threshold:
+        result['verdict'] = 'improvement'
+
+    else:
+        low, high = confidence_intervals(
+            current, confidence=1 - alpha)['median']
+
+        if baseline_median * (1 - threshold) <= low and \
+                high <= baseline_median * (1 + threshold):
+            result['verdict'] = 'no_change'
+
+        elif final:
+            result['verdict'] = 'inconclusive'
+            result['conclusive'] = False
+
+    return result
+
+
+def overall_verdict(comparisons: List[Dict]) -> str:
+    '''Worst verdict across memory sizes, 'inconclusive' when none
+
+    A size left undecided makes the gate inconclusive, unless another size
+    regressed.
+    '''
+    verdicts = {comparison.get('verdict') for comparison in comparisons}
+
+    for verdict in ('regression', 'inconclusive', 'improvement', 'no_change'):
+        if verdict in verdicts:
+            return verdict
+
+    return 'inconclusive'
+
+
+if __name__ == '__main__':
+    from benchmark import Benchmark
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--baseline', metavar='PATH', required=True)
+    parser.add_argument('--memory', type=int, nargs='+', required=True)
+    parser.add_argument('--function', default=c.DEFAULT_LAMBDA_FUNCTION)
+    parser.add_argument('--region', default=None)
+    parser.add_argument(
+        '--event', type=json.loads, default=c.DEFAULT_LAMBDA_EVENT)
+    parser.add_argument(
+        '--threshold', type=float, default=c.REGRESSION_THRESHOLD)
+    parser.add_argument('--alpha', type=float, default=c.SIGNIFICANCE_ALPHA)
+    parser.add_argument(
+        '--max-samples', type=int, default=c.REGRESSION_MAX_SAMPLES)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    benchmarking = Benchmark(
+        verbose=args.verbose,
+        lambda_function=args.function,
+        region=args.region,
+        lambda_event=args.event,
+        memory_sets=args.memory,
+        baseline_path=args.baseline,
+        regression_threshold=args.threshold,
+        regression_alpha=args.alpha,
+        regression_max_samples=args.max_samples,
+    )
+
+    results = benchmarking.run()
+
+    print(json.dumps(results, indent=4))
+
+    sys.exit(c.REGRESSION_EXIT_CODES[results['verdict']])
@@ -0,0 +1,186 @@
+'''Replay of recorded production traffic against a Lambda function
+
+A trace file holds one JSON request per line, with its arrival time in
+seconds and the event it was invoked with:
+
+{"offset": 0.0, "event": {"n": 30}}
+{"offset": 12.5, "event": {"n": 25}}
+
+Offsets may also be absolute timestamps, they are taken relative to the
+first request. A line may be an [offset, event] pair instead of a dict.
+'''
+import concurrent.futures
+import hashlib
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Tuple,
+)
+import constants as c
+import custom_exceptions as custom_exc
+from load import latency_percentiles
+from samples import (
+    Invocation,
+    SampleColumns,
+)
+from sketch import QuantileSketch
+from utils import (
+    json_dumps,
+    json_loads,
+    JSON_DECODE_ERRORS,
+)
+
+
+def load_trace(path: str) -> Tuple[List[Tuple[float, bytes]], str]:
+    '''Requests of a trace file, sorted by offset, and the trace digest
+
+    Events are serialized once here, not on every replay.
+    '''
+    requests = []
+    digest = hashlib.sha256()
+
+    try:
+        with open(path, 'rb') as trace_file:
+            for number, line in enumerate(trace_file, start=1):
+                if not line.strip():
+                    continue
+
+                digest.update(line)
+
+                try:
+                    record = json_loads(line)
+
+                    if type(record) is list:
+                        offset, event = record
+
+                    else:
+                        offset = record[c.REPLAY_OFFSET_KEY]
+                        event = record[c.REPLAY_EVENT_KEY]
+
+                    requests.append((float(offset), json_dumps(event)))
+
+                except (*JSON_DECODE_ERRORS, KeyError, TypeError,
+                        ValueError) as error:
+                    raise custom_exc.BenchmarkConfigError(
+                        f'Invalid request on line {number} of trace file '
+                        f'({path}): {type(error).__name__}'
+                    )
+
+    except OSError as error:
+        raise custom_exc.BenchmarkConfigError(
+            f'Cannot read trace file ({path}): {error}')
+
+    if not requests:
+        raise custom_exc.BenchmarkConfigError(
+            f'Trace file ({path}) has no requests')
+
+    requests.sort(key=lambda request: request[0])
+    start = requests[0][0]
+
+    return (
+        [(offset - start, payload) for offset, payload in requests],
+        digest.hexdigest(),
+    )
+
+
+class TraceReplayer():
+    '''Send the requests of a trace at their recorded arrival times
+
+    A speedup above 1 compresses time: every gap between requests shrinks
+    by the same factor. Shorter idle gaps keep more sandboxes warm, so a
+    compressed replay reports fewer cold starts than the real traffic had.
+    '''
+
+    def __init__(
+            self,
+            *,
+            invoke: Callable[[bytes], Invocation],
+            requests: List[Tuple[float, bytes]],
+            speedup: float = c.DEFAULT_REPLAY_SPEEDUP,
+            max_workers: int = c.LOAD_MAX_WORKERS,
+            ):
+        if speedup <= 0:
+            raise custom_exc.BenchmarkConfigError(
+                f'Replay speedup ({speedup}) must be greater than 0 (zero)')
+
+        self.invoke = invoke
+        self.requests = requests
+        self.speedup = speedup
+        self.max_workers = max_workers
+
+        self.samples = SampleColumns()
+        self.latencies = QuantileSketch()
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.max_concurrency = 0
+
+    def run(self) -> Dict:
+        '''Replay the trace and return its statistics'''
+        start = time.perf_counter()
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as pool:
+            for offset, payload in self.requests:
+                offset = offset / self.speedup
+                delay = start + offset - time.perf_counter()
+
+                if delay > 0:
+                    time.sleep(delay)
+
+                pool.submit(
+                    self.request, start=start, offset=offset, payload=payload)
+
+        elapsed = time.perf_counter() - start
+
+        return self.statistics(elapsed=elapsed)
+
+    def request(self, *, start: float, offset: float, payload: bytes):
+        '''Send one request and record its outcome'''
+        with self._lock:
+            self._in_flight += 1
+            self.max_concurrency = max(self.max_concurrency, self._in_flight)
+
+        try:
+            invocation = self.invoke(payload)
+
+        finally:
+            latency = (time.perf_counter() - start - offset) * 1000
+
+            with self._lock:
+                self._in_flight -= 1
+
+        with self._lock:
+            # Cold starts are part of the traffic, all samples count
+            self.samples.append(invocation, ignore_coldstart=False)
+            self.latencies.add(latency)
+
+    def statistics(self, *, elapsed: float) -> Dict:
+        '''Summarize cold starts, errors and latencies of the replay'''
+        success_code = c.SAMPLE_ERROR_CODES[None]
+        throttle_code = c.SAMPLE_ERROR_CODES['LambdaThrottledError']
+
+        requests = len(self.samples)
+        successes = self.samples.error_code.count(success_code)
+        throttles = self.samples.error_code.count(throttle_code)
+        cold_starts = sum(self.samples.cold_start)
+
+        return {
+            'requests': requests,
+            'speedup': self.speedup,
+            'trace_duration': round(self.requests[-1][0], 3),
+            'duration': round(elapsed, 3),
+            'cold_starts': cold_starts,
+            'cold_start_rate':
+                round(cold_starts / requests, 4) if requests else 0,
+            'throttle_rate': round(throttles / requests, 4) if requests else 0,
+            'error_rate':
+                round(1 - successes / requests, 4) if requests else 0,
+            'max_concurrency': self.max_concurrency,
+            'latency': self.latencies.percentiles(),
+            'latency_relative_accuracy': self.latencies.relative_accuracy,
+            'lambda_duration': latency_percentiles(
+                self.samples.durations(ignore_coldstart=False)),
+        }
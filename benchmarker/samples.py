@@ -0,0 +1,206 @@
+'''Compact storage for Lambda invocation samples'''
+from array import array
+from typing import Dict
+import constants as c
+
+
+class Invocation():
+    '''Outcome of a single Lambda invocation, keeping only needed fields'''
+
+    __slots__ = (
+        'success',
+        'error',
+        'duration',
+        'overhead',
+        'cold_start',
+        'error_code',
+        'max_memory_used',
+        'iterations',
+        'hardware',
+    )
+
+    def __init__(self):
+        self.success = False
+        self.error = None
+        self.duration = None
+        self.overhead = None
+        self.cold_start = False
+        self.error_code = c.SAMPLE_ERROR_CODES[None]
+        self.max_memory_used = None
+        # Durations of each workload iteration, in batched invocations
+        self.iterations = None
+        # Hardware class of the host that ran the invocation, if reported
+        self.hardware = None
+
+    def set_error(self, error: Exception):
+        '''Flag the invocation as failed with a given error'''
+        self.success = False
+        self.error = str(error)
+        self.error_code = c.SAMPLE_ERROR_CODES.get(
+            type(error).__name__, c.SAMPLE_ERROR_CODES['Unknown'])
+
+
+class SampleColumns():
+    '''Column-oriented, array-backed storage of invocation samples
+
+    Each column holds one primitive value per invocation, which takes a few
+    bytes per sample instead of a dict of Python objects:
+
+    :duration: (float64) Lambda duration in milliseconds, -1 when unavailable
+    :overhead: (float32) client wall time minus duration, in milliseconds,
+        the whole wall time of failed invocations
+    :cold_start: (int8) 1 for cold starts, 0 otherwise
+    :error_code: (int8) code from SAMPLE_ERROR_CODES, 0 on success
+    :max_memory_used: (uint16) Max Memory Used in MB, 0 when unavailable
+    :hardware: (uint16) index in hardware_classes, 0 when unknown
+    :control: (float32) control canary slowdown of the sample's batch from
+        its baseline, 0 when no canary ran
+
+    A batched invocation adds one sample per workload iteration, sharing the
+    invocation overhead. Only its first iteration counts as a cold start.
+    '''
+
+    __slots__ = (
+        'duration',
+        'overhead',
+        'cold_start',
+        'error_code',
+        'max_memory_used',
+        'hardware',
+        'control',
+        'hardware_classes',
+        'valid_count',
+    )
+
+    def __init__(self):
+        self.duration = array('d')
+        self.overhead = array('f')
+        self.cold_start = array('b')
+        self.error_code = array('b')
+        self.max_memory_used = array('H')
+        self.hardware = array('H')
+        self.control = array('f')
+        self.hardware_classes = [None]
+        self.valid_count = 0
+
+    def __len__(self) -> int:
+        return len(self.duration)
+
+    def append(
+            self,
+            invocation: Invocation,
+            *,
+            ignore_coldstart: bool = True,
+            control: float = 0.0,
+            ):
+        '''Append an invocation to the columns, with its batch's control'''
+        if invocation.success and invocation.iterations:
+            durations = invocation.iterations
+            overhead = (invocation.overhead or 0.0) / len(durations)
+
+        else:
+            durations = [invocation.duration if invocation.success else -1]
+            overhead = invocation.overhead or 0.0
+
+        if invocation.hardware in self.hardware_classes:
+            hardware = self.hardware_classes.index(invocation.hardware)
+
+        else:
+            hardware = len(self.hardware_classes)
+            self.hardware_classes.append(invocation.hardware)
+
+        for index, duration in enumerate(durations):
+            self.duration.append(duration)
+            self.overhead.append(overhead)
+            self.cold_start.append(
+                1 if invocation.cold_start and index == 0 else 0)
+            self.error_code.append(invocation.error_code)
+            self.max_memory_used.append(invocation.max_memory_used or 0)
+            self.hardware.append(hardware)
+            self.control.append(control)
+
+            if self.is_valid(len(self) - 1, ignore_coldstart=ignore_coldstart):
+                self.valid_count += 1
+
+    def is_valid(self, index: int, *, ignore_coldstart: bool = True) -> bool:
+        '''Whether a sample counts towards benchmark durations'''
+        if self.error_code[index] != c.SAMPLE_ERROR_CODES[None]:
+            return False
+
+        return not (ignore_coldstart and self.cold_start[index])
+
+    def durations(self, *, ignore_coldstart: bool = True) -> array:
+        '''Durations of valid samples'''
+        return array('d', (
+            duration
+            for index, duration in enumerate(self.duration)
+            if self.is_valid(index, ignore_coldstart=ignore_coldstart)
+        ))
+
+    def normalized_durations(
+            self,
+            *,
+            ignore_coldstart: bool = True,
+            ) -> array:
+        '''Durations of valid samples divided by their batch's control
+
+        Samples of batches without a control canary are left as measured.
+        '''
+        return array('d', (
+            duration / (self.control[index] or 1.0)
+            for index, duration in enumerate(self.duration)
+            if self.is_valid(index, ignore_coldstart=ignore_coldstart)
+        ))
+
+    def controls(self, *, ignore_coldstart: bool = True) -> array:
+        '''Control canary slowdowns of valid samples, 0 without a canary'''
+        return array('d', (
+            control
+            for index, control in enumerate(self.control)
+            if self.is_valid(index, ignore_coldstart=ignore_coldstart)
+        ))
+
+    def durations_by_hardware(
+            self,
+            *,
+            ignore_coldstart: bool = True,
+            normalized: bool = False,
+            ) -> Dict[str, array]:
+        '''Durations of valid samples of each known hardware class
+
+        Normalized durations are divided by their batch's control, like
+        normalized_durations.
+        '''
+        durations = {}
+
+        for index, duration in enumerate(self.duration):
+            hardware = self.hardware_classes[self.hardware[index]]
+            valid = self.is_valid(index, ignore_coldstart=ignore_coldstart)
+
+            if hardware is None or not valid:
+                continue
+
+            if hardware not in durations:
+                durations[hardware] = array('d')
+
+            if normalized:
+                duration /= self.control[index] or 1.0
+
+            durations[hardware].append(duration)
+
+        return durations
+
+    def nbytes(self) -> int:
+        '''Approximate memory used by the column buffers'''
+        return sum(
+            column.buffer_info()[1] * column.itemsize
+            for column in (
+                self.duration,
+                self.overhead,
+                self.cold_start,
+                self.error_code,
+                self.max_memory_used,
+                self.hardware,
+                self.control,
+            )
+        )
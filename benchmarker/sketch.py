@@ -0,0 +1,169 @@
+'''Mergeable streaming quantile sketch with a relative accuracy guarantee'''
+import math
+from typing import (
+    Dict,
+    List,
+    Union,
+)
+import constants as c
+
+
+class QuantileSketch():
+    '''Logarithmically bucketed quantile sketch (DDSketch)
+
+    A positive value x is counted in bucket ceil(log(x) / log(gamma)), with
+    gamma = (1 + a) / (1 - a) for a relative accuracy `a`. Any quantile is
+    then estimated within a relative error of `a` of the exact value at the
+    same rank, whatever the distribution and the number of values.
+
+    Memory is a counter per non-empty bucket, about log(max / min) /
+    log(gamma) of them: ~800 from 0.1 ms to 15 minutes at 1%. Beyond
+    max_buckets the lowest buckets are collapsed together, which only
+    degrades the accuracy of the lowest quantiles.
+
+    Sketches with the same accuracy merge exactly, as if all values had
+    been added to one sketch.
+    '''
+
+    __slots__ = (
+        'relative_accuracy',
+        'gamma',
+        'max_buckets',
+        'buckets',
+        'zero_count',
+        'count',
+        'sum',
+        'min',
+        'max',
+        '_log_gamma',
+    )
+
+    def __init__(
+            self,
+            *,
+            relative_accuracy: float = c.SKETCH_RELATIVE_ACCURACY,
+            max_buckets: int = c.SKETCH_MAX_BUCKETS,
+            ):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(
+                f'Relative accuracy ({relative_accuracy}) must be between 0 '
+                'and 1')
+
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.max_buckets = max_buckets
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._log_gamma = math.log(self.gamma)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, value: float, count: int = 1):
+        '''Add a value, `count` times'''
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+        # Durations are never negative, non-positive values count as zero
+        if value <= c.SKETCH_MIN_VALUE:
+            self.zero_count += count
+            return
+
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+        if len(self.buckets) > self.max_buckets:
+            self.collapse()
+
+    def collapse(self):
+        '''Merge the lowest buckets until within max_buckets'''
+        indexes = sorted(self.buckets)
+        excess = len(indexes) - self.max_buckets
+
+        for index in indexes[:excess]:
+            self.buckets[indexes[excess]] += self.buckets.pop(index)
+
+    def merge(self, other: 'QuantileSketch'):
+        '''Add all values of another sketch with the same accuracy'''
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(
+                'Cannot merge sketches of different relative accuracies '
+                f'({self.relative_accuracy}, {other.relative_accuracy})')
+
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+        if len(self.buckets) > self.max_buckets:
+            self.collapse()
+
+    def quantile(self, q: float) -> Union[float, None]:
+        '''Estimate of the q (0-1) quantile, None when empty'''
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+
+        if cumulative > rank:
+            return max(self.min, 0.0)
+
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+
+            if cumulative > rank:
+                break
+
+        # Bucket midpoint in relative terms, clamped to the exact extremes
+        estimate = 2 * self.gamma ** index / (self.gamma + 1)
+
+        return min(max(estimate, self.min), self.max)
+
+    def percentiles(
+            self,
+            percentiles: List[float] = c.LOAD_PERCENTILES,
+            ) -> Dict:
+        '''Estimates of percentiles (0-100), like load.latency_percentiles'''
+        return {
+            f'p{q}': round(self.quantile(q / 100), 3) if self.count else None
+            for q in percentiles
+        }
+
+    def to_dict(self) -> Dict:
+        '''JSON serializable sketch, to merge sketches across processes'''
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'count': self.count,
+            'zero_count': self.zero_count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'buckets': {str(index): n for index, n in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        '''Sketch from its to_dict() serialization'''
+        sketch = cls(relative_accuracy=data['relative_accuracy'])
+        sketch.count = data['count']
+        sketch.zero_count = data['zero_count']
+        sketch.sum = data['sum']
+        sketch.buckets = {
+            int(index): n for index, n in data['buckets'].items()}
+
+        if data['count']:
+            sketch.min = data['min']
+            sketch.max = data['max']
+
+        return sketch
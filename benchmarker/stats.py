@@ -0,0 +1,296 @@
+'''Statistical tests and confidence intervals for benchmark durations'''
+import concurrent.futures
+import functools
+import math
+import random
+import statistics
+from typing import (
+    Dict,
+    List,
+    Sequence,
+    Union,
+)
+import constants as c
+from utils import logger
+
+
+@functools.lru_cache(maxsize=None)
+def numpy_module():
+    '''NumPy, imported on first use since it is slow to import, or None'''
+    try:
+        import numpy
+
+    except ImportError:
+        return None
+
+    return numpy
+
+
+def normal_quantile(p: float) -> float:
+    '''Quantile of the standard normal distribution'''
+    return statistics.NormalDist().inv_cdf(p)
+
+
+def _rank_sum_stdlib(a: Sequence, b: Sequence) -> tuple:
+    '''Rank sum of `a` in the pooled samples and the tie correction term'''
+    n = len(a) + len(b)
+    pooled = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+
+    rank_sum_a = 0.0
+    tie_term = 0
+    index = 0
+
+    while index < n:
+        end = index
+
+        while end + 1 < n and pooled[end + 1][0] == pooled[index][0]:
+            end += 1
+
+        ties = end - index + 1
+        average_rank = (index + end) / 2 + 1
+        rank_sum_a += average_rank * sum(
+            1 for i in range(index, end + 1) if pooled[i][1] == 0)
+        tie_term += ties ** 3 - ties
+        index = end + 1
+
+    return rank_sum_a, tie_term
+
+
+def _rank_sum_numpy(a: Sequence, b: Sequence) -> tuple:
+    '''Rank sum of `a` in the pooled samples and the tie correction term,
+    vectorized with NumPy'''
+    np = numpy_module()
+    pooled = np.concatenate([
+        np.asarray(a, dtype=np.float64),
+        np.asarray(b, dtype=np.float64),
+    ])
+    order = np.argsort(pooled, kind='stable')
+    ordered = pooled[order]
+
+    # Runs of tied values share the average of their 1-based ranks
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    ties = np.diff(np.r_[starts, len(pooled)]).astype(np.float64)
+
+    ranks = np.empty(len(pooled))
+    ranks[order] = np.repeat(starts + (ties + 1) / 2, ties.astype(np.int64))
+
+    return float(ranks[:len(a)].sum()), float((ties ** 3 - ties).sum())
+
+
+def mann_whitney_u(a: Sequence, b: Sequence) -> Dict:
+    '''Two-sided Mann-Whitney U test, with normal approximation
+
+    Ties get average ranks and the variance is corrected for them. Returns
+    the U statistic of `a`, its z-score and the two-sided p-value. Ranks
+    are computed with NumPy when installed.
+    '''
+    n_a = len(a)
+    n_b = len(b)
+    n = n_a + n_b
+
+    if not n_a or not n_b:
+        raise ValueError('Mann-Whitney U test requires non-empty samples')
+
+    rank_sum = _rank_sum_numpy if numpy_module() is not None \
+        else _rank_sum_stdlib
+    rank_sum_a, tie_term = rank_sum(a, b)
+
+    u = rank_sum_a - n_a * (n_a + 1) / 2
+    mean_u = n_a * n_b / 2
+    variance = n_a * n_b / 12 * ((n + 1) - tie_term / (n * (n - 1))) \
+        if n > 1 else 0
+
+    if variance <= 0:
+        return {'u': u, 'z': 0.0, 'p_value': 1.0}
+
+    # Continuity correction
+    z = (abs(u - mean_u) - 0.5) / math.sqrt(variance)
+    z = max(z, 0.0)
+
+    return {
+        'u': u,
+        'z': round(z, 4),
+        'p_value': min(math.erfc(z / math.sqrt(2)), 1.0),
+    }
+
+
+def _bootstrap_chunk(values, resamples: int, seed: int) -> tuple:
+    '''Medians and means of `resamples` bootstrap resamples, with NumPy'''
+    np = numpy_module()
+    rng = np.random.default_rng(seed)
+    data = np.asarray(values)
+    size = len(data)
+
+    # Bound the resampling matrix size to keep memory use flat
+    rows = max(c.BOOTSTRAP_CHUNK_ELEMENTS // size, 1)
+    medians = []
+    means = []
+
+    for start in range(0, resamples, rows):
+        count = min(rows, resamples - start)
+        sample = data[rng.integers(0, size, size=(count, size))]
+        medians.append(np.median(sample, axis=1))
+        means.append(sample.mean(axis=1))
+
+    return np.concatenate(medians), np.concatenate(means)
+
+
+def _bootstrap_numpy(values, *, resamples: int, seed: int) -> tuple:
+    '''Vectorized bootstrap, split across processes for large samples'''
+    np = numpy_module()
+    workers = c.BOOTSTRAP_MAX_WORKERS
+
+    if len(values) < c.BOOTSTRAP_PARALLEL_MIN_SAMPLES or workers < 2:
+        return _bootstrap_chunk(values, resamples, seed)
+
+    counts = [resamples // workers] * workers
+    counts[0] += resamples - sum(counts)
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(
+                _bootstrap_chunk,
+                [values] * workers,
+                counts,
+                [seed + i for i in range(workers)],
+            ))
+
+    # Process pools are unavailable in some sandboxes (e.g. no /dev/shm)
+    except (OSError, NotImplementedError) as error:
+        logger.warning(f'Running bootstrap in a single process: {error}')
+
+        return _bootstrap_chunk(values, resamples, seed)
+
+    return (
+        np.concatenate([part[0] for part in parts]),
+        np.concatenate([part[1] for part in parts]),
+    )
+
+
+def _bootstrap_stdlib(values, *, resamples: int, seed: int) -> tuple:
+    '''Bootstrap with the standard library, for small samples'''
+    rng = random.Random(seed)
+    data = list(values)
+    medians = []
+    means = []
+
+    for i in range(resamples):
+        sample = rng.choices(data, k=len(data))
+        medians.append(statistics.median(sample))
+        means.append(sum(sample) / len(sample))
+
+    return medians, means
+
+
+def _analytic_intervals(values, *, confidence: float) -> Dict:
+    '''Distribution-free median and normal mean confidence intervals'''
+    ordered = sorted(values)
+    n = len(ordered)
+    z = normal_quantile(0.5 + confidence / 2)
+
+    # Ranks bounding the median from the binomial normal approximation
+    half_width = z * math.sqrt(n) / 2
+    low_rank = max(math.floor(n / 2 - half_width), 0)
+    high_rank = min(math.ceil(n / 2 + half_width), n - 1)
+
+    mean = sum(ordered) / n
+    error = z * statistics.stdev(ordered) / math.sqrt(n) if n > 1 else 0
+
+    return {
+        'median': (ordered[low_rank], ordered[high_rank]),
+        'mean': (mean - error, mean + error),
+    }
+
+
+def confidence_intervals(
+        values: Sequence,
+        *,
+        confidence: float = c.CONFIDENCE_LEVEL,
+        resamples: int = c.BOOTSTRAP_RESAMPLES,
+        seed: Union[int, None] = c.BOOTSTRAP_SEED,
+        ) -> Dict:
+    '''Confidence intervals for the median and the mean of values
+
+    Uses a percentile bootstrap, vectorized with NumPy when installed. Large
+    samples without NumPy use analytic intervals instead, since a pure
+    Python bootstrap would be too slow.
+    '''
+    if not len(values):
+        raise ValueError('Cannot compute confidence intervals of no values')
+
+    np = numpy_module()
+
+    if np is None and len(values) > c.BOOTSTRAP_MAX_SAMPLES_STDLIB:
+        intervals = _analytic_intervals(values, confidence=confidence)
+        method = 'analytic'
+
+    else:
+        seed = seed if seed is not None else random.randrange(2 ** 32)
+
+        if np is not None:
+            medians, means = _bootstrap_numpy(
+                values, resamples=resamples, seed=seed)
+            medians = sorted(medians.tolist())
+            means = sorted(means.tolist())
+            method = 'bootstrap-numpy'
+
+        else:
+            medians, means = _bootstrap_stdlib(
+                values, resamples=resamples, seed=seed)
+            medians.sort()
+            means.sort()
+            method = 'bootstrap'
+
+        alpha = (1 - confidence) / 2
+        low = max(math.floor(alpha * resamples), 0)
+        high = min(math.ceil((1 - alpha) * resamples) - 1, resamples - 1)
+
+        intervals = {
+            'median': (medians[low], medians[high]),
+            'mean': (means[low], means[high]),
+        }
+
+    return dict(intervals, method=method, confidence=confidence)
+
+
+def significance_tiers(
+        groups: List[Dict],
+        *,
+        alpha: float = c.SIGNIFICANCE_ALPHA,
+        ) -> Dict:
+    '''Group samples that are not significantly different into tiers
+
+    Each group is a dict with an 'id' and its 'durations'. Groups are sorted
+    by median duration and each tier holds the groups whose durations are not
+    significantly different from the tier's fastest group.
+    '''
+    ordered = sorted(groups, key=lambda g: statistics.median(g['durations']))
+    pairwise = []
+    p_values = {}
+
+    for i, group_a in enumerate(ordered):
+        for group_b in ordered[i + 1:]:
+            test = mann_whitney_u(group_a['durations'], group_b['durations'])
+            p_values[(group_a['id'], group_b['id'])] = test['p_value']
+
+            pairwise.append({
+                'a': group_a['id'],
+                'b': group_b['id'],
+                'p_value': round(test['p_value'], 6),
+                'significant': test['p_value'] < alpha,
+            })
+
+    tiers = []
+
+    for group in ordered:
+        if tiers and p_values[(tiers[-1][0], group['id'])] >= alpha:
+            tiers[-1].append(group['id'])
+
+        else:
+            tiers.append([group['id']])
+
+    return {
+        'alpha': alpha,
+        'pairwise': pairwise,
+        'tiers': tiers,
+    }
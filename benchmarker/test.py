@@ -1,23 +1,114 @@
 '''Test cases for benchmark Lambda'''
+import base64
+import concurrent.futures
+import itertools
 import json
+import math
+import mmap
 from random import (
+    Random,
+    expovariate,
+    gauss,
+    lognormvariate,
     randint,
+    seed,
 )
+import os
+import statistics
+import sys
+import tempfile
 import threading
+import time
 import unittest
+import urllib.request
 from unittest.mock import (
     call,
     MagicMock,
     patch,
 )
+from bench import (
+    bench_suite,
+    compare_to_baseline,
+    FakeLambdaBackend,
+    FakeRegionalBackend,
+)
 from benchmark import Benchmark
+from budget import BudgetScheduler
+from cache import ResultCache
+from collector import LocalQueueCollector
+from columnar import (
+    export_samples,
+    MappedPartition,
+    partitions,
+    summarize_partition,
+)
+from concurrency import (
+    concurrency_levels,
+    find_knee,
+)
 import constants as c
+from control import (
+    pooled_variance_removed,
+    summarize_control,
+)
 import custom_exceptions as custom_exc
+from hardware import (
+    hardware_class,
+    pooled_mix,
+    reweighted_average,
+    reweighted_durations,
+)
+from init_time import (
+    measure_init,
+    parse_importtime,
+)
 from lambda_function import handler as lambda_handler
+from load import LoadGenerator
+from regions import (
+    MultiRegionBenchmark,
+    region_path,
+)
+from replay import (
+    load_trace,
+    TraceReplayer,
+)
+from regression import (
+    baseline_durations,
+    overall_verdict,
+    sequential_test,
+)
+from metrics import (
+    MetricsRegistry,
+    serve_prometheus,
+)
+from model import (
+    extrapolate,
+    fit_duration_model,
+    gb_second_cost,
+)
+from samples import (
+    Invocation,
+    SampleColumns,
+)
+from sketch import QuantileSketch
+from stats import (
+    confidence_intervals,
+    mann_whitney_u,
+    numpy_module,
+    significance_tiers,
+)
+from tracing import Tracer
+import utils
 from utils import (
     get_lambda_config,
     invoke_lambda,
+    is_throttling_error,
+    json_dumps,
     lambda_execution_cost,
+    LazyPayload,
+    parse_invocation_report,
+    percentile,
+    summarize_payload,
     update_lambda_config,
     validate_event,
 )
@@ -27,6 +118,27 @@ TEST_REMAINING_TIME = 1000
 COLD_START_TRUE = True
 LAMBDA_STATE = iter([])
 LAMBDA_REMAINING_TIME = iter([])
+# Small uncached benchmark run against fake backends, unless overridden
+FAKE_BENCHMARK_PARAMS = {
+    'test_count': 5,
+    'max_threads': 5,
+    'memory_sets': [128, 256],
+    'architectures': ['x86_64'],
+    'use_cache': False,
+}
+
+
+def run_fake_benchmark(
+        backend,
+        *,
+        benchmark_class: type = Benchmark,
+        **params,
+        ) -> tuple:
+    '''Run a benchmark against a fake backend, return it and its results'''
+    benchmarking = benchmark_class(**dict(FAKE_BENCHMARK_PARAMS, **params))
+
+    with backend.patch():
+        return benchmarking, benchmarking.run()
 
 
 class CustomMock():
@@ -78,6 +190,13 @@ class CustomMock():
         '''Mock invoke_lambda function raising an exception'''
         return MagicMock(side_effect=KeyError('foobar'))
 
+    @staticmethod
+    def invoke_lambda_throttled():
+        '''Mock invoke_lambda function raising a throttling error'''
+        error = Exception('Rate Exceeded')
+        error.response = {'Error': {'Code': 'TooManyRequestsException'}}
+        return MagicMock(side_effect=error)
+
     @staticmethod
     def invoke_lambda_payload_error():
         '''Mock invoke_lambda function with Payload error'''
@@ -151,8 +270,8 @@ class TestLambdaUtils(unittest.TestCase):
         self.assertTrue(valid3)
         self.assertIsNone(error3)
 
-    @patch('utils.boto3')
-    def test_update_function_memory(self, boto3):
+    @patch('utils.aws_client')
+    def test_update_function_memory(self, aws_client):
         '''Test function that allocate new memory value for Lambda'''
         test_memory_size = 512
 
@@ -161,19 +280,17 @@ class TestLambdaUtils(unittest.TestCase):
             memory_size=test_memory_size,
         )
 
-        boto3.session.Session.assert_called()
+        aws_client.assert_called_with(
+            'lambda', region=None, max_connections=c.AWS_MAX_POOL_CONNECTIONS)
 
-        client = boto3.session.Session().client
-        client.assert_called_with('lambda')
-
-        aws_lambda = client()
+        aws_lambda = aws_client()
         aws_lambda.update_function_configuration.assert_called_with(
             FunctionName=c.DEFAULT_LAMBDA_FUNCTION,
             MemorySize=test_memory_size,
         )
 
-    @patch('utils.boto3')
-    def test_invoke_lambda(self, boto3):
+    @patch('utils.aws_client')
+    def test_invoke_lambda(self, aws_client):
         '''Test invocation of a Lambda function'''
         invocation_type = 'RequestResponse'
         log_type = 'None'
@@ -185,36 +302,91 @@ class TestLambdaUtils(unittest.TestCase):
             log_type=log_type,
         )
 
-        boto3.session.Session.assert_called()
-
-        client = boto3.session.Session().client
-        client.assert_called_with('lambda')
+        aws_client.assert_called_with(
+            'lambda', region=None, max_connections=c.AWS_MAX_POOL_CONNECTIONS)
 
-        aws_lambda = client()
+        aws_lambda = aws_client()
         aws_lambda.invoke.assert_called_with(
             FunctionName=c.DEFAULT_LAMBDA_FUNCTION,
             InvocationType=invocation_type,
             LogType=log_type,
-            Payload=json.dumps(c.DEFAULT_LAMBDA_EVENT),
+            Payload=json_dumps(c.DEFAULT_LAMBDA_EVENT),
+        )
+
+    def test_client_pool_size(self):
+        '''Test clients pool at least one connection per concurrent call'''
+        for mode, params, connections in [
+                ('closed_loop', {'max_threads': 10}, 11),
+                ('closed_loop', {'max_threads': 100}, 101),
+                ('load', {}, c.LOAD_MAX_WORKERS),
+                ('closed_loop', {
+                    'concurrency_sweep': True,
+                    'concurrency_max': 256,
+                }, 256)]:
+            benchmarking = Benchmark(mode=mode, **params)
+
+            self.assertEqual(benchmarking.max_connections, connections)
+
+        with patch('benchmark.invoke_lambda') as invoke:
+            Benchmark(max_threads=100).get_execution_time()
+
+        self.assertEqual(invoke.call_args[1]['max_connections'], 101)
+
+    @patch('utils.aws_client')
+    def test_invoke_lambda_preserialized(self, aws_client):
+        '''Test invocation of a Lambda with a pre-serialized payload'''
+        payload = json_dumps(c.DEFAULT_LAMBDA_EVENT)
+
+        invoke_lambda(
+            function_name=c.DEFAULT_LAMBDA_FUNCTION,
+            payload=payload,
+            invocation_type='RequestResponse',
         )
 
-    @patch('utils.boto3')
-    def test_get_lambda_config(self, boto3):
+        aws_lambda = aws_client()
+        self.assertIs(aws_lambda.invoke.call_args[1]['Payload'], payload)
+
+    @patch('utils.aws_client')
+    def test_get_lambda_config(self, aws_client):
         '''Test getting Lambda configuration'''
         get_lambda_config(
             function_name=c.DEFAULT_LAMBDA_FUNCTION,
         )
 
-        boto3.session.Session.assert_called()
-
-        client = boto3.session.Session().client
-        client.assert_called_with('lambda')
+        aws_client.assert_called_with(
+            'lambda', region=None, max_connections=c.AWS_MAX_POOL_CONNECTIONS)
 
-        aws_lambda = client()
+        aws_lambda = aws_client()
         aws_lambda.get_function_configuration.assert_called_with(
             FunctionName=c.DEFAULT_LAMBDA_FUNCTION,
         )
 
+    @patch('boto3.session.Session')
+    def test_aws_client_per_sandbox(self, Session):
+        '''Test clients are created once and shared across threads'''
+        utils._clients.clear()
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(8) as executor:
+                clients = list(executor.map(
+                    lambda i: utils.lambda_client(), range(32)))
+
+            self.assertEqual(Session().client.call_count, 1)
+            self.assertTrue(all(client is clients[0] for client in clients))
+
+            utils.sqs_client('eu-west-1')
+
+            self.assertEqual(Session().client.call_count, 2)
+            self.assertEqual(
+                Session().client.call_args[1]['region_name'], 'eu-west-1')
+            self.assertEqual(
+                Session().client.call_args[1]['config'].max_pool_connections,
+                c.AWS_MAX_POOL_CONNECTIONS,
+            )
+
+        finally:
+            utils._clients.clear()
+
     def test_lambda_execution_cost(self):
         '''Test calculation of Lambda execution cost'''
         test_sets = [
@@ -243,6 +415,424 @@ class TestLambdaUtils(unittest.TestCase):
 
             self.assertEqual(cost, test['expected_cost'])
 
+    def test_lambda_execution_cost_arm64(self):
+        '''Test arm64 executions are priced lower than x86_64'''
+        x86_cost = lambda_execution_cost(memory=1024, duration=100000)
+        arm_cost = lambda_execution_cost(
+            memory=1024,
+            duration=100000,
+            architecture='arm64',
+        )
+
+        self.assertAlmostEqual(arm_cost / x86_cost, 0.8, places=3)
+
+        with self.assertRaises(custom_exc.CalculateLambdaExecutionCostError):
+            lambda_execution_cost(
+                memory=1024, duration=1000, architecture='foobar')
+
+    def test_percentile(self):
+        '''Test percentile calculation with linear interpolation'''
+        ordered = [10, 20, 30, 40]
+
+        self.assertEqual(percentile(ordered, 0), 10)
+        self.assertEqual(percentile(ordered, 50), 25)
+        self.assertEqual(percentile(ordered, 100), 40)
+
+        with self.assertRaises(ValueError):
+            percentile([], 50)
+
+    def test_is_throttling_error(self):
+        '''Test detection of Lambda throttling errors'''
+        throttled = Exception('throttled')
+        throttled.response = {'Error': {'Code': 'TooManyRequestsException'}}
+
+        self.assertTrue(is_throttling_error(throttled))
+        self.assertFalse(is_throttling_error(KeyError('foobar')))
+
+    def test_parse_invocation_report(self):
+        '''Test parsing Max Memory Used and OOM errors from invocations'''
+        logs = 'REPORT RequestId: 1\tMemory Size: 128 MB\t' \
+            'Max Memory Used: 97 MB\t'
+
+        report = parse_invocation_report(response={
+            'LogResult': base64.b64encode(logs.encode('utf-8')),
+            'Payload': {'remaining_time': 100},
+        })
+
+        self.assertEqual(report['max_memory_used'], 97)
+        self.assertFalse(report['out_of_memory'])
+
+        report = parse_invocation_report(response={
+            'FunctionError': 'Unhandled',
+            'Payload': {
+                'errorType': 'Runtime.ExitError',
+                'errorMessage': 'Runtime exited with error: signal: killed',
+            },
+        })
+
+        self.assertIsNone(report['max_memory_used'])
+        self.assertTrue(report['out_of_memory'])
+
+    def test_summarize_payload(self):
+        '''Test summarization of large arrays in logged payloads'''
+        payload = {
+            'short': [1, 2, 3],
+            'long': {'all_invocations': list(range(1000))},
+        }
+
+        summary = summarize_payload(payload, max_items=5)
+
+        self.assertEqual(summary['short'], [1, 2, 3])
+        self.assertEqual(summary['long']['all_invocations'], {
+            'count': 1000,
+            'head': [0, 1, 2, 3, 4],
+            'min': 0,
+            'max': 999,
+        })
+
+    def test_lazy_payload_size_cap(self):
+        '''Test payload log records are capped to a maximum size'''
+        payload = {'errors': ['x' * 10000]}
+
+        record = str(LazyPayload(
+            payload_type='response',
+            payload_obj=payload,
+            max_chars=100,
+        ))
+
+        self.assertTrue(record.endswith('[truncated]'))
+        self.assertLess(len(record), 200)
+        self.assertEqual(json.loads(str(LazyPayload(
+            payload_type='event',
+            payload_obj={'n': 30},
+        )))['payload'], {'n': 30})
+
+
+class TestSamples(unittest.TestCase):
+    '''Test compact storage of invocation samples'''
+
+    def test_sample_columns(self):
+        '''Test valid durations exclude errors and cold starts'''
+        samples = SampleColumns()
+
+        for duration, cold_start, error in [
+                (100, False, None),
+                (200, True, None),
+                (None, False, custom_exc.InvokeLambdaError('foobar')),
+                (300, False, None)]:
+            invocation = Invocation()
+
+            if error:
+                invocation.set_error(error)
+
+            else:
+                invocation.success = True
+                invocation.duration = duration
+                invocation.cold_start = cold_start
+
+            samples.append(invocation)
+
+        self.assertEqual(len(samples), 4)
+        self.assertEqual(samples.valid_count, 2)
+        self.assertEqual(list(samples.durations()), [100, 300])
+        self.assertEqual(
+            list(samples.durations(ignore_coldstart=False)), [100, 200, 300])
+        self.assertEqual(
+            samples.error_code[2],
+            c.SAMPLE_ERROR_CODES['InvokeLambdaError'],
+        )
+
+    def test_batched_invocation(self):
+        '''Test a batched invocation adds one sample per iteration'''
+        samples = SampleColumns()
+        invocation = Invocation()
+        invocation.success = True
+        invocation.duration = 10
+        invocation.overhead = 4.0
+        invocation.cold_start = True
+        invocation.iterations = [4.5, 2.25, 2.5, 0.75]
+
+        samples.append(invocation)
+
+        self.assertEqual(len(samples), 4)
+        self.assertEqual(samples.valid_count, 3)
+        self.assertEqual(list(samples.durations()), [2.25, 2.5, 0.75])
+        self.assertEqual(list(samples.cold_start), [1, 0, 0, 0])
+        self.assertEqual(list(samples.overhead), [1.0] * 4)
+
+    def test_sample_memory_per_sample(self):
+        '''Test per-sample memory use stays within a fixed budget'''
+        sample_count = 100000
+        max_bytes_per_sample = 24
+
+        samples = SampleColumns()
+        invocation = Invocation()
+        invocation.success = True
+        invocation.overhead = 12.5
+
+        for i in range(sample_count):
+            invocation.duration = i
+            samples.append(invocation)
+
+        self.assertLessEqual(
+            samples.nbytes() / sample_count, max_bytes_per_sample)
+        self.assertLessEqual(
+            sys.getsizeof(samples.durations()) / sample_count,
+            max_bytes_per_sample,
+        )
+
+
+class TestStats(unittest.TestCase):
+    '''Test statistical significance and confidence intervals'''
+
+    def test_mann_whitney_u(self):
+        '''Test Mann-Whitney U against a known result'''
+        test = mann_whitney_u([1, 2, 3, 4, 5], [6, 7, 8, 9, 10])
+
+        self.assertEqual(test['u'], 0)
+        self.assertAlmostEqual(test['p_value'], 0.0122, places=4)
+
+        same = mann_whitney_u([5, 5, 5], [5, 5, 5])
+        self.assertEqual(same['p_value'], 1.0)
+
+    @unittest.skipIf(numpy_module() is None, 'NumPy is not installed')
+    def test_mann_whitney_u_numpy(self):
+        '''Test NumPy ranks match the pure Python ones, ties included'''
+        seed(3)
+        a = [round(gauss(100, 10)) for i in range(500)]
+        b = [round(gauss(102, 10)) for i in range(300)]
+
+        with patch('stats.numpy_module', return_value=None):
+            expected = mann_whitney_u(a, b)
+
+        self.assertEqual(mann_whitney_u(a, b), expected)
+
+    def test_confidence_intervals(self):
+        '''Test bootstrap and analytic intervals contain the median'''
+        seed(1)
+        small = [gauss(1000, 50) for i in range(100)]
+        large = [gauss(1000, 50) for i in range(5000)]
+
+        for values in (small, large):
+            intervals = confidence_intervals(values, seed=42)
+
+            self.assertLess(intervals['median'][0], 1000)
+            self.assertGreater(intervals['median'][1], 1000)
+            self.assertLess(intervals['mean'][0], intervals['mean'][1])
+
+    def test_significance_tiers(self):
+        '''Test sizes with the same durations are grouped in one tier'''
+        seed(2)
+        groups = [
+            {'id': 'slow', 'durations': [gauss(2000, 50) for i in range(50)]},
+            {'id': 'fast', 'durations': [gauss(1000, 50) for i in range(50)]},
+            {'id': 'fast2', 'durations': [gauss(1000, 50) for i in range(50)]},
+        ]
+
+        significance = significance_tiers(groups)
+
+        self.assertEqual(len(significance['pairwise']), 3)
+        self.assertEqual(len(significance['tiers']), 2)
+        self.assertEqual(sorted(significance['tiers'][0]), ['fast', 'fast2'])
+        self.assertEqual(significance['tiers'][1], ['slow'])
+
+
+class TestLoadGenerator(unittest.TestCase):
+    '''Test open-loop load generation'''
+
+    @staticmethod
+    def invoke(*, latency: float = 0.02, throttle_every: int = 0):
+        '''Build a fake invoke function with fixed latency'''
+        counter = iter(range(1, 1000000))
+        lock = threading.Lock()
+
+        def invoke():
+            with lock:
+                count = next(counter)
+
+            time.sleep(latency)
+
+            invocation = Invocation()
+
+            if throttle_every and count % throttle_every == 0:
+                invocation.set_error(custom_exc.LambdaThrottledError('x'))
+
+            else:
+                invocation.success = True
+                invocation.duration = int(latency * 1000)
+
+            return invocation
+
+        return invoke
+
+    def test_constant_arrivals(self):
+        '''Test requests are sent at the target rate, not closed-loop'''
+        generator = LoadGenerator(
+            invoke=self.invoke(latency=0.05, throttle_every=5),
+            rate=100,
+            duration=0.5,
+            window=0.25,
+        )
+
+        statistics = generator.run()
+
+        self.assertEqual(statistics['requests'], 49)
+        self.assertIsNone(generator.samples)
+        self.assertEqual(statistics['duration_sketch']['count'], 40)
+        self.assertEqual(statistics['lambda_duration']['p50'], 50)
+        # Requests overlap since each takes longer than the arrival interval
+        self.assertGreater(statistics['max_concurrency'], 1)
+        self.assertAlmostEqual(statistics['throttle_rate'], 9 / 49, places=3)
+        self.assertEqual(len(statistics['windows']), 2)
+        self.assertGreaterEqual(statistics['latency']['p50'], 50)
+        self.assertEqual(statistics['latency_sketch']['count'], 49)
+
+    def test_keep_samples(self):
+        '''Test raw samples are only kept when asked'''
+        generator = LoadGenerator(
+            invoke=self.invoke(),
+            rate=100,
+            duration=0.2,
+            keep_samples=True,
+        )
+
+        statistics = generator.run()
+
+        self.assertEqual(len(generator.samples), statistics['requests'])
+
+    def test_load_benchmark(self):
+        '''Test load tests rank memory sizes from their duration sketch'''
+        backend = FakeLambdaBackend(duration=100)
+        benchmarking = Benchmark(
+            mode='load',
+            load_rate=100,
+            load_duration=0.2,
+            memory_sets=[128, 256],
+            architectures=['x86_64'],
+            use_cache=False,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        for log in results['logs']:
+            self.assertEqual(log['duration']['average'], 100)
+            self.assertEqual(log['duration']['all_invocations'], [])
+            self.assertEqual(log['duration']['percentiles']['p99'], 100)
+
+        self.assertEqual(len(results['ranking']['duration']), 2)
+        self.assertNotIn('statistics', results)
+
+    def test_poisson_arrivals(self):
+        '''Test Poisson arrivals are reproducible with a seed'''
+        offsets = [
+            list(LoadGenerator(
+                invoke=self.invoke(),
+                rate=50,
+                duration=10,
+                arrivals='poisson',
+                seed=42,
+            ).arrival_offsets())
+            for i in range(2)
+        ]
+
+        self.assertEqual(offsets[0], offsets[1])
+        self.assertTrue(all(b > a for a, b in zip(offsets[0], offsets[0][1:])))
+        self.assertLess(abs(len(offsets[0]) - 500), 100)
+
+    def test_invalid_arrivals(self):
+        '''Test invalid arrivals option raises a config error'''
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            LoadGenerator(invoke=self.invoke(), arrivals='foobar')
+
+
+class TestQuantileSketch(unittest.TestCase):
+    '''Test streaming quantile sketches against exact percentiles'''
+
+    quantiles = [0, 0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999, 1]
+
+    def stream(self, size: int) -> list:
+        '''Heavy-tailed durations with a few failed (zero) samples'''
+        seed(11)
+
+        return [
+            0.0 if i % 1000 == 0
+            else lognormvariate(5, 1) if i % 3
+            else 1000 + expovariate(1 / 5000)
+            for i in range(size)
+        ]
+
+    def assertAccurate(self, sketch: QuantileSketch, values: list):
+        ordered = sorted(values)
+
+        for q in self.quantiles:
+            exact = ordered[math.floor(q * (len(ordered) - 1))]
+
+            self.assertLessEqual(
+                abs(sketch.quantile(q) - exact),
+                sketch.relative_accuracy * exact + 1e-9,
+                f'quantile {q}',
+            )
+
+    def test_accuracy(self):
+        '''Test quantiles of a large stream are within relative accuracy'''
+        values = self.stream(200000)
+        sketch = QuantileSketch()
+
+        for value in values:
+            sketch.add(value)
+
+        self.assertAccurate(sketch, values)
+        self.assertEqual(len(sketch), len(values))
+        # Memory depends on the value range, not on the number of values
+        self.assertLess(len(sketch.buckets), 1000)
+
+    def test_merge(self):
+        '''Test merged sketches equal a sketch of all values'''
+        values = self.stream(20000)
+        whole = QuantileSketch()
+        parts = [QuantileSketch() for i in range(4)]
+
+        for index, value in enumerate(values):
+            whole.add(value)
+            parts[index % 4].add(value)
+
+        merged = QuantileSketch()
+
+        for part in parts:
+            # Sketches travel as JSON between handler invocations
+            merged.merge(QuantileSketch.from_dict(
+                json.loads(json.dumps(part.to_dict()))))
+
+        self.assertEqual(merged.buckets, whole.buckets)
+        self.assertEqual(merged.count, whole.count)
+        self.assertEqual(merged.zero_count, whole.zero_count)
+        self.assertAccurate(merged, values)
+
+        with self.assertRaises(ValueError):
+            merged.merge(QuantileSketch(relative_accuracy=0.05))
+
+    def test_collapse(self):
+        '''Test bounded sketches stay accurate on high quantiles'''
+        values = self.stream(20000)
+        sketch = QuantileSketch(max_buckets=100)
+
+        for value in values:
+            sketch.add(value)
+
+        ordered = sorted(values)
+
+        self.assertLessEqual(len(sketch.buckets), 100)
+
+        for q in (0.9, 0.99, 1):
+            exact = ordered[math.floor(q * (len(ordered) - 1))]
+
+            self.assertLessEqual(
+                abs(sketch.quantile(q) - exact), 0.01 * exact)
+
+        self.assertEqual(QuantileSketch().percentiles(), {
+            'p50': None, 'p90': None, 'p99': None})
+
 
 class TestBenchmark(unittest.TestCase):
     '''Test Benchmark class methods'''
@@ -261,16 +851,26 @@ class TestBenchmark(unittest.TestCase):
 
         self.benchmarking = Benchmark(**self.params)  # Use default arguments
 
+    def test_invalid_mode(self):
+        '''Test initializing Benchmark with an invalid mode'''
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            Benchmark(**dict(self.params, mode='foobar'))
+
     def test_original_config_stringifier(self):
         '''Test stringifier of original Lambda configurations'''
-        result_set = self.benchmarking.set_original(memory=1024, timeout=60000)
+        result_set = self.benchmarking.set_original(
+            memory=1024,
+            timeout=60000,
+            architecture='arm64',
+        )
 
         self.assertTrue(result_set['memory'])
         self.assertTrue(result_set['timeout'])
+        self.assertTrue(result_set['architecture'])
 
         self.assertIsInstance(self.benchmarking.original_config_str, str)
 
-        expected_str = 'memory: 1024, timeout: 60000'
+        expected_str = 'memory: 1024, timeout: 60000, architecture: arm64'
         self.assertEqual(self.benchmarking.original_config_str, expected_str)
 
     @patch('benchmark.get_lambda_config', new_callable=CustomMock.get_lambda_config)  # NOQA
@@ -281,6 +881,7 @@ class TestBenchmark(unittest.TestCase):
 
         get_lambda_config.assert_called_with(
             function_name=self.params['lambda_function'],
+            region=None,
         )
 
         self.assertIsNone(result['error'])
@@ -328,6 +929,7 @@ class TestBenchmark(unittest.TestCase):
 
         update_lambda_config.assert_called_with(
             function_name=self.params['lambda_function'],
+            region=None,
             memory_size=memory,
             timeout=timeout,
         )
@@ -368,6 +970,7 @@ class TestBenchmark(unittest.TestCase):
 
         update_lambda_config.assert_called_with(
             function_name=self.params['lambda_function'],
+            region=None,
             memory_size=test_memory_size,
             timeout=self.params['timeout'],
         )
@@ -426,15 +1029,17 @@ class TestBenchmark(unittest.TestCase):
 
         invoke_lambda.assert_called_with(
             function_name=self.params['lambda_function'],
-            payload=self.params['lambda_event'],
+            region=None,
+            payload=json_dumps(self.params['lambda_event']),
             invocation_type='RequestResponse',
             log_type='None',
+            max_connections=self.params['max_threads'] + 1,
         )
 
-        self.assertTrue(result['success'])
-        self.assertIsNone(result['error'])
-        self.assertEqual(result['duration'], c.DEFAULT_LAMBDA_TIMEOUT - TEST_REMAINING_TIME)  # NOQA
-        self.assertEqual(result['cold_start'], COLD_START_TRUE)
+        self.assertTrue(result.success)
+        self.assertIsNone(result.error)
+        self.assertEqual(result.duration, c.DEFAULT_LAMBDA_TIMEOUT - TEST_REMAINING_TIME)  # NOQA
+        self.assertEqual(result.cold_start, COLD_START_TRUE)
 
         logger.warning.assert_not_called()
 
@@ -444,10 +1049,10 @@ class TestBenchmark(unittest.TestCase):
         '''Test checking execution time when an exception is raised'''
         response = self.benchmarking.get_execution_time()
 
-        self.assertFalse(response['success'])
-        self.assertIsNone(response['duration'])
-        self.assertIsInstance(response['error'], str)
-        self.assertIn('KeyError', response['error'])
+        self.assertFalse(response.success)
+        self.assertIsNone(response.duration)
+        self.assertIsInstance(response.error, str)
+        self.assertIn('KeyError', response.error)
 
         logger.warning.assert_called()
         logger.exception.assert_called()
@@ -458,10 +1063,10 @@ class TestBenchmark(unittest.TestCase):
         '''Test checking execution time when payload contains an error'''
         response = self.benchmarking.get_execution_time()
 
-        self.assertFalse(response['success'])
-        self.assertIsNone(response['duration'])
-        self.assertIsInstance(response['error'], str)
-        self.assertEqual(response['error'], 'Error in Lambda response Payload (type is not a Dict)')  # NOQA
+        self.assertFalse(response.success)
+        self.assertIsNone(response.duration)
+        self.assertIsInstance(response.error, str)
+        self.assertEqual(response.error, 'Error in Lambda response Payload (type is not a Dict)')  # NOQA
 
         logger.warning.assert_called()
 
@@ -471,10 +1076,10 @@ class TestBenchmark(unittest.TestCase):
         '''Test checking execution time without remaining time in Payload'''
         response = self.benchmarking.get_execution_time()
 
-        self.assertFalse(response['success'])
-        self.assertIsNone(response['duration'])
-        self.assertIsInstance(response['error'], str)
-        self.assertEqual(response['error'], 'No Integer "remaining_time" in Lambda Payload')  # NOQA
+        self.assertFalse(response.success)
+        self.assertIsNone(response.duration)
+        self.assertIsInstance(response.error, str)
+        self.assertEqual(response.error, 'No Integer "remaining_time" in Lambda Payload')  # NOQA
 
         logger.warning.assert_called()
 
@@ -493,9 +1098,13 @@ class TestBenchmark(unittest.TestCase):
 
         self.assertTrue(len(lambda_states) == len(remaining_times))
 
-        durations = self.benchmarking.get_benchmark_durations()
+        samples = self.benchmarking.get_benchmark_durations()
+        durations = samples.durations()
 
+        self.assertIsInstance(samples, SampleColumns)
+        self.assertEqual(samples.valid_count, self.params['test_count'])
         self.assertEqual(len(durations), self.params['test_count'])
+        self.assertEqual(sum(samples.cold_start), self.params['max_threads'])
 
         # Check if all durations match remainingtimes provided
         for duration in durations:
@@ -585,6 +1194,1945 @@ class TestBenchmark(unittest.TestCase):
         logger.warning.assert_called()
         logger.exception.assert_called()
 
+    def test_recommend_cheapest_in_best_tier(self):
+        '''Test the cheapest of statistically equivalent sizes is chosen'''
+        seed(3)
+
+        def durations(mean):
+            return [round(gauss(mean, 500)) for i in range(50)]
+
+        benchmark_results = [
+            {
+                'memory': memory,
+                'success': True,
+                'errors': [],
+                'durations': durations(mean),
+                'average_duration': mean,
+            }
+            for memory, mean in [(512, 40000), (2048, 10000), (3008, 10000)]
+        ]
+
+        results = self.benchmarking.process_benchmark_results(
+            results=benchmark_results,
+        )
+
+        statistics = results['statistics']
+
+        self.assertEqual(len(statistics['tiers']), 2)
+        self.assertEqual(len(statistics['tiers'][0]), 2)
+        self.assertEqual(statistics['recommendation']['memory'], 2048)
+        self.assertEqual(len(statistics['intervals']), 3)
+
+        for interval in statistics['intervals']:
+            self.assertLessEqual(
+                interval['cost']['low'], interval['cost']['high'])
+
+
+class TestBench(unittest.TestCase):
+    '''Test the self-benchmark suite'''
+
+    def test_bench_suite(self):
+        '''Test benchmark targets report throughput and memory'''
+        results = bench_suite(sample_sizes=[20], latency=0.001)
+
+        self.assertIn('run:20', results)
+        self.assertIn('get_benchmark_durations:20', results)
+        self.assertIn('process_benchmark_results:20', results)
+
+        for result in results.values():
+            self.assertGreater(result['invocations_per_second'], 0)
+            self.assertGreater(result['peak_memory_bytes'], 0)
+
+        self.assertEqual(
+            compare_to_baseline(results=results, baseline=results), [])
+
+    def test_compare_to_baseline(self):
+        '''Test detection of throughput and memory regressions'''
+        baseline = {
+            'run:1000': {
+                'invocations_per_second': 1000,
+                'peak_memory_bytes': 1000,
+            },
+        }
+
+        results = {
+            'run:1000': {
+                'invocations_per_second': 700,
+                'peak_memory_bytes': 1300,
+            },
+            'run:10000': {
+                'invocations_per_second': 1,
+                'peak_memory_bytes': 1,
+            },
+        }
+
+        regressions = compare_to_baseline(
+            results=results,
+            baseline=baseline,
+            tolerance=0.2,
+        )
+
+        self.assertEqual(len(regressions), 2)
+        self.assertEqual(
+            compare_to_baseline(
+                results=results, baseline=baseline, tolerance=0.5),
+            [],
+        )
+
+
+class TestInitTime(unittest.TestCase):
+    '''Test the cold start of the benchmarker Lambda'''
+
+    def test_parse_importtime(self):
+        '''Test parsing of python -X importtime output'''
+        output = '\n'.join([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       120 |        120 |     _io',
+            'import time:      1500 |       2000 |   utils',
+            'import time:      3000 |       5000 | lambda_function',
+        ])
+
+        self.assertEqual(parse_importtime(output), {
+            '_io': 0.12,
+            'utils': 2.0,
+            'lambda_function': 5.0,
+        })
+
+    def test_cold_import_budget(self):
+        '''Test the handler module imports within budget, deferring boto3'''
+        result = measure_init(c.INIT_TIME_MODULE)
+
+        self.assertEqual(result['deferred_imported'], [])
+        self.assertLessEqual(result['total_ms'], c.INIT_TIME_BUDGET_MS)
+
+
+class TestArchitectures(unittest.TestCase):
+    '''Test benchmarking across Lambda architectures'''
+
+    def run_benchmark(self, **params) -> tuple:
+        '''Run a small benchmark against the fake backend'''
+        self.backend = FakeLambdaBackend(duration=100000)
+
+        return run_fake_benchmark(
+            self.backend, architectures=['x86_64', 'arm64'], **params)
+
+    def test_switch_architecture(self):
+        '''Test every memory size is ranked on both architectures'''
+        benchmarking, results = self.run_benchmark()
+
+        ranked = {
+            (item['memory'], item['architecture'])
+            for item in results['ranking']['cost']
+        }
+
+        self.assertEqual(len(ranked), 4)
+        self.assertEqual(
+            results['ranking']['cost'][0]['architecture'], 'arm64')
+        self.assertEqual(results['ranking']['cost'][0]['memory'], 128)
+
+        # Original architecture is restored afterwards
+        self.assertEqual(self.backend.config['Architectures'], ['x86_64'])
+        self.assertEqual(benchmarking.public_errors, [])
+
+    def test_twin_function(self):
+        '''Test an architecture can be benchmarked on a twin function'''
+        benchmarking, results = self.run_benchmark(
+            architecture_functions={'arm64': 'fibonacci-arm64'},
+        )
+
+        self.assertIn('fibonacci-arm64', benchmarking.twin_original_configs)
+        self.assertEqual(len(results['ranking']['cost']), 4)
+        self.assertEqual(self.backend.config['Architectures'], ['x86_64'])
+
+    def test_missing_twin_function(self):
+        '''Test a missing twin function fails its architecture only'''
+        get_lambda_config = FakeLambdaBackend.get_lambda_config
+
+        def get_config(backend, *, function_name, **kwargs):
+            if function_name == 'fibonacci-arm64':
+                raise RuntimeError('Function not found')
+
+            return get_lambda_config(
+                backend, function_name=function_name, **kwargs)
+
+        with patch.object(FakeLambdaBackend, 'get_lambda_config', get_config):
+            benchmarking, results = self.run_benchmark(
+                architecture_functions={'arm64': 'fibonacci-arm64'},
+            )
+
+        ranked = {item['architecture'] for item in results['ranking']['cost']}
+
+        self.assertEqual(ranked, {'x86_64'})
+        self.assertTrue(benchmarking.public_errors)
+        self.assertEqual(self.backend.config['Memory'], 128)
+        self.assertEqual(self.backend.config['Architectures'], ['x86_64'])
+
+    def test_restore_after_failure(self):
+        '''Test the original config is restored when benchmarking fails'''
+        self.backend = FakeLambdaBackend()
+
+        benchmarking = Benchmark(test_count=5, memory_sets=[512])
+
+        with self.backend.patch(), \
+                patch.object(Benchmark, 'process_benchmark_results',
+                             side_effect=RuntimeError('Failed')):
+            with self.assertRaises(RuntimeError):
+                benchmarking.run()
+
+        self.assertEqual(self.backend.config['Memory'], 128)
+
+    def test_default_architectures(self):
+        '''Test only the default architecture is benchmarked by default'''
+        self.assertEqual(Benchmark().architectures, ['x86_64'])
+
+    def test_invalid_architecture(self):
+        '''Test initializing Benchmark with an invalid architecture'''
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            Benchmark(architectures=['foobar'])
+
+
+class TestBatchedInvocations(unittest.TestCase):
+    '''Test running several workload iterations per invocation'''
+
+    def test_batched_benchmark(self):
+        '''Test iterations are collected as individual samples'''
+        backend = FakeLambdaBackend(duration=10)
+        benchmarking = Benchmark(
+            test_count=20,
+            max_threads=2,
+            memory_sets=[128],
+            architectures=['x86_64'],
+            use_cache=False,
+            batch_size=5,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        self.assertEqual(backend.invocations, 4)
+        self.assertEqual(
+            json.loads(benchmarking.lambda_payload)['iterations'], 5)
+        self.assertEqual(
+            results['ranking']['duration'][0]['duration'], 2)
+        self.assertEqual(benchmarking.public_errors, [])
+
+    def test_missing_iteration_durations(self):
+        '''Test a function ignoring batches yields one sample each'''
+        benchmarking = Benchmark(batch_size=5)
+
+        self.assertIsNone(benchmarking.parse_iterations(
+            payload={'remaining_time': 1000}))
+
+    def test_invalid_batch_size(self):
+        '''Test initializing Benchmark with an invalid batch size'''
+        for batch_size in (0, 1.5, '2'):
+            with self.assertRaises(custom_exc.BenchmarkConfigError):
+                Benchmark(batch_size=batch_size)
+
+
+class FakeScalingBackend(FakeLambdaBackend):
+    '''Fake scaling probe getting a second vCPU above 1769 MB'''
+
+    def invoke_lambda(self, *, payload, **kwargs) -> dict:
+        response = super().invoke_lambda(payload=payload, **kwargs)
+
+        if b'max_workers' in payload:
+            vcpus = 2 if self.config['Memory'] > 1769 else 1
+            runs = [
+                {
+                    'workers': workers,
+                    'speedup': min(workers, vcpus),
+                    'efficiency': min(workers, vcpus) / workers,
+                }
+                for workers in range(1, json.loads(payload)['max_workers'] + 1)
+            ]
+            response['Payload'] = dict(response['Payload'], scaling={
+                'cpu_count': vcpus,
+                'effective_vcpus': vcpus,
+                'runs': runs,
+            })
+
+        return response
+
+
+class TestScalingProbe(unittest.TestCase):
+    '''Test reports of multi-core scaling at each memory size'''
+
+    def test_scaling_probe(self):
+        '''Test effective vCPUs are reported for each memory size'''
+        backend = FakeScalingBackend()
+        benchmarking = Benchmark(
+            test_count=2,
+            max_threads=2,
+            memory_sets=[1024, 3008],
+            architectures=['x86_64'],
+            use_cache=False,
+            scaling_probe=True,
+            scaling_max_workers=4,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        scaling = {item['memory']: item for item in results['scaling']}
+
+        self.assertEqual(scaling[1024]['effective_vcpus'], 1)
+        self.assertFalse(scaling[1024]['parallel_benefit'])
+        self.assertEqual(scaling[3008]['effective_vcpus'], 2)
+        self.assertEqual(scaling[3008]['best_workers'], 2)
+        self.assertEqual(scaling[3008]['efficiency'], 1)
+        self.assertTrue(scaling[3008]['parallel_benefit'])
+
+        for log in results['logs']:
+            self.assertEqual(len(log['scaling']['runs']), 4)
+
+    def test_not_a_scaling_probe(self):
+        '''Test a function without scaling report gets no summary'''
+        backend = FakeLambdaBackend()
+        benchmarking = Benchmark(
+            test_count=2,
+            max_threads=2,
+            memory_sets=[128],
+            architectures=['x86_64'],
+            use_cache=False,
+            scaling_probe=True,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        self.assertNotIn('scaling', results)
+        self.assertEqual(benchmarking.public_errors, [])
+
+
+class FakeFibonacciBackend(FakeLambdaBackend):
+    '''Fake function doubling its duration with each step of n'''
+
+    def invoke_lambda(self, *, payload, **kwargs) -> dict:
+        n = json.loads(payload)['n']
+        memory = self.config['Memory']
+        self.duration = round(2 ** (n - 20) * 1000 * 128 / memory)
+
+        return super().invoke_lambda(payload=payload, **kwargs)
+
+
+class TestCalibration(unittest.TestCase):
+    '''Test calibration of the workload to a target duration window'''
+
+    def run_benchmark(self, **params) -> tuple:
+        '''Run a calibrated benchmark against the fake Fibonacci function'''
+        return run_fake_benchmark(
+            FakeFibonacciBackend(),
+            test_count=2,
+            max_threads=2,
+            lambda_event={'n': 30},
+            calibrate=True,
+            **params,
+        )
+
+    def test_calibrate_workload(self):
+        '''Test the smallest n reaching the window is picked'''
+        benchmarking, results = self.run_benchmark(memory_sets=[1024, 3008])
+        calibration = results['calibration']
+
+        # 2 ** 3 * 1000 * 128 / 3008 = 340 ms, 2 ** 2 = 170 ms is too short
+        self.assertEqual(calibration['value'], 23)
+        self.assertTrue(calibration['fits'])
+        self.assertEqual(
+            [item['duration'] for item in calibration['durations']],
+            [340, 1000],
+        )
+        self.assertEqual(benchmarking.lambda_event, {'n': 23})
+        self.assertEqual(
+            {item['memory']: item['duration']
+             for item in results['ranking']['duration']},
+            {1024: 1000, 3008: 340},
+        )
+
+    def test_window_too_narrow(self):
+        '''Test calibration reports when no value fits every memory size'''
+        benchmarking, results = self.run_benchmark(memory_sets=[128, 3008])
+
+        self.assertEqual(results['calibration']['value'], 23)
+        self.assertFalse(results['calibration']['fits'])
+
+    def test_calibrate_requires_parameter(self):
+        '''Test calibration needs an integer workload parameter'''
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            Benchmark(calibrate=True, lambda_event={'foo': 'bar'})
+
+
+class TestRegressionGate(unittest.TestCase):
+    '''Test comparison of a focused run against a baseline run'''
+
+    def setUp(self):
+        self.baseline = {
+            'status': 200,
+            'results': {
+                'logs': [{
+                    'memory': 1024,
+                    'architecture': 'x86_64',
+                    'duration': {
+                        'average': 100,
+                        'all_invocations': list(range(95, 106)) * 5,
+                    },
+                }],
+            },
+            'errors': [],
+        }
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.baseline_path = os.path.join(self.tmp_dir.name, 'baseline.json')
+
+        with open(self.baseline_path, 'w') as baseline_file:
+            json.dump(self.baseline, baseline_file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def compare(self, *, duration: int, memory_sets=[1024]) -> tuple:
+        '''Compare a fake function of a given duration to the baseline'''
+        backend = FakeLambdaBackend(duration=duration)
+        benchmarking = Benchmark(
+            max_threads=10,
+            memory_sets=memory_sets,
+            baseline_path=self.baseline_path,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        return backend, results
+
+    def test_baseline_durations(self):
+        '''Test baseline durations are read from responses or results'''
+        expected = {(1024, 'x86_64'): list(range(95, 106)) * 5}
+
+        self.assertEqual(baseline_durations(self.baseline), expected)
+        self.assertEqual(
+            baseline_durations(self.baseline['results']), expected)
+
+    def test_no_change_stops_early(self):
+        '''Test an unchanged function is cleared after the first batch'''
+        backend, results = self.compare(duration=100)
+        comparison = results['comparison']['memory_sets'][0]
+
+        self.assertEqual(results['verdict'], 'no_change')
+        self.assertTrue(comparison['conclusive'])
+        self.assertEqual(comparison['invocations'], c.REGRESSION_BATCH_SIZE)
+        self.assertEqual(backend.config['Memory'], c.DEFAULT_MEMORY_SETS[0])
+
+    def test_regression(self):
+        '''Test a slower function is flagged as a regression'''
+        backend, results = self.compare(duration=130)
+        comparison = results['comparison']['memory_sets'][0]
+
+        self.assertEqual(results['verdict'], 'regression')
+        self.assertEqual(comparison['duration_change'], 0.3)
+        self.assertEqual(c.REGRESSION_EXIT_CODES[results['verdict']], 1)
+
+    def test_improvement(self):
+        '''Test a faster function is flagged as an improvement'''
+        backend, results = self.compare(duration=70)
+
+        self.assertEqual(results['verdict'], 'improvement')
+
+    def test_missing_baseline_memory(self):
+        '''Test memory sizes missing from the baseline are inconclusive'''
+        backend, results = self.compare(duration=100, memory_sets=[2048])
+
+        self.assertEqual(results['verdict'], 'inconclusive')
+        self.assertEqual(backend.invocations, 0)
+
+    def test_overall_verdict(self):
+        '''Test the worst verdict across memory sizes wins'''
+        self.assertEqual(overall_verdict([
+            {'verdict': 'no_change'},
+            {'verdict': 'regression'},
+            {'verdict': 'improvement'},
+        ]), 'regression')
+        self.assertEqual(overall_verdict([{'verdict': None}]), 'inconclusive')
+        self.assertEqual(overall_verdict([
+            {'verdict': 'no_change'},
+            {'verdict': 'inconclusive'},
+        ]), 'inconclusive')
+
+    def test_undecided_final_look(self):
+        '''Test a comparison still undecided at max samples is inconclusive'''
+        baseline = list(range(95, 106)) * 5
+        current = [90, 110] * 10
+
+        self.assertIsNone(sequential_test(
+            baseline=baseline, current=current, memory=1024)['verdict'])
+
+        comparison = sequential_test(
+            baseline=baseline, current=current, memory=1024, final=True)
+
+        self.assertEqual(comparison['verdict'], 'inconclusive')
+        self.assertFalse(comparison['conclusive'])
+        self.assertEqual(
+            c.REGRESSION_EXIT_CODES[overall_verdict([comparison])], 2)
+
+
+    @patch('regression.lambda_execution_cost', return_value=1.0)
+    def test_regional_cost(self, lambda_execution_cost):
+        '''Test costs are priced in the benchmarked region'''
+        sequential_test(
+            baseline=[100] * 10,
+            current=[100] * 10,
+            memory=1024,
+            region='af-south-1',
+        )
+
+        self.assertEqual(lambda_execution_cost.call_count, 2)
+
+        for call_args in lambda_execution_cost.call_args_list:
+            self.assertEqual(call_args.kwargs['region'], 'af-south-1')
+
+
+class TestBudget(unittest.TestCase):
+    '''Test benchmarking within a cost budget'''
+
+    def invocation_cost(self, memory: int, duration: int = 1000) -> float:
+        return lambda_execution_cost(memory=memory, duration=duration) + \
+            c.LAMBDA_REQUEST_COST
+
+    def fill(self, durations) -> SampleColumns:
+        samples = SampleColumns()
+
+        for duration in durations:
+            invocation = Invocation()
+            invocation.success = True
+            invocation.duration = duration
+            samples.append(invocation)
+
+        return samples
+
+    def test_scheduler_allocation(self):
+        '''Test batches go to uncertain contenders for the cheapest size'''
+        seed(7)
+        scheduler = BudgetScheduler(budget=1, test_count=100)
+
+        # 128 and 512 cost about the same, 1024 costs twice as much
+        scheduler.add(memory=128, samples=self.fill(
+            [gauss(400, 100) for i in range(10)]))
+        scheduler.add(memory=512, samples=self.fill(
+            [gauss(100, 5) for i in range(10)]))
+        scheduler.add(memory=1024, samples=self.fill(
+            [gauss(100, 20) for i in range(10)]))
+
+        self.assertEqual(scheduler.contenders([128, 512, 1024]), [128, 512])
+        self.assertEqual(scheduler.next_batch(), (128, c.BUDGET_BATCH_SIZE))
+
+    def test_scheduler_budget(self):
+        '''Test batches are cut to the remaining budget'''
+        scheduler = BudgetScheduler(budget=self.invocation_cost(128) * 4.5)
+        scheduler.add(memory=128, samples=self.fill([1000] * 2))
+        scheduler.charge(memory=128, invocations=2)
+
+        self.assertEqual(scheduler.next_batch(), (128, 2))
+
+        scheduler.charge(memory=128, invocations=2)
+
+        self.assertIsNone(scheduler.next_batch())
+        self.assertTrue(scheduler.exhausted)
+
+    def test_scheduler_failures(self):
+        '''Test failures cost their wall time and retire a failing size'''
+        scheduler = BudgetScheduler(budget=1, max_failed_batches=2)
+        samples = SampleColumns()
+        scheduler.add(memory=128, samples=samples)
+
+        # Only the second failure has no wall time, it costs the timeout
+        for wall_time in (50, None):
+            invocation = Invocation()
+            invocation.set_error(custom_exc.LambdaOutOfMemoryError('oom'))
+            invocation.overhead = wall_time
+            samples.append(invocation)
+            scheduler.charge(memory=128, invocations=1)
+
+        self.assertAlmostEqual(
+            scheduler.spent,
+            self.invocation_cost(128, duration=50) +
+            self.invocation_cost(128, duration=c.DEFAULT_LAMBDA_TIMEOUT),
+        )
+        self.assertEqual(scheduler.retired, [128])
+        self.assertIsNone(scheduler.next_batch())
+        self.assertFalse(scheduler.exhausted)
+
+    def test_scheduler_cold_starts(self):
+        '''Test cost estimates keep cold starts when the run keeps them'''
+        samples = self.fill([100, 100])
+        invocation = Invocation()
+        invocation.success = True
+        invocation.duration = 1000
+        invocation.cold_start = True
+        samples.append(invocation)
+
+        estimates = []
+
+        for ignore_coldstart in (True, False):
+            scheduler = BudgetScheduler(
+                budget=1, ignore_coldstart=ignore_coldstart)
+            scheduler.add(memory=128, samples=samples)
+            estimates.append(scheduler.mean_cost(memory=128)[0])
+
+        self.assertLess(estimates[0], estimates[1])
+
+    def run_benchmark(
+            self,
+            *,
+            budget: float,
+            memory_used: int = 64,
+            ) -> tuple:
+        backend = FakeLambdaBackend(duration=1000, memory_used=memory_used)
+        benchmarking, results = run_fake_benchmark(
+            backend,
+            test_count=50,
+            memory_sets=[128, 1024],
+            budget=budget,
+        )
+
+        return backend, results
+
+    def test_partial_rankings(self):
+        '''Test an exhausted budget still returns rankings'''
+        budget = 20 * (self.invocation_cost(128) + self.invocation_cost(1024))
+        backend, results = self.run_benchmark(budget=budget)
+        report = results['budget'][0]
+
+        self.assertTrue(report['exhausted'])
+        self.assertLessEqual(report['spent'], budget)
+        self.assertGreater(report['estimated_cost'], budget)
+        self.assertEqual(len(results['ranking']['cost']), 2)
+        self.assertEqual(results['ranking']['cost'][0]['memory'], 128)
+        self.assertEqual(
+            backend.invocations,
+            sum(item['invocations'] for item in report['invocations']),
+        )
+
+    def test_budget_not_reached(self):
+        '''Test a large budget collects test_count samples per size'''
+        backend, results = self.run_benchmark(budget=1)
+        report = results['budget'][0]
+
+        self.assertFalse(report['exhausted'])
+        self.assertEqual(
+            [item['samples'] for item in report['invocations']], [50, 50])
+
+    def test_failing_memory_size(self):
+        '''Test a size running out of memory does not spend the budget'''
+        budget = 60 * self.invocation_cost(1024)
+        backend, results = self.run_benchmark(budget=budget, memory_used=300)
+        report = results['budget'][0]
+        invocations = {
+            item['memory']: item for item in report['invocations']}
+
+        self.assertEqual(report['retired'], [128])
+        self.assertLessEqual(
+            invocations[128]['invocations'],
+            c.BUDGET_PROBE_COUNT +
+            (c.BUDGET_MAX_FAILED_BATCHES - 1) * c.BUDGET_BATCH_SIZE,
+        )
+        self.assertEqual(invocations[1024]['samples'], 50)
+        self.assertEqual(
+            [item['memory'] for item in results['ranking']['cost']], [1024])
+
+    def test_invalid_budget(self):
+        '''Test budgets must be positive and in closed-loop mode'''
+        for params in ({'budget': 0}, {'budget': 1, 'mode': 'load'}):
+            with self.assertRaises(custom_exc.BenchmarkConfigError):
+                Benchmark(**params)
+
+
+class TestMultiRegion(unittest.TestCase):
+    '''Test benchmarking in several regions at once'''
+
+    def run_benchmark(self, **params) -> tuple:
+        backend = FakeRegionalBackend({
+            'us-east-1': FakeLambdaBackend(duration=1000),
+            'af-south-1': FakeLambdaBackend(duration=500),
+        })
+        benchmarking, results = run_fake_benchmark(
+            backend,
+            benchmark_class=MultiRegionBenchmark,
+            regions=['us-east-1', 'af-south-1'],
+            **params,
+        )
+
+        return backend, benchmarking, results
+
+    def test_region_rankings(self):
+        '''Test each region is ranked and priced separately'''
+        backend, benchmarking, results = self.run_benchmark()
+
+        self.assertEqual(
+            set(results['regions']), {'us-east-1', 'af-south-1'})
+
+        for region, region_backend in backend.backends.items():
+            ranking = results['regions'][region]['ranking']
+
+            self.assertEqual(results['regions'][region]['region'], region)
+            self.assertEqual(len(ranking['cost']), 2)
+            self.assertEqual(region_backend.invocations, 10)
+            self.assertEqual(
+                region_backend.config['Memory'], c.DEFAULT_MEMORY_SETS[0])
+
+        us_cost = results['regions']['us-east-1']['ranking']['cost'][0]
+        af_cost = results['regions']['af-south-1']['ranking']['cost'][0]
+
+        self.assertEqual(us_cost['cost'], lambda_execution_cost(
+            memory=128, duration=1000))
+        self.assertEqual(af_cost['cost'], lambda_execution_cost(
+            memory=128,
+            duration=500,
+            region='af-south-1',
+        ))
+        self.assertEqual(benchmarking.public_errors, [])
+
+    def test_region_comparison(self):
+        '''Test merged rankings and the cross-region comparison'''
+        backend, benchmarking, results = self.run_benchmark()
+
+        self.assertEqual(len(results['ranking']['cost']), 4)
+        self.assertEqual(results['ranking']['duration'][0]['region'],
+                         'af-south-1')
+        self.assertEqual(len(results['comparison']), 2)
+
+        for comparison in results['comparison']:
+            regions = comparison['regions']
+
+            self.assertEqual(comparison['fastest_region'], 'af-south-1')
+            self.assertEqual(comparison['cheapest_region'], 'af-south-1')
+            self.assertEqual(regions['af-south-1']['relative_duration'], 1)
+            self.assertEqual(regions['us-east-1']['relative_duration'], 2)
+            self.assertEqual(
+                regions['us-east-1']['relative_cost'],
+                round(regions['us-east-1']['cost'] / lambda_execution_cost(
+                    memory=comparison['memory'],
+                    duration=500,
+                    region='af-south-1',
+                ), 4),
+            )
+
+        labels = {
+            dict(labels).get('region')
+            for name, labels in benchmarking.metrics.counters
+        }
+
+        self.assertTrue({'us-east-1', 'af-south-1'} <= labels)
+
+    def test_region_paths(self):
+        '''Test regions write their cache and trace to separate files'''
+        benchmarking = MultiRegionBenchmark(
+            regions=['us-east-1', 'eu-west-1'],
+            trace_path='/tmp/trace.json',
+        )
+
+        self.assertEqual(region_path('/tmp/trace.json', 'eu-west-1'),
+                         '/tmp/trace-eu-west-1.json')
+        self.assertEqual(
+            benchmarking.benchmarks['eu-west-1'].trace_path,
+            '/tmp/trace-eu-west-1.json',
+        )
+        self.assertEqual(
+            benchmarking.benchmarks['eu-west-1'].region, 'eu-west-1')
+
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            MultiRegionBenchmark(regions=[])
+
+
+class TestTraceReplay(unittest.TestCase):
+    '''Test replaying recorded traffic traces'''
+
+    def write_trace(self, lines: list) -> str:
+        trace_file = tempfile.NamedTemporaryFile(
+            'w', suffix='.jsonl', delete=False)
+
+        with trace_file:
+            trace_file.write('\n'.join(json.dumps(line) for line in lines))
+
+        self.addCleanup(os.remove, trace_file.name)
+
+        return trace_file.name
+
+    def test_load_trace(self):
+        '''Test traces are sorted and offsets taken from the first request'''
+        path = self.write_trace([
+            {'offset': 1700000010.5, 'event': {'n': 2}},
+            [1700000000, {'n': 1}],
+            {'offset': 1700000012, 'event': {}},
+        ])
+
+        requests, digest = load_trace(path)
+
+        self.assertEqual(requests, [
+            (0.0, b'{"n":1}'),
+            (10.5, b'{"n":2}'),
+            (12.0, b'{}'),
+        ])
+        self.assertEqual(len(digest), 64)
+
+        for lines in ([{'offset': 1}], ['not a request'], []):
+            with self.assertRaises(custom_exc.BenchmarkConfigError):
+                load_trace(self.write_trace(lines))
+
+    def test_arrival_timing(self):
+        '''Test requests keep their relative arrival times when compressed'''
+        arrivals = []
+        start = time.perf_counter()
+
+        def invoke(payload: bytes) -> Invocation:
+            arrivals.append((time.perf_counter() - start, payload))
+
+            invocation = Invocation()
+            invocation.success = True
+            invocation.duration = 10
+            invocation.cold_start = payload == b'cold'
+
+            return invocation
+
+        replayer = TraceReplayer(
+            invoke=invoke,
+            requests=[(0.0, b'cold'), (0.2, b'warm'), (0.6, b'warm')],
+            speedup=2,
+        )
+
+        statistics = replayer.run()
+
+        self.assertEqual([payload for offset, payload in arrivals],
+                         [b'cold', b'warm', b'warm'])
+
+        for (offset, payload), expected in zip(arrivals, (0, 0.1, 0.3)):
+            self.assertAlmostEqual(offset, expected, delta=0.03)
+
+        self.assertEqual(statistics['requests'], 3)
+        self.assertEqual(statistics['trace_duration'], 0.6)
+        self.assertAlmostEqual(statistics['cold_start_rate'], 1 / 3, places=3)
+        self.assertEqual(statistics['lambda_duration']['p50'], 10)
+
+    def test_replay_benchmark(self):
+        '''Test each memory size is ranked by the cost of the whole trace'''
+        path = self.write_trace([
+            {'offset': offset, 'event': {'n': 1}}
+            for offset in (0, 0.01, 0.02, 0.2, 0.21)
+        ])
+        # Sandboxes go cold in the idle gap before the last two requests
+        backend = FakeLambdaBackend(duration=150, idle_timeout=0.1)
+        benchmarking = Benchmark(
+            mode='replay',
+            replay_trace_path=path,
+            memory_sets=[128, 256],
+            architectures=['x86_64'],
+            use_cache=False,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        self.assertEqual(backend.invocations, 10)
+
+        for log in results['logs']:
+            replay = log['replay']
+
+            self.assertEqual(replay['requests'], 5)
+            self.assertEqual(replay['cold_start_rate'], 0.4)
+            self.assertEqual(replay['total_cost'], round(
+                lambda_execution_cost(memory=log['memory'], duration=1000) +
+                5 * c.LAMBDA_REQUEST_COST,
+                6,
+            ))
+            self.assertEqual(log['execution_cost'], replay['total_cost'])
+
+        self.assertEqual(
+            [item['memory'] for item in results['ranking']['cost']],
+            [128, 256],
+        )
+
+        # Cold starts are part of the trace, they are not discarded
+        self.assertEqual(
+            len(results['logs'][0]['duration']['all_invocations']), 5)
+
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            Benchmark(mode='replay')
+
+    def test_replay_errors(self):
+        '''Test errors are priced in the cost of the trace'''
+        path = self.write_trace([
+            {'offset': offset, 'event': {'n': 1}}
+            for offset in (0, 0.01, 0.02, 0.03, 0.04)
+        ])
+        backend = FakeFlakyBackend(duration=150)
+        benchmarking = Benchmark(
+            mode='replay',
+            replay_trace_path=path,
+            memory_sets=[3008],
+            architectures=['x86_64'],
+            use_cache=False,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        # 2 successes billed 200 ms, 3 errors billed their wall time
+        self.assertEqual(results['logs'][0]['replay']['total_cost'], round(
+            lambda_execution_cost(memory=3008, duration=700) +
+            5 * c.LAMBDA_REQUEST_COST,
+            6,
+        ))
+
+
+class FakeFlakyBackend(FakeLambdaBackend):
+    '''Fake function running out of memory on every other invocation'''
+
+    def invoke_lambda(self, **kwargs) -> dict:
+        self.memory_used = 64 if self.invocations % 2 else 4096
+
+        return super().invoke_lambda(**kwargs)
+
+
+class FakeContendedBackend(FakeLambdaBackend):
+    '''Fake function slowing down above `capacity` invocations in flight'''
+
+    def __init__(self, *, capacity: int, **kwargs):
+        super().__init__(**kwargs)
+        self.capacity = capacity
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def invoke_lambda(self, **kwargs) -> dict:
+        with self.lock:
+            self.in_flight += 1
+            self.invocations += 1
+            slowdown = max(self.in_flight / self.capacity, 1)
+
+        try:
+            time.sleep(self.latency * slowdown)
+
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+        return {
+            'StatusCode': 200,
+            'Payload': {
+                'remaining_time':
+                    self.timeout - int(self.duration * slowdown),
+                'cold_start': False,
+            },
+        }
+
+
+class TestConcurrencySweep(unittest.TestCase):
+    '''Test sweeps of durations and throughput across concurrency levels'''
+
+    def test_levels(self):
+        '''Test levels double up to the maximum concurrency'''
+        self.assertEqual(concurrency_levels(10), [1, 2, 4, 8, 10])
+        self.assertEqual(concurrency_levels(8), [1, 2, 4, 8])
+        self.assertEqual(concurrency_levels(1), [1])
+
+    def test_find_knee(self):
+        '''Test the knee is where the curve flattens'''
+        self.assertEqual(find_knee([0, 1, 2, 3, 4], [1, 2, 4, 4.2, 4.3]), 2)
+        # Straight lines and short curves have no knee
+        self.assertIsNone(find_knee([0, 1, 2, 3], [1, 2, 3, 4]))
+        self.assertIsNone(find_knee([0, 1], [1, 2]))
+
+    def test_sweep(self):
+        '''Test the grid and knee of a function saturating at 4 requests'''
+        backend = FakeContendedBackend(capacity=4, latency=0.02, duration=20)
+        benchmarking = Benchmark(
+            test_count=2,
+            max_threads=2,
+            memory_sets=[128, 256],
+            architectures=['x86_64'],
+            use_cache=False,
+            concurrency_sweep=True,
+            concurrency_max=8,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        grid = results['concurrency']
+
+        self.assertEqual([curve['memory'] for curve in grid], [128, 256])
+
+        for curve in grid:
+            levels = curve['levels']
+
+            self.assertEqual(
+                [level['concurrency'] for level in levels], [1, 2, 4, 8])
+            self.assertEqual(
+                [level['requests'] for level in levels], [20, 20, 20, 24])
+            self.assertEqual(curve['knee'], 4)
+            self.assertEqual(curve['degrades_at'], 8)
+            self.assertGreater(
+                levels[2]['throughput'], levels[0]['throughput'] * 3)
+            self.assertEqual(levels[0]['duration']['p50'], 20)
+
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            Benchmark(concurrency_max=0)
+
+
+class TestColumnarExport(unittest.TestCase):
+    '''Test columnar export of raw samples and memory-mapped loading'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def samples(self, durations) -> SampleColumns:
+        samples = SampleColumns()
+
+        for index, duration in enumerate(durations):
+            invocation = Invocation()
+
+            if duration is None:
+                invocation.set_error(custom_exc.LambdaPayloadError('x'))
+
+            else:
+                invocation.success = True
+                invocation.duration = duration
+                invocation.cold_start = index == 0
+                invocation.max_memory_used = 64
+
+            samples.append(invocation)
+
+        return samples
+
+    def test_mapped_columns(self):
+        '''Test raw columns are mapped back without copying'''
+        samples = self.samples([120.5, None, 100.25])
+        report = export_samples(
+            samples=samples,
+            directory=self.directory,
+            function_name='fibonacci',
+            memory=1024,
+            export_format='raw',
+        )
+
+        self.assertEqual(report['rows'], 3)
+        self.assertTrue(report['path'].endswith(os.path.join(
+            'function=fibonacci', 'memory=1024', 'architecture=x86_64')))
+
+        with MappedPartition(report['path']) as partition:
+            duration = partition.column('duration')
+            error_code = partition.column('error_code')
+
+            self.assertIsInstance(duration.obj, mmap.mmap)
+            self.assertEqual(duration.tolist(), [120.5, -1, 100.25])
+            self.assertEqual(
+                error_code.tolist(), list(samples.error_code))
+            self.assertEqual(
+                partition.column('max_memory_used').tolist(), [64, 0, 64])
+
+            duration.release()
+            error_code.release()
+
+    def test_streamed_summary(self):
+        '''Test summaries merged chunk by chunk match the whole sample'''
+        seed(3)
+        durations = [gauss(200, 30) for i in range(1000)]
+        export_samples(
+            samples=self.samples(durations + [None] * 5),
+            directory=self.directory,
+            function_name='fibonacci',
+            memory=512,
+            export_format='raw',
+        )
+
+        path, = partitions(self.directory, memory=512)
+        summary = summarize_partition(path, chunk_rows=64)
+
+        self.assertEqual(summary['count'], 1000)
+        self.assertEqual(summary['errors'], 5)
+        self.assertEqual(summary['cold_starts'], 1)
+        self.assertAlmostEqual(
+            summary['mean'], statistics.mean(durations), places=2)
+        self.assertAlmostEqual(
+            summary['stdev'], statistics.stdev(durations), places=2)
+        self.assertEqual(summary['max'], max(durations))
+
+    def test_benchmark_export(self):
+        '''Test a benchmark exports a partition per memory size'''
+        backend = FakeLambdaBackend(duration=300)
+        benchmarking = Benchmark(
+            test_count=4,
+            max_threads=2,
+            memory_sets=[128, 256],
+            architectures=['x86_64'],
+            use_cache=False,
+            export_path=self.directory,
+            export_format='raw',
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        self.assertEqual(
+            [(item['memory'], item['rows']) for item in results['export']],
+            [(128, 4), (256, 4)],
+        )
+        self.assertEqual(len(partitions(
+            self.directory, function_name=c.DEFAULT_LAMBDA_FUNCTION)), 2)
+        self.assertEqual(
+            summarize_partition(results['export'][0]['path'])['mean'], 300)
+
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            Benchmark(export_path=self.directory, export_format='parquet')
+
+
+class FakeMixedHardwareBackend(FakeLambdaBackend):
+    '''Fake function landing 4 in 5 invocations on the old, slow hosts at
+    128 MB and on the new, fast hosts above'''
+
+    hosts = {
+        'old': ({'model': 'Xeon E5', 'flags_digest': 'aaa'}, 200),
+        'new': ({'model': 'Xeon 8375C', 'flags_digest': 'bbb'}, 100),
+    }
+
+    def invoke_lambda(self, **kwargs) -> dict:
+        self.invocations += 1
+
+        usual, rare = ('old', 'new') if self.config['Memory'] == 128 \
+            else ('new', 'old')
+        cpu, duration = self.hosts[
+            rare if self.invocations % 5 == 0 else usual]
+
+        return {
+            'StatusCode': 200,
+            'Payload': {
+                'remaining_time': self.timeout - duration,
+                'cold_start': False,
+                'cpu': cpu,
+            },
+        }
+
+
+class TestHardwareStratification(unittest.TestCase):
+    '''Test results broken down and reweighted by hardware class'''
+
+    old = 'Xeon E5 [aaa]'
+    new = 'Xeon 8375C [bbb]'
+
+    def run_benchmark(self, **params) -> dict:
+        benchmarking, results = run_fake_benchmark(
+            FakeMixedHardwareBackend(),
+            test_count=50,
+            max_threads=1,
+            **params,
+        )
+
+        return results
+
+    def test_hardware_class(self):
+        '''Test classes are made of the CPU model and flags'''
+        self.assertEqual(
+            hardware_class({'model': 'Graviton', 'flags_digest': 'ab'}),
+            'Graviton [ab]',
+        )
+        self.assertEqual(hardware_class({'model': 'Graviton'}), 'Graviton')
+        self.assertIsNone(hardware_class({'cpus': 2}))
+        self.assertIsNone(hardware_class(None))
+
+    def test_reweighted_average(self):
+        '''Test averages are renormalized over the sampled classes'''
+        summary = {
+            'a': {'count': 8, 'mean': 100},
+            'b': {'count': 2, 'mean': 200},
+        }
+
+        self.assertEqual(pooled_mix([summary, summary]), {'a': 0.8, 'b': 0.2})
+        self.assertEqual(
+            reweighted_average(summary, {'a': 1, 'b': 1})['average'], 150)
+
+        partial = reweighted_average(summary, {'a': 1, 'c': 3})
+
+        self.assertEqual(partial['average'], 100)
+        self.assertEqual(partial['coverage'], 0.25)
+        self.assertEqual(partial['missing'], ['c'])
+
+    def test_reweighted_durations(self):
+        '''Test durations are resampled to the reference mix'''
+        durations = {'a': [100] * 8, 'b': [200, 210]}
+
+        self.assertEqual(
+            sorted(reweighted_durations(durations, {'a': 1, 'b': 1})),
+            [100] * 5 + [200] * 2 + [210] * 3,
+        )
+        self.assertEqual(reweighted_durations(durations, {'c': 1}), [])
+
+    def test_normalized_hardware_durations(self):
+        '''Test hardware classes are broken down on normalized durations'''
+        samples = SampleColumns()
+        invocation = Invocation()
+        invocation.success = True
+        invocation.duration = 300
+        invocation.hardware = 'a'
+        samples.append(invocation, control=1.5)
+
+        self.assertEqual(list(samples.durations_by_hardware()['a']), [300])
+        self.assertEqual(
+            list(samples.durations_by_hardware(normalized=True)['a']), [200])
+
+    def test_hardware_mix(self):
+        '''Test the hardware mix of each memory size is reported'''
+        results = self.run_benchmark()
+
+        self.assertIsNone(results['hardware']['reference_mix'])
+        self.assertEqual(
+            [item['mix'] for item in results['hardware']['mix']],
+            [{self.new: 0.2, self.old: 0.8}, {self.new: 0.8, self.old: 0.2}],
+        )
+
+        log = results['logs'][0]
+
+        self.assertEqual(log['duration']['average'], 180)
+        self.assertEqual(log['hardware'][self.old]['mean'], 200)
+        self.assertEqual(log['hardware'][self.new]['count'], 10)
+
+    def test_pooled_reweighting(self):
+        '''Test sizes are compared on the same mix of hosts'''
+        results = self.run_benchmark(hardware_reference_mix='pooled')
+
+        self.assertEqual(
+            results['hardware']['reference_mix'],
+            {self.new: 0.5, self.old: 0.5},
+        )
+
+        for log in results['logs']:
+            self.assertEqual(log['duration']['average'], 150)
+            self.assertEqual(log['hardware']['reweighted']['coverage'], 1)
+
+        self.assertEqual(
+            [log['duration']['unweighted_average'] for log in results['logs']],
+            [180, 120],
+        )
+
+        # Significance is tested on the same mix the averages are weighted by
+        self.assertEqual(len(results['statistics']['tiers']), 1)
+
+        with patch.object(Benchmark, 'stratify_hardware',
+                          lambda self, results: (results, None)):
+            unweighted = self.run_benchmark(hardware_reference_mix='pooled')
+
+        self.assertEqual(len(unweighted['statistics']['tiers']), 2)
+
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            Benchmark(hardware_reference_mix={'a': -1})
+
+
+class FakeAmdahlBackend(FakeLambdaBackend):
+    '''Fake single-threaded function: 50 ms of I/O and 2000 ms of CPU at one
+    full vCPU, +/- 5 ms of noise'''
+
+    def invoke_lambda(self, **kwargs) -> dict:
+        memory = self.config['Memory']
+        noise = 5 if self.invocations % 2 else -5
+        self.duration = round(50 + 2000 / min(memory / 1769, 1)) + noise
+
+        return super().invoke_lambda(**kwargs)
+
+
+class TestExtrapolation(unittest.TestCase):
+    '''Test duration and cost predicted across memory sizes'''
+
+    probes = [128, 512, 1024, 3008]
+
+    @staticmethod
+    def truth(memory: float, workers: int = 1) -> float:
+        return 50 + 2000 / min(memory / 1769, workers)
+
+    def observations(self, workers: int = 1) -> dict:
+        rand = Random(1)
+
+        return {
+            memory: [
+                self.truth(memory, workers) + rand.gauss(0, 5)
+                for i in range(20)
+            ]
+            for memory in self.probes
+        }
+
+    def test_fit(self):
+        '''Test the serial and parallel times and workers are recovered'''
+        model = fit_duration_model(self.observations())
+
+        self.assertEqual(model.workers, 1)
+        self.assertAlmostEqual(model.serial, 50, delta=5)
+        self.assertAlmostEqual(model.parallel, 2000, delta=5)
+
+        self.probes = [128, 1024, 3008, 5000]
+        model = fit_duration_model(self.observations(workers=2))
+
+        self.assertEqual(model.workers, 2)
+
+        with self.assertRaises(ValueError):
+            fit_duration_model({2048: [100], 3000: [100]}, max_workers=1)
+
+    def test_fit_above_full_vcpu(self):
+        '''Test probes all above 1769 MB are fitted with more workers'''
+        self.probes = [2048, 3008, 5120]
+        model = fit_duration_model(self.observations(workers=3))
+
+        self.assertEqual(model.workers, 3)
+        self.assertAlmostEqual(model.parallel, 2000, delta=20)
+
+        result = extrapolate(observations=self.observations(workers=3))
+
+        self.assertEqual(result['model']['probes'], self.probes)
+
+    def test_extrapolate(self):
+        '''Test predictions at every size, their bands and next probes'''
+        result = extrapolate(observations=self.observations())
+        predictions = result['predictions']
+
+        self.assertEqual(len(predictions['memory']), 10240 - 128 + 1)
+        self.assertEqual(
+            {len(column) for column in predictions.values()}, {10113})
+
+        for index in (0, 1000, 1641, 5000):
+            memory = predictions['memory'][index]
+
+            self.assertLessEqual(
+                predictions['duration_low'][index], self.truth(memory))
+            self.assertGreaterEqual(
+                predictions['duration_high'][index], self.truth(memory))
+            self.assertLessEqual(
+                predictions['cost_low'][index], predictions['cost'][index])
+
+        # Duration stops improving at one full vCPU, cost keeps growing
+        self.assertEqual(result['best']['duration']['memory'], 1769)
+        self.assertLess(
+            result['best']['cost']['cost'],
+            predictions['cost'][predictions['memory'].index(3008)],
+        )
+
+        self.assertEqual(len(result['next_probes']), 3)
+        self.assertFalse(set(result['next_probes']) & set(self.probes))
+
+    def test_gb_second_cost(self):
+        '''Test GB-second prices match the pricing table'''
+        self.assertAlmostEqual(
+            gb_second_cost(memory=128, duration=1000),
+            c.LAMBDA_COST_BY_MEMORY[128] * 10,
+            places=8,
+        )
+        self.assertAlmostEqual(
+            gb_second_cost(memory=1024, duration=101, architecture='arm64'),
+            gb_second_cost(memory=1024, duration=200) * c.ARM64_PRICE_RATIO,
+            places=12,
+        )
+
+    def test_benchmark_extrapolation(self):
+        '''Test benchmarked sizes are used as probes of the model'''
+        backend = FakeAmdahlBackend()
+        benchmarking = Benchmark(
+            test_count=4,
+            max_threads=1,
+            memory_sets=self.probes,
+            architectures=['x86_64'],
+            use_cache=False,
+            extrapolate=True,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        extrapolation, = results['extrapolation']
+
+        self.assertEqual(extrapolation['architecture'], 'x86_64')
+        self.assertEqual(extrapolation['model']['probes'], self.probes)
+        self.assertEqual(extrapolation['model']['samples'], 16)
+        self.assertAlmostEqual(extrapolation['model']['serial'], 50, delta=1)
+        self.assertEqual(extrapolation['best']['duration']['memory'], 1769)
+
+    def test_not_enough_probes(self):
+        '''Test a single probe size reports an error and no extrapolation'''
+        backend = FakeAmdahlBackend()
+        benchmarking = Benchmark(
+            test_count=2,
+            max_threads=1,
+            memory_sets=[1024],
+            architectures=['x86_64'],
+            use_cache=False,
+            extrapolate=True,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        self.assertEqual(results['extrapolation'], [])
+        self.assertTrue(any(
+            'ValueError' in error for error in benchmarking.public_errors))
+
+
+class FakeDriftingBackend(FakeLambdaBackend):
+    '''Fake function slowing down by 20% with every batch of invocations,
+    like its control canary, which takes 100 ms at its baseline'''
+
+    base = {128: 1000, 256: 900}
+
+    def __init__(
+            self,
+            *,
+            threads: int,
+            baseline_count: int,
+            broken_canary: bool = False,
+            **kwargs,
+            ):
+        super().__init__(**kwargs)
+        self.threads = threads
+        self.broken_canary = broken_canary
+        self.baseline_count = baseline_count
+        self.calls = itertools.count()
+        self.canary_calls = itertools.count()
+
+    @staticmethod
+    def drift(batch: int) -> float:
+        return 1 + 0.2 * max(batch, 0)
+
+    def invoke_lambda(self, *, function_name: str, **kwargs) -> dict:
+        if function_name == 'canary' and self.broken_canary:
+            return {'StatusCode': 200, 'Payload': {}}
+
+        if function_name == 'canary':
+            batch = next(self.canary_calls) - self.baseline_count
+            self.duration = round(100 * self.drift(batch))
+
+        else:
+            batch = next(self.calls) // self.threads
+            self.duration = round(
+                self.base[self.config['Memory']] * self.drift(batch))
+
+        return super().invoke_lambda(function_name=function_name, **kwargs)
+
+
+class TestControlCanary(unittest.TestCase):
+    '''Test durations normalized by a control canary'''
+
+    def run_benchmark(self, backend, **params) -> tuple:
+        return run_fake_benchmark(
+            backend,
+            test_count=6,
+            max_threads=2,
+            control_function='canary',
+            control_test_count=3,
+            **params,
+        )
+
+    def test_normalized_durations(self):
+        '''Test samples are divided by their batch's canary slowdown'''
+        samples = SampleColumns()
+
+        for duration, control in [(100, 0.0), (200, 2.0), (300, 1.5)]:
+            invocation = Invocation()
+            invocation.success = True
+            invocation.duration = duration
+            samples.append(invocation, control=control)
+
+        self.assertEqual(list(samples.normalized_durations()), [100, 100, 200])
+        self.assertEqual(list(samples.controls()), [0, 2, 1.5])
+
+        summary = summarize_control(
+            raw=[100, 200, 300],
+            normalized=[100, 100, 200],
+            controls=[0, 2, 1.5],
+        )
+
+        self.assertEqual(summary['factor'], 1.75)
+        self.assertAlmostEqual(summary['variance_removed'], 2 / 3, places=4)
+        self.assertEqual(
+            pooled_variance_removed([summary, summary])['variance_removed'],
+            summary['variance_removed'],
+        )
+
+    def test_control_canary(self):
+        '''Test drift is cancelled and raw rankings are kept'''
+        backend = FakeDriftingBackend(threads=2, baseline_count=3)
+        benchmarking, results = self.run_benchmark(backend)
+
+        self.assertEqual(benchmarking.public_errors, [])
+        self.assertEqual(results['control']['baseline'], {
+            'function': 'canary',
+            'average': 100,
+            'samples': 3,
+        })
+
+        # 256 MB, measured later, looks slower until drift is cancelled
+        self.assertEqual(
+            [item['memory'] for item in results['ranking']['duration']],
+            [256, 128],
+        )
+        self.assertEqual(
+            [
+                item['memory']
+                for item in results['control']['raw_ranking']['duration']
+            ],
+            [128, 256],
+        )
+
+        for log in results['logs']:
+            self.assertEqual(
+                log['duration']['average'],
+                FakeDriftingBackend.base[log['memory']],
+            )
+            self.assertEqual(log['control']['variance_removed'], 1)
+
+        self.assertEqual(log['duration']['raw_average'], 1620)
+        self.assertEqual(results['control']['variance_removed'], 1)
+        self.assertEqual(results['control']['min_factor'], 1)
+        self.assertEqual(results['control']['max_factor'], 2)
+
+    def test_failed_canary(self):
+        '''Test durations are left raw when the canary cannot be measured'''
+        backend = FakeDriftingBackend(
+            threads=2, baseline_count=3, broken_canary=True)
+        benchmarking, results = self.run_benchmark(backend)
+
+        self.assertNotIn('control', results)
+        self.assertTrue(any(
+            'ControlCanaryError' in error
+            for error in benchmarking.public_errors
+        ))
+        self.assertEqual(
+            [item['memory'] for item in results['ranking']['duration']],
+            [128, 256],
+        )
+
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            Benchmark(mode='load', control_function='canary')
+
+
+class TestMemoryFloor(unittest.TestCase):
+    '''Test search of the minimal memory size fitting a workload'''
+
+    def test_find_memory_floor(self):
+        '''Test floor search and pruning of sizes below the floor'''
+        backend = FakeLambdaBackend(duration=1000, memory_used=300)
+
+        benchmarking = Benchmark(
+            test_count=2,
+            max_threads=2,
+            memory_sets=[128, 256, 512, 1024],
+            architectures=['x86_64'],
+            memory_floor=True,
+            memory_headroom=20,
+            floor_test_count=2,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        # 300 MB used + 20% headroom fits 384 MB (300 <= 307.2) at minimum
+        self.assertEqual(results['memory_floor']['floor'], 384)
+        self.assertEqual(results['memory_floor']['pruned'], [128, 256])
+        self.assertLessEqual(len(results['memory_floor']['probes']), 6)
+        self.assertEqual(
+            sorted(item['memory'] for item in results['ranking']['cost']),
+            [512, 1024],
+        )
+
+        out_of_memory = [
+            probe for probe in results['memory_floor']['probes']
+            if probe['memory'] < 300
+        ]
+
+        self.assertTrue(all(probe['out_of_memory'] for probe in out_of_memory))
+
+    def test_no_memory_floor(self):
+        '''Test no pruning happens when no memory size fits'''
+        backend = FakeLambdaBackend(duration=1000, memory_used=5000)
+
+        benchmarking = Benchmark(
+            test_count=2,
+            max_threads=2,
+            memory_sets=[128, 256],
+            architectures=['x86_64'],
+            memory_floor=True,
+            floor_test_count=1,
+        )
+
+        with backend.patch():
+            results = benchmarking.run()
+
+        self.assertIsNone(results['memory_floor']['floor'])
+        self.assertTrue(any(
+            'MemoryFloorError' in error
+            for error in benchmarking.public_errors
+        ))
+
+
+class TestAsyncFanOut(unittest.TestCase):
+    '''Test async invocations fan-out with results collected from a queue'''
+
+    def run_benchmark(
+            self,
+            *,
+            backend,
+            test_count: int = 50,
+            async_timeout: float = 5,
+            ) -> Benchmark:
+        '''Run an async benchmark against the fake backend'''
+        return run_fake_benchmark(
+            backend,
+            test_count=test_count,
+            max_threads=10,
+            memory_sets=[128],
+            mode='async',
+            collector=backend.collector,
+            async_timeout=async_timeout,
+        )
+
+    def test_async_fan_out(self):
+        '''Test every async invocation result is matched and measured'''
+        backend = FakeLambdaBackend(
+            duration=1000, collector=LocalQueueCollector())
+
+        # Stale record from a previous run must be ignored
+        backend.collector.put({
+            'requestPayload': {c.CORRELATION_ID_KEY: 'stale'},
+            'responsePayload': {'remaining_time': 1},
+        })
+
+        benchmarking, results = self.run_benchmark(backend=backend)
+
+        statistics = results['logs'][0]['async']
+
+        self.assertEqual(statistics['fired'], 50)
+        self.assertEqual(statistics['received'], 50)
+        self.assertEqual(statistics['missing'], 0)
+        self.assertEqual(
+            results['ranking']['duration'][0]['duration'], 1000)
+
+    def test_async_missing_results(self):
+        '''Test results never collected are reported as missing'''
+        backend = FakeLambdaBackend(collector=LocalQueueCollector())
+        backend.collector.put = lambda record: None
+
+        benchmarking, results = self.run_benchmark(
+            backend=backend, test_count=3, async_timeout=0.5)
+
+        self.assertFalse(results['logs'][0]['success'])
+        self.assertEqual(
+            benchmarking.benchmark_results[0]['async']['missing'], 3)
+
+    def test_correlated_payload(self):
+        '''Test correlation ID is spliced into the serialized event'''
+        benchmarking = Benchmark(lambda_event={'n': 30})
+        payload = json.loads(benchmarking.correlated_payload(
+            correlation_id='foobar'))
+
+        self.assertEqual(payload, {c.CORRELATION_ID_KEY: 'foobar', 'n': 30})
+
+        benchmarking = Benchmark(lambda_event={})
+        payload = json.loads(benchmarking.correlated_payload(
+            correlation_id='foobar'))
+
+        self.assertEqual(payload, {c.CORRELATION_ID_KEY: 'foobar'})
+
+    def test_async_requires_collector(self):
+        '''Test async mode requires a collector queue'''
+        with self.assertRaises(custom_exc.BenchmarkConfigError):
+            Benchmark(mode='async')
+
+
+class TestTracing(unittest.TestCase):
+    '''Test timeline spans and their export'''
+
+    def test_tracer_spans(self):
+        '''Test spans record thread, timestamps and outcome'''
+        tracer = Tracer()
+
+        with tracer.span('invocation', memory=128) as span:
+            span['name'] = 'warm_up'
+
+        with self.assertRaises(KeyError):
+            with tracer.span('config_update'):
+                raise KeyError('foobar')
+
+        self.assertEqual(len(tracer), 2)
+        self.assertEqual(tracer.spans[0]['name'], 'warm_up')
+        self.assertEqual(tracer.spans[0]['outcome'], 'ok')
+        self.assertEqual(tracer.spans[1]['outcome'], 'KeyError')
+        self.assertLessEqual(tracer.spans[0]['start'], tracer.spans[0]['end'])
+        self.assertEqual(
+            tracer.spans[0]['thread_id'], threading.current_thread().ident)
+
+        chrome = tracer.to_chrome_trace()
+        complete = [e for e in chrome['traceEvents'] if e['ph'] == 'X']
+        self.assertEqual(len(complete), 2)
+        self.assertEqual(complete[0]['args'], {'memory': 128, 'outcome': 'ok'})
+
+        otlp = tracer.to_otlp()
+        spans = otlp['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual(len(spans), 2)
+        self.assertEqual(len(spans[0]['traceId']), 32)
+        self.assertEqual(spans[1]['status']['code'], c.OTLP_STATUS_ERROR)
+
+    def test_disabled_tracer(self):
+        '''Test a disabled tracer records nothing'''
+        tracer = Tracer(enabled=False)
+
+        with tracer.span('invocation'):
+            pass
+
+        self.assertEqual(len(tracer), 0)
+
+    def test_benchmark_trace_export(self):
+        '''Test Benchmark.run exports spans of every operation'''
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'trace.json')
+            backend = FakeLambdaBackend()
+
+            benchmarking = Benchmark(
+                test_count=4,
+                max_threads=2,
+                memory_sets=[128, 256],
+                architectures=['x86_64'],
+                trace=True,
+                trace_path=path,
+                use_cache=False,
+            )
+
+            with backend.patch():
+                results = benchmarking.run()
+
+            with open(path) as trace_file:
+                trace = json.load(trace_file)
+
+        names = [event['name'] for event in trace['traceEvents']]
+
+        self.assertEqual(results['trace']['spans'], len(benchmarking.tracer))
+        self.assertEqual(names.count('invocation'), 8)
+        self.assertEqual(names.count('readiness_wait'), 2)
+        # Two memory sizes and the restore of the original configuration
+        self.assertEqual(names.count('config_update'), 3)
+
+
+class TestMetrics(unittest.TestCase):
+    '''Test the metrics registry and its exporters'''
+
+    def test_registry(self):
+        '''Test counters, histograms and merging registries'''
+        registry = MetricsRegistry()
+
+        registry.inc('invocations', function='fibonacci', memory=128)
+        registry.inc('invocations', function='fibonacci', memory=128)
+        registry.inc('invocations', function='fibonacci', memory=256)
+
+        for latency in (1, 20, 20, 700):
+            registry.observe(
+                'invocation_latency', latency, function='fibonacci',
+                memory=128)
+
+        other = MetricsRegistry()
+        other.merge(registry)
+        other.merge(registry)
+
+        key = MetricsRegistry.key(
+            'invocations', {'function': 'fibonacci', 'memory': 128})
+        histogram = other.histograms[MetricsRegistry.key(
+            'invocation_latency', {'function': 'fibonacci', 'memory': 128})]
+
+        self.assertEqual(registry.counters[key], 2)
+        self.assertEqual(other.counters[key], 4)
+        self.assertEqual(histogram.count, 8)
+        self.assertEqual(histogram.quantile(0.5), 25)
+        self.assertEqual(histogram.quantile(1), 1000)
+        self.assertEqual(histogram.max, 700)
+
+        # Series without a memory size leave the label out
+        registry.inc('config_updates', function='fibonacci', memory=None)
+
+        self.assertIn(
+            'lambda_benchmark_config_updates_total{function="fibonacci"} 1',
+            registry.to_prometheus(),
+        )
+
+    def test_exporters(self):
+        '''Test EMF lines and Prometheus text exposition'''
+        registry = MetricsRegistry()
+        registry.inc('errors', function='fibonacci', memory=128,
+                     error='LambdaThrottledError')
+        registry.observe('invocation_latency', 42, function='fibonacci',
+                         memory=128)
+
+        lines = [json.loads(line) for line in registry.to_emf()]
+
+        self.assertEqual(len(lines), 2)
+        for line in lines:
+            directive = line['_aws']['CloudWatchMetrics'][0]
+            self.assertEqual(directive['Namespace'], c.METRICS_NAMESPACE)
+
+            for dimension in directive['Dimensions'][0]:
+                self.assertIn(dimension, line)
+
+            for metric in directive['Metrics']:
+                self.assertIn(metric['Name'], line)
+
+        text = registry.to_prometheus()
+
+        self.assertIn(
+            'lambda_benchmark_errors_total{error="LambdaThrottledError",'
+            'function="fibonacci",memory="128"} 1', text)
+        self.assertIn(
+            'lambda_benchmark_invocation_latency_bucket{function="fibonacci",'
+            'memory="128",le="+Inf"} 1', text)
+
+        # Observations are summarized with their true max, not a bucket's
+        self.assertIn(
+            42, [line.get('invocation_latency_max') for line in lines])
+
+        server = serve_prometheus(metrics=registry, port=0)
+
+        try:
+            url = f'http://localhost:{server.server_port}/metrics'
+
+            with urllib.request.urlopen(url) as response:
+                self.assertEqual(response.read().decode('utf-8'), text)
+
+        finally:
+            server.shutdown()
+
+    def test_benchmark_metrics(self):
+        '''Test Benchmark records invocation and config update metrics'''
+        backend = FakeLambdaBackend()
+        benchmarking = Benchmark(
+            test_count=4,
+            max_threads=2,
+            memory_sets=[128],
+            architectures=['x86_64'],
+            use_cache=False,
+        )
+
+        with backend.patch():
+            benchmarking.run()
+
+        labels = {'function': c.DEFAULT_LAMBDA_FUNCTION, 'memory': 128}
+        counters = benchmarking.metrics.counters
+
+        self.assertEqual(
+            counters[MetricsRegistry.key('invocations', labels)], 4)
+        self.assertEqual(
+            benchmarking.metrics.histograms[MetricsRegistry.key(
+                'invocation_latency', labels)].count,
+            4,
+        )
+        self.assertEqual(counters[MetricsRegistry.key('config_updates', {
+            'function': c.DEFAULT_LAMBDA_FUNCTION,
+            'setting': 'memory',
+        })], 2)
+
+
+class TestResultCache(unittest.TestCase):
+    '''Test persistent cache of benchmark results'''
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'cache.json')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_lru_eviction(self):
+        '''Test least recently used entries are evicted first'''
+        cache = ResultCache(path=self.path, max_entries=2)
+
+        cache.set('a', {'memory': 128})
+        cache.set('b', {'memory': 256})
+        cache.get('a')
+        cache.set('c', {'memory': 512})
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_ttl_and_persistence(self):
+        '''Test entries persist across instances and expire after TTL'''
+        cache = ResultCache(path=self.path)
+        cache.set(ResultCache.key(memory=128), {'memory': 128})
+        cache.save()
+
+        reloaded = ResultCache(path=self.path)
+        self.assertEqual(reloaded.load(), 1)
+        self.assertEqual(
+            reloaded.get(ResultCache.key(memory=128)), {'memory': 128})
+
+        expired = ResultCache(path=self.path, ttl=-1)
+        self.assertEqual(expired.load(), 0)
+
+    def test_benchmark_uses_cache(self):
+        '''Test Benchmark.run invokes only sizes missing from the cache'''
+        backend = FakeLambdaBackend(duration=1000)
+        backend.config['CodeSha256'] = 'foobar'
+        backend.config['Runtime'] = 'python3.11'
+
+        def run(memory_sets, **params):
+            benchmarking, results = run_fake_benchmark(
+                backend,
+                memory_sets=memory_sets,
+                use_cache=True,
+                cache_path=self.path,
+                **params,
+            )
+
+            return results
+
+        run([128, 256])
+        self.assertEqual(backend.invocations, 10)
+
+        results = run([128, 256, 512])
+        self.assertEqual(backend.invocations, 15)
+        self.assertEqual(len(results['ranking']['cost']), 3)
+        self.assertEqual(
+            sorted(log['memory'] for log in results['logs']
+                   if log.get('cached')),
+            [128, 256],
+        )
+
+        run([128, 256, 512], force_refresh=True)
+        self.assertEqual(backend.invocations, 30)
+
+        backend.config['CodeSha256'] = 'new_code'
+        run([128])
+        self.assertEqual(backend.invocations, 35)
+
+        # Results of fewer samples, or keeping cold starts, are not reused
+        run([128], test_count=10)
+        self.assertEqual(backend.invocations, 45)
+
+        run([128], ignore_coldstart=False)
+        self.assertEqual(backend.invocations, 50)
+
+        run([128])
+        self.assertEqual(backend.invocations, 50)
+
+    def test_cache_key_parameters(self):
+        '''Test every result-affecting parameter changes the cache key'''
+        backend = FakeLambdaBackend()
+        backend.config['CodeSha256'] = 'foobar'
+
+        def key(**params):
+            benchmarking = Benchmark(mode='load', **params)
+
+            with backend.patch():
+                return benchmarking.cache_key(
+                    memory=128, architecture='x86_64')
+
+        self.assertNotEqual(key(load_rate=10), key(load_rate=200))
+        self.assertNotEqual(key(load_duration=10), key(load_duration=20))
+        self.assertNotEqual(
+            key(load_arrivals='constant'), key(load_arrivals='poisson'))
+        self.assertNotEqual(key(async_timeout=10), key(async_timeout=20))
+        self.assertEqual(key(load_rate=10), key(load_rate=10))
+
+        # Every attribute is set, and serializable, on a default Benchmark
+        self.assertIsNotNone(key())
+
 
 class TestLambdaHandler(unittest.TestCase):
     '''Test Lambda handler entire cycle'''
@@ -603,14 +3151,14 @@ class TestLambdaHandler(unittest.TestCase):
 
         self.benchmarking = Benchmark(**self.params)  # Use default arguments
 
-    @patch('lambda_function.print_payload')
-    def test_invalid_event(self, print_payload):
+    @patch('lambda_function.log_payload')
+    def test_invalid_event(self, log_payload):
         '''Test Lambda handler with an invalid event'''
         invalid_event = {'foo': 'bar'}
 
         response = lambda_handler(event=invalid_event, context={})
 
-        print_payload.assert_has_calls([
+        log_payload.assert_has_calls([
             call(payload_type='event', payload_obj=invalid_event),
             call(payload_type='response', payload_obj=response),
         ])
@@ -622,8 +3170,8 @@ class TestLambdaHandler(unittest.TestCase):
 
     @patch('lambda_function.Benchmark', new_callable=CustomMock.benchmark_fail_regular)  # NOQA
     @patch('lambda_function.logger')
-    @patch('lambda_function.print_payload')
-    def test_benchmark_fail_regular(self, print_payload, logger, Benchmark):
+    @patch('lambda_function.log_payload')
+    def test_benchmark_fail_regular(self, log_payload, logger, Benchmark):
         '''Test full processing cycle'''
         response = lambda_handler(event=self.params, context={})
 
@@ -639,8 +3187,8 @@ class TestLambdaHandler(unittest.TestCase):
 
     @patch('lambda_function.Benchmark', new_callable=CustomMock.benchmark_fail_custom)  # NOQA
     @patch('lambda_function.logger')
-    @patch('lambda_function.print_payload')
-    def test_benchmark_fail_custom(self, print_payload, logger, Benchmark):
+    @patch('lambda_function.log_payload')
+    def test_benchmark_fail_custom(self, log_payload, logger, Benchmark):
         '''Test full processing cycle'''
         response = lambda_handler(event=self.params, context={})
 
@@ -0,0 +1,179 @@
+'''Timeline spans of benchmark operations, exportable for trace viewers'''
+import contextlib
+import json
+import os
+import secrets
+import threading
+import time
+from typing import (
+    Dict,
+    Iterator,
+)
+import constants as c
+
+
+class Tracer():
+    '''Record spans for config updates, waits and invocations
+
+    Spans are exported as Chrome trace-event JSON, which Perfetto and
+    chrome://tracing open, or as OTLP-compatible JSON.
+    '''
+
+    def __init__(self, *, enabled: bool = True):
+        self.enabled = enabled
+        self.spans = []
+        self.trace_id = secrets.token_hex(16)
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Dict]:
+        '''Record a span around a block of code
+
+        The yielded span dict can be updated to rename it, add attributes or
+        set its outcome, which defaults to 'ok' or the exception class name.
+        '''
+        span = {
+            'name': name,
+            'attributes': attributes,
+            'outcome': 'ok',
+        }
+
+        if not self.enabled:
+            yield span
+            return
+
+        thread = threading.current_thread()
+        span['thread_id'] = thread.ident
+        span['thread_name'] = thread.name
+        span['start'] = time.time_ns()
+
+        try:
+            yield span
+
+        except Exception as error:
+            span['outcome'] = type(error).__name__
+            raise
+
+        finally:
+            span['end'] = time.time_ns()
+            # Appending to a list is atomic, no lock needed across threads
+            self.spans.append(span)
+
+    def to_chrome_trace(self) -> Dict:
+        '''Spans as Chrome trace-event format complete ('X') events'''
+        pid = os.getpid()
+        events = []
+        threads = {}
+
+        for span in self.spans:
+            threads[span['thread_id']] = span['thread_name']
+
+            events.append({
+                'name': span['name'],
+                'cat': 'benchmark',
+                'ph': 'X',
+                'ts': span['start'] / 1000,
+                'dur': (span['end'] - span['start']) / 1000,
+                'pid': pid,
+                'tid': span['thread_id'],
+                'args': dict(span['attributes'], outcome=span['outcome']),
+            })
+
+        for thread_id, thread_name in threads.items():
+            events.append({
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': pid,
+                'tid': thread_id,
+                'args': {'name': thread_name},
+            })
+
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+        }
+
+    def to_otlp(self) -> Dict:
+        '''Spans as OTLP/JSON (OpenTelemetry protocol) resource spans'''
+        spans = []
+
+        for span in self.spans:
+            attributes = dict(
+                span['attributes'],
+                outcome=span['outcome'],
+                thread_id=span['thread_id'],
+                thread_name=span['thread_name'],
+            )
+
+            spans.append({
+                'traceId': self.trace_id,
+                'spanId': secrets.token_hex(8),
+                'name': span['name'],
+                'kind': c.OTLP_SPAN_KIND_INTERNAL,
+                'startTimeUnixNano': str(span['start']),
+                'endTimeUnixNano': str(span['end']),
+                'attributes': [
+                    otlp_attribute(key, value)
+                    for key, value in attributes.items()
+                ],
+                'status': {
+                    'code': c.OTLP_STATUS_OK if span['outcome'] == 'ok'
+                    else c.OTLP_STATUS_ERROR,
+                },
+            })
+
+        return {
+            'resourceSpans': [{
+                'resource': {
+                    'attributes': [
+                        otlp_attribute('service.name', c.TRACE_SERVICE_NAME),
+                    ],
+                },
+                'scopeSpans': [{
+                    'scope': {'name': c.TRACE_SERVICE_NAME},
+                    'spans': spans,
+                }],
+            }],
+        }
+
+    def export(
+            self,
+            *,
+            path: str,
+            trace_format: str = c.DEFAULT_TRACE_FORMAT,
+            ) -> Dict:
+        '''Write spans to a JSON file in the given trace format'''
+        if trace_format == 'otlp':
+            trace = self.to_otlp()
+
+        else:
+            trace = self.to_chrome_trace()
+
+        with open(path, 'w') as trace_file:
+            json.dump(trace, trace_file)
+
+        return {
+            'path': path,
+            'format': trace_format,
+            'spans': len(self.spans),
+        }
+
+
+def otlp_attribute(key: str, value) -> Dict:
+    '''OTLP/JSON key-value attribute'''
+    if type(value) is bool:
+        typed = {'boolValue': value}
+
+    elif type(value) is int:
+        # OTLP/JSON encodes 64-bit integers as strings
+        typed = {'intValue': str(value)}
+
+    elif type(value) is float:
+        typed = {'doubleValue': value}
+
+    else:
+        typed = {'stringValue': str(value)}
+
+    return {'key': key, 'value': typed}
@@ -1,19 +1,53 @@
-'''Utility functions for the memory benchmark Lambda'''
+'''Utility functions for the memory benchmark Lambda
+
+Heavy modules (boto3, urllib.request, pprint) are imported on first use, to
+keep them out of the cold start of the benchmarker Lambda.
+'''
+import base64
+import binascii
 import json
 import logging
 import math
-import pprint
+import re
+import threading
 from typing import (
     Dict,
+    Union,
 )
-import boto3
 import constants as c
 import custom_exceptions as custom_exc
 
+# Prefer a fast JSON library when one is installed, fall back to stdlib json
+try:
+    import orjson
+
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+    JSON_DECODE_ERRORS = (orjson.JSONDecodeError,)
+
+except ImportError:
+    try:
+        import msgspec
+
+        json_dumps = msgspec.json.Encoder().encode
+        json_loads = msgspec.json.Decoder().decode
+        JSON_DECODE_ERRORS = (msgspec.DecodeError,)
+
+    except ImportError:
+        def json_dumps(obj) -> bytes:
+            '''Serialize an object to compact JSON bytes'''
+            return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+        json_loads = json.loads
+        JSON_DECODE_ERRORS = (json.decoder.JSONDecodeError,)
+
 
 logger = logging.getLogger()
 logger.setLevel(logging.WARNING)
 
+payload_logger = logging.getLogger(c.PAYLOAD_LOGGER_NAME)
+payload_logger.setLevel(c.PAYLOAD_LOG_LEVEL)
+
 
 def validate_event(*, event):
     '''Validate Lambda event payload input'''
@@ -30,16 +64,133 @@ def validate_event(*, event):
     return valid, error
 
 
-def print_payload(*, payload_type: str, payload_obj: Dict):
-    '''Print payload objects for debugging purposes'''
-    print(c.PAYLOAD_PRINT_MSG.get(payload_type, f'PAYLOAD {payload_type}:'))
-    print(json.dumps(payload_obj))
+def summarize_payload(obj, max_items: int = c.PAYLOAD_LOG_MAX_ITEMS):
+    '''Shrink a payload for logging, summarizing lists longer than max_items
+
+    Long lists are replaced by a dict with their length, the first items and,
+    when all items are numbers, their min/max values.
+    '''
+    if isinstance(obj, dict):
+        return {
+            key: summarize_payload(val, max_items=max_items)
+            for key, val in obj.items()
+        }
+
+    if isinstance(obj, (list, tuple)):
+        if len(obj) <= max_items:
+            return [summarize_payload(item, max_items=max_items)
+                    for item in obj]
+
+        summary = {
+            'count': len(obj),
+            'head': [summarize_payload(item, max_items=max_items)
+                     for item in obj[:max_items]],
+        }
+
+        if all(type(item) in (int, float) for item in obj):
+            summary['min'] = min(obj)
+            summary['max'] = max(obj)
+
+        return summary
+
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+
+    return str(obj)
+
+
+class LazyPayload():
+    '''Payload log record rendered only when a log handler emits it'''
+
+    __slots__ = ('payload_type', 'payload_obj', 'max_chars')
+
+    def __init__(
+            self,
+            *,
+            payload_type: str,
+            payload_obj,
+            max_chars: int = c.PAYLOAD_LOG_MAX_CHARS,
+            ):
+        self.payload_type = payload_type
+        self.payload_obj = payload_obj
+        self.max_chars = max_chars
+
+    def __str__(self):
+        record = json.dumps({
+            'payload_type': self.payload_type,
+            'payload': summarize_payload(self.payload_obj),
+        }, default=str)
 
+        if len(record) > self.max_chars:
+            record = f'{record[:self.max_chars]}... [truncated]'
 
-def lambda_client():
-    '''Instantiate a thread-safe Lambda client'''
-    session = boto3.session.Session()
-    return session.client('lambda')
+        return record
+
+
+def log_payload(*, payload_type: str, payload_obj: Dict):
+    '''Log a size-capped summary of payload objects for debugging purposes'''
+    payload_logger.info(
+        '%s %s',
+        c.PAYLOAD_PRINT_MSG.get(payload_type, f'PAYLOAD {payload_type}:'),
+        LazyPayload(payload_type=payload_type, payload_obj=payload_obj),
+    )
+
+
+# Clients shared across invocations of a sandbox, by service name
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def aws_client(
+        service: str,
+        region: Union[str, None] = None,
+        *,
+        max_connections: int = c.AWS_MAX_POOL_CONNECTIONS,
+        ):
+    '''Get the client of an AWS service in a region, created once per sandbox
+
+    Clients are thread-safe but sessions are not, so each client is created
+    from its own session under a lock, then shared across threads. Each
+    client pools max_connections connections, at least the default: a pool
+    smaller than the concurrent calls discards connections and opens new
+    ones, with TLS handshakes added to invocation latencies. The session
+    default region is used when region is None.
+    '''
+    max_connections = max(max_connections, c.AWS_MAX_POOL_CONNECTIONS)
+    key = (service, region, max_connections)
+    client = _clients.get(key)
+
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+
+            if client is None:
+                import boto3
+                from botocore.config import Config
+
+                session = boto3.session.Session()
+                client = _clients[key] = session.client(
+                    service,
+                    region_name=region,
+                    config=Config(max_pool_connections=max_connections),
+                )
+
+    return client
+
+
+def lambda_client(
+        region: Union[str, None] = None,
+        *,
+        max_connections: int = c.AWS_MAX_POOL_CONNECTIONS,
+        ):
+    '''Get the shared, thread-safe Lambda client of a region'''
+    return aws_client(
+        'lambda', region=region, max_connections=max_connections)
+
+
+def sqs_client(region: Union[str, None] = None):
+    '''Get the shared, thread-safe SQS client of a region'''
+    return aws_client('sqs', region=region)
 
 
 def invoke_lambda(
@@ -48,6 +199,8 @@ def invoke_lambda(
         payload,
         invocation_type: str,
         log_type: str = 'None',
+        region: Union[str, None] = None,
+        max_connections: int = c.AWS_MAX_POOL_CONNECTIONS,
         ) -> Dict:
     '''Invoke a Lambda function
 
@@ -56,34 +209,83 @@ def invoke_lambda(
         'RequestResponse': synchronous call, will wait for Lambda processing
         'Event': asynchronous call, will NOT wait for Lambda processing
         'DryRun': validate param values and user permission
-    :arg payload: payload data to submit to the Lambda function
+    :arg payload: payload data to submit to the Lambda function, either an
+        object or its pre-serialized JSON (bytes or str)
     :arg log_type: one of these options:
         'None': does not include execution logs in the response
         'Tail': includes execution logs in the response
+    :arg region: region of the function, default region when None
+    :arg max_connections: concurrent invocations the client should pool
+        connections for
     '''
-    aws_lambda = lambda_client()
+    aws_lambda = lambda_client(region, max_connections=max_connections)
 
     response = aws_lambda.invoke(
         FunctionName=function_name,
         InvocationType=invocation_type,
         LogType=log_type,
-        Payload=json.dumps(payload),
+        Payload=payload if isinstance(payload, (bytes, str))
+        else json_dumps(payload),
     )
 
     # Decode response payload
     try:
-        payload = response['Payload'].read(amt=None).decode('utf-8')
-        response['Payload'] = json.loads(payload)
+        response['Payload'] = json_loads(response['Payload'].read(amt=None))
 
-    except (TypeError, json.decoder.JSONDecodeError):
+    except (TypeError, *JSON_DECODE_ERRORS):
         logger.warning('Unable to parse Lambda Payload JSON response.')
         response['Payload'] = None
 
     return response
 
 
-def update_lambda_config(*, function_name: str, **kwargs) -> Dict:
-    aws_lambda = lambda_client()
+def parse_invocation_report(*, response: Dict) -> Dict:
+    '''Parse memory usage and out-of-memory errors from an invoke response
+
+    Max Memory Used is only available when invoked with log_type 'Tail',
+    from the REPORT line of the base64 encoded log tail.
+    '''
+    report = {
+        'max_memory_used': None,
+        'out_of_memory': False,
+    }
+
+    try:
+        logs = base64.b64decode(response.get('LogResult') or '')
+        logs = logs.decode('utf-8', errors='replace')
+
+    except (binascii.Error, TypeError, ValueError):
+        logs = ''
+
+    match = re.search(r'Max Memory Used: (\d+) MB', logs)
+
+    if match:
+        report['max_memory_used'] = int(match.group(1))
+
+    error_message = ''
+
+    if response.get('FunctionError') and \
+            isinstance(response.get('Payload'), dict):
+        error_message = ' '.join(
+            str(response['Payload'].get(key, ''))
+            for key in ('errorType', 'errorMessage')
+        )
+
+    report['out_of_memory'] = any(
+        marker in logs or marker in error_message
+        for marker in c.OUT_OF_MEMORY_MARKERS
+    )
+
+    return report
+
+
+def update_lambda_config(
+        *,
+        function_name: str,
+        region: Union[str, None] = None,
+        **kwargs,
+        ) -> Dict:
+    aws_lambda = lambda_client(region)
 
     config_args = {
         'FunctionName': function_name,
@@ -100,9 +302,45 @@ def update_lambda_config(*, function_name: str, **kwargs) -> Dict:
     return response
 
 
-def get_lambda_config(*, function_name):
+def update_lambda_architecture(
+        *,
+        function_name: str,
+        architecture: str,
+        region: Union[str, None] = None,
+        ) -> Dict:
+    '''Redeploy the current code package of a function on an architecture
+
+    Lambda only accepts a new architecture along with a code package, so the
+    deployed .zip is downloaded and uploaded again. Container images are
+    built for a single architecture and require a twin function instead.
+    '''
+    aws_lambda = lambda_client(region)
+
+    function = aws_lambda.get_function(FunctionName=function_name)
+
+    if function['Configuration'].get('PackageType') == 'Image':
+        raise custom_exc.SetLambdaArchitectureError(
+            f'Cannot switch architecture of container image function '
+            f'({function_name}), deploy a twin function instead'
+        )
+
+    import urllib.request
+
+    with urllib.request.urlopen(function['Code']['Location']) as package:
+        zip_file = package.read()
+
+    response = aws_lambda.update_function_code(
+        FunctionName=function_name,
+        ZipFile=zip_file,
+        Architectures=[architecture],
+    )
+
+    return response
+
+
+def get_lambda_config(*, function_name, region: Union[str, None] = None):
     '''Get current configuration parameters for a given Lambda function'''
-    aws_lambda = lambda_client()
+    aws_lambda = lambda_client(region)
 
     response = aws_lambda.get_function_configuration(
         FunctionName=function_name,
@@ -111,19 +349,53 @@ def get_lambda_config(*, function_name):
     return response
 
 
-def lambda_execution_cost(*, memory: int, duration: int) -> float:
-    '''Calculate Lambda execution cost'''
-    cost_per_100ms = c.LAMBDA_COST_BY_MEMORY.get(memory)
+def lambda_execution_cost(
+        *,
+        memory: int,
+        duration: int,
+        architecture: str = c.DEFAULT_ARCHITECTURE,
+        region: Union[str, None] = None,
+        ) -> float:
+    '''Calculate Lambda execution cost, with the region's price'''
+    cost_by_memory = c.LAMBDA_COST_BY_ARCHITECTURE.get(architecture, {})
+    cost_per_100ms = cost_by_memory.get(memory)
 
     if not cost_per_100ms:
         raise custom_exc.CalculateLambdaExecutionCostError(
-            f'Cost/100ms not found for memory size ({memory})'
+            f'Cost/100ms not found for memory size ({memory}) and '
+            f'architecture ({architecture})'
         )
 
-    return round(math.ceil(duration/100) * cost_per_100ms, 6)
+    price_ratio = c.LAMBDA_REGION_PRICE_RATIOS.get(region, 1.0)
+
+    return round(math.ceil(duration/100) * cost_per_100ms * price_ratio, 6)
+
+
+def is_throttling_error(exc: Exception) -> bool:
+    '''Whether an exception raised by the Lambda API is due to throttling'''
+    response = getattr(exc, 'response', None)
+
+    if type(response) is not dict:
+        return False
+
+    return response.get('Error', {}).get('Code') in c.THROTTLING_ERROR_CODES
+
+
+def percentile(ordered, q: float) -> float:
+    '''Percentile q (0-100) of sorted values, with linear interpolation'''
+    if not ordered:
+        raise ValueError('Cannot compute percentile of empty values')
+
+    rank = (len(ordered) - 1) * q / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
 
 
 def pretty_print(data: str, indent: int = 4):
     '''Pretty printer'''
+    import pprint
+
     pp = pprint.PrettyPrinter(indent=indent)
     pp.pprint(data)
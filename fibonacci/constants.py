@@ -2,3 +2,18 @@
 
 
 DEFAULT_FIBONACCI_N = 20
+DEFAULT_ITERATIONS = 1
+CPUINFO_PATH = '/proc/cpuinfo'
+# Instruction set extensions reported by name in the CPU fingerprint
+FINGERPRINT_FLAGS = [
+    'avx',
+    'avx2',
+    'avx512f',
+    'avx512_vnni',
+    'amx_tile',
+    'sha_ni',
+    'vaes',
+    'asimd',
+    'sve',
+    'sve2',
+]
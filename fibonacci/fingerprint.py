@@ -0,0 +1,66 @@
+'''CPU fingerprint of the host running the Lambda sandbox'''
+import hashlib
+import os
+from typing import Dict
+import constants as c
+
+
+def parse_cpuinfo(text: str) -> Dict:
+    '''Model, clock speed and flags of the first CPU in /proc/cpuinfo
+
+    x86_64 hosts report a 'model name' and 'flags'; arm64 hosts report no
+    model name, so their implementer and part numbers are used instead, and
+    'Features' as flags.
+    '''
+    fields = {}
+
+    for line in text.splitlines():
+        # Every CPU repeats the same block, the first one is enough
+        if not line.strip():
+            if fields:
+                break
+
+            continue
+
+        key, sep, value = line.partition(':')
+
+        if sep:
+            fields[key.strip()] = value.strip()
+
+    model = fields.get('model name') or ':'.join(filter(None, (
+        fields.get('CPU implementer'),
+        fields.get('CPU part'),
+    ))) or None
+
+    flags = sorted(
+        (fields.get('flags') or fields.get('Features') or '').split())
+
+    try:
+        mhz = round(float(fields['cpu MHz']), 1)
+
+    except (KeyError, ValueError):
+        mhz = None
+
+    return {
+        'model': model,
+        'mhz': mhz,
+        'flags': [flag for flag in flags if flag in c.FINGERPRINT_FLAGS],
+        'flags_digest':
+            hashlib.sha1(' '.join(flags).encode('utf-8')).hexdigest()[:12]
+            if flags else None,
+    }
+
+
+def cpu_fingerprint(path: str = c.CPUINFO_PATH) -> Dict:
+    '''CPU fingerprint, with the number of CPUs visible to the function'''
+    try:
+        with open(path) as cpuinfo:
+            fingerprint = parse_cpuinfo(cpuinfo.read())
+
+    except OSError:
+        fingerprint = parse_cpuinfo('')
+
+    fingerprint['cpus'] = len(os.sched_getaffinity(0)) \
+        if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+
+    return fingerprint
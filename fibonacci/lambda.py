@@ -1,32 +1,66 @@
 '''Lambda Fibonacci code'''
+import time
 from typing import (
     Dict,
 )
 import fibonacci
+from fingerprint import cpu_fingerprint
 import constants as c
 
 
 first_run = True
+# Read once per sandbox, the host does not change between invocations
+cpu = None
 
 
 def handler(event: Dict, context: Dict) -> Dict:
-    '''Lambda handler function'''
-    global first_run
+    '''Lambda handler function
+
+    With an 'iterations' event arg, the calculation runs that many times and
+    the duration of each run is returned in 'iteration_durations' (ms).
+
+    The 'cpu' fingerprint of the host (model, MHz, flags and visible CPUs)
+    lets the benchmarker break durations down by hardware class.
+    '''
+    global first_run, cpu
 
     cold_start = True if first_run else False
 
     first_run = False
 
+    if cpu is None:
+        cpu = cpu_fingerprint()
+
     n = event.get('n', c.DEFAULT_FIBONACCI_N)
+    iterations = event.get('iterations', c.DEFAULT_ITERATIONS)
+
+    if type(iterations) is not int:
+        raise TypeError('iterations must be an integer')
+
+    if iterations < 1:
+        raise ValueError('iterations must be greater than 0 (zero)')
 
-    n_th = fibonacci.calculate(n=n)
+    iteration_durations = []
 
-    return {
+    for i in range(iterations):
+        start = time.perf_counter()
+
+        n_th = fibonacci.calculate(n=n)
+
+        iteration_durations.append((time.perf_counter() - start) * 1000)
+
+    response = {
         'cold_start': cold_start,
         'n_th': n_th,
         'remaining_time': context.get_remaining_time_in_millis(),
+        'cpu': cpu,
     }
 
+    if iterations > 1:
+        response['iteration_durations'] = iteration_durations
+
+    return response
+
 
 if __name__ == '__main__':
     event = {
@@ -1,6 +1,18 @@
 '''Test cases for Fibonacci calculation'''
+import importlib
 import unittest
 import fibonacci
+from fingerprint import parse_cpuinfo
+
+# 'lambda' is a reserved word, the module cannot be imported by statement
+lambda_module = importlib.import_module('lambda')
+
+
+class FakeContext():
+    '''Minimal stand-in for the Lambda context object'''
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 299000
 
 
 class TestFibonacci(unittest.TestCase):
@@ -39,5 +51,82 @@ class TestFibonacci(unittest.TestCase):
             self.assertEqual(first=calculated, second=expected_result)
 
 
+class TestHandler(unittest.TestCase):
+    '''Test cases for the Lambda handler'''
+
+    def test_single_iteration(self):
+        '''Test a plain invocation returns no iteration durations'''
+        response = lambda_module.handler({'n': 10}, FakeContext())
+
+        self.assertEqual(response['n_th'], 34)
+        self.assertEqual(response['remaining_time'], 299000)
+        self.assertNotIn('iteration_durations', response)
+
+    def test_batched_iterations(self):
+        '''Test a batched invocation times each iteration'''
+        response = lambda_module.handler(
+            {'n': 10, 'iterations': 5}, FakeContext())
+
+        self.assertEqual(response['n_th'], 34)
+        self.assertEqual(len(response['iteration_durations']), 5)
+
+        for duration in response['iteration_durations']:
+            self.assertGreaterEqual(duration, 0)
+
+    def test_invalid_iterations(self):
+        '''Test iterations below 1 are rejected with a clear error'''
+        for iterations in (0, -1):
+            with self.assertRaisesRegex(ValueError, 'iterations'):
+                lambda_module.handler(
+                    {'n': 10, 'iterations': iterations}, FakeContext())
+
+        for iterations in ('5', 1.5, True):
+            with self.assertRaisesRegex(TypeError, 'iterations'):
+                lambda_module.handler(
+                    {'n': 10, 'iterations': iterations}, FakeContext())
+
+    def test_cpu_fingerprint(self):
+        '''Test the host CPU fingerprint is returned'''
+        response = lambda_module.handler({'n': 10}, FakeContext())
+
+        self.assertGreaterEqual(response['cpu']['cpus'], 1)
+        self.assertIn('model', response['cpu'])
+
+
+class TestFingerprint(unittest.TestCase):
+    '''Test cases for parsing /proc/cpuinfo'''
+
+    def test_x86_64(self):
+        '''Test the model and notable flags of an x86_64 host'''
+        fingerprint = parse_cpuinfo(
+            'processor\t: 0\n'
+            'model name\t: Intel(R) Xeon(R) Processor @ 2.50GHz\n'
+            'cpu MHz\t\t: 2499.998\n'
+            'flags\t\t: fpu sse2 avx avx2 avx512f\n'
+            '\n'
+            'processor\t: 1\n'
+            'model name\t: Another model\n'
+        )
+
+        self.assertEqual(
+            fingerprint['model'], 'Intel(R) Xeon(R) Processor @ 2.50GHz')
+        self.assertEqual(fingerprint['mhz'], 2500.0)
+        self.assertEqual(fingerprint['flags'], ['avx', 'avx2', 'avx512f'])
+        self.assertEqual(len(fingerprint['flags_digest']), 12)
+
+    def test_arm64(self):
+        '''Test arm64 hosts are identified by implementer and part'''
+        fingerprint = parse_cpuinfo(
+            'processor\t: 0\n'
+            'Features\t: fp asimd aes sha2 sve\n'
+            'CPU implementer\t: 0x41\n'
+            'CPU part\t: 0xd40\n'
+        )
+
+        self.assertEqual(fingerprint['model'], '0x41:0xd40')
+        self.assertIsNone(fingerprint['mhz'])
+        self.assertEqual(fingerprint['flags'], ['asimd', 'sve'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,10 @@
+'''Constant values for multi-core scaling probe Lambda'''
+
+
+DEFAULT_MAX_WORKERS = 6  # Lambda allocates up to 6 vCPUs
+DEFAULT_WORK_UNITS = 2000000  # Kernel loop iterations, split across workers
+DEFAULT_EXECUTOR = 'process'
+EXECUTORS = [
+    'process',
+    'thread',
+]
@@ -0,0 +1,113 @@
+'''CPU-bound kernel run on one or more workers'''
+import multiprocessing
+import threading
+import time
+from typing import (
+    Dict,
+)
+import constants as c
+
+
+def spin(*, units: int) -> int:
+    '''Pure CPU work: iterate an integer hash units times'''
+    value = 0
+
+    for i in range(units):
+        value = (value * 31 + i) & 0xFFFFFFFF
+
+    return value
+
+
+def _process_worker(connection, units: int):
+    connection.send(spin(units=units))
+    connection.close()
+
+
+def run_processes(*, workers: int, units: int):
+    '''Split units across worker processes
+
+    Uses pipes, since Lambda has no /dev/shm for multiprocessing queues and
+    pools.
+    '''
+    processes = []
+    connections = []
+
+    for i in range(workers):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_process_worker,
+            args=(sender, units // workers),
+        )
+        process.start()
+
+        processes.append(process)
+        connections.append(receiver)
+
+    for connection in connections:
+        connection.recv()
+
+    for process in processes:
+        process.join()
+
+
+def run_threads(*, workers: int, units: int):
+    '''Split units across threads, which contend for the GIL'''
+    threads = [
+        threading.Thread(target=spin, kwargs={'units': units // workers})
+        for i in range(workers)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+
+def scaling_curve(
+        *,
+        max_workers: int = c.DEFAULT_MAX_WORKERS,
+        units: int = c.DEFAULT_WORK_UNITS,
+        executor: str = c.DEFAULT_EXECUTOR,
+        ) -> Dict:
+    '''Time a fixed amount of work split across 1..max_workers workers
+
+    Speedup is relative to a single worker and efficiency is speedup per
+    worker. The effective vCPU count is the highest speedup reached.
+    '''
+    if executor not in c.EXECUTORS:
+        raise ValueError(
+            f'Invalid executor ({executor}), valid are '
+            f"{', '.join(c.EXECUTORS)}"
+        )
+
+    if type(max_workers) is not int or max_workers < 1:
+        raise ValueError('max_workers must be an integer greater than 0')
+
+    run = run_processes if executor == 'process' else run_threads
+    runs = []
+
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+
+        run(workers=workers, units=units)
+
+        duration = (time.perf_counter() - start) * 1000
+        speedup = runs[0]['duration'] / duration if runs else 1.0
+
+        runs.append({
+            'workers': workers,
+            'duration': round(duration, 3),
+            'speedup': round(speedup, 3),
+            'efficiency': round(speedup / workers, 3),
+        })
+
+    best = max(runs, key=lambda run: run['speedup'])
+
+    return {
+        'executor': executor,
+        'units': units,
+        'effective_vcpus': best['speedup'],
+        'best_workers': best['workers'],
+        'runs': runs,
+    }
@@ -0,0 +1,51 @@
+'''Lambda multi-core scaling probe code'''
+import os
+from typing import (
+    Dict,
+)
+import kernel
+import constants as c
+
+
+first_run = True
+
+
+def handler(event: Dict, context: Dict) -> Dict:
+    '''Lambda handler function
+
+    Runs a CPU kernel on 1..max_workers processes (or threads) and reports
+    the parallel speedup and efficiency of each, along with the number of
+    CPUs the function sees.
+    '''
+    global first_run
+
+    cold_start = True if first_run else False
+
+    first_run = False
+
+    scaling = kernel.scaling_curve(
+        max_workers=event.get('max_workers', c.DEFAULT_MAX_WORKERS),
+        units=event.get('units', c.DEFAULT_WORK_UNITS),
+        executor=event.get('executor', c.DEFAULT_EXECUTOR),
+    )
+    scaling['cpu_count'] = os.cpu_count()
+
+    return {
+        'cold_start': cold_start,
+        'scaling': scaling,
+        'remaining_time': context.get_remaining_time_in_millis(),
+    }
+
+
+if __name__ == '__main__':
+    event = {
+        'max_workers': 4,
+    }
+
+    class Context():
+        def get_remaining_time_in_millis(self) -> int:
+            return 300000
+
+    response = handler(event=event, context=Context())
+
+    print(response)
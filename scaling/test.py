@@ -0,0 +1,35 @@
+'''Test cases for the multi-core scaling probe'''
+import unittest
+import kernel
+
+
+class TestScalingCurve(unittest.TestCase):
+    '''Test cases for the scaling curve of the CPU kernel'''
+
+    def test_scaling_curve(self):
+        '''Test every worker count is timed and normalized'''
+        for executor in ('process', 'thread'):
+            scaling = kernel.scaling_curve(
+                max_workers=3, units=30000, executor=executor)
+
+            self.assertEqual(
+                [run['workers'] for run in scaling['runs']], [1, 2, 3])
+            self.assertEqual(scaling['runs'][0]['speedup'], 1.0)
+
+            for run in scaling['runs']:
+                self.assertGreater(run['duration'], 0)
+                self.assertAlmostEqual(
+                    run['efficiency'], run['speedup'] / run['workers'],
+                    places=2,
+                )
+
+            self.assertGreaterEqual(scaling['effective_vcpus'], 1.0)
+
+    def test_invalid_executor(self):
+        '''Test an unknown executor is rejected'''
+        with self.assertRaises(ValueError):
+            kernel.scaling_curve(executor='foobar')
+
+
+if __name__ == '__main__':
+    unittest.main()